@@ -46,14 +46,25 @@ BUSINESS_INFO = {
 }
 
 # Denominaciones de dinero
-DENOMINACIONES = {
-    'billetes': [500, 200, 100, 50, 20],
-    'monedas': [10, 5, 2, 1]
+DENOMINACIONES = {  # En centavos, como todos los importes
+    'billetes': [50000, 20000, 10000, 5000, 2000],
+    'monedas': [1000, 500, 200, 100]
 }
 
 # Configuración de punto de venta
 MESAS = [f"Mesa {i}" for i in range(1, 7)] + ["Para llevar"]
 
+# Unidades de medida de ingredientes y recetas: magnitud y equivalencia en la
+# unidad más chica de esa magnitud. Solo se convierte entre unidades de la misma
+# magnitud (ver conversiones_unidad en database.py)
+UNIDADES_MEDIDA = {
+    'Pza': ('pieza', 1),
+    'Kg': ('masa', 1000),
+    'g': ('masa', 1),
+    'L': ('volumen', 1000),
+    'ml': ('volumen', 1),
+}
+
 # Información actualizada del negocio (para tickets)
 BUSINESS_INFO = {
     'name': "Los Abuelos",
@@ -67,6 +78,7 @@ BUSINESS_INFO = {
 # Configuración de tickets
 TICKET_CONFIG = {
     'width_mm': 58,  # Ancho del ticket en mm
+    'logo_dpi': 300,  # Resolución a la que se reduce el logo antes de incrustarlo en el PDF
     'font_size_title': 12,
     'font_size_normal': 9,
     'font_size_small': 7,
@@ -76,5 +88,62 @@ TICKET_CONFIG = {
 # Configuración de impresión automática
 PRINT_CONFIG = {
     'auto_print': False,  # Por defecto NO imprimir automáticamente
-    'last_ticket_path': None  # Ruta del último ticket generado
-}
\ No newline at end of file
+    'last_ticket_path': None,  # Ruta del último ticket generado
+    # Cola de impresión en segundo plano (print_queue.py)
+    'max_intentos': 5,         # Intentos antes de marcar el trabajo como fallido
+    'reintento_base_s': 2,     # Espera antes del primer reintento; se duplica en cada uno
+    'reintento_max_s': 60,     # Espera máxima entre reintentos
+    'timeout_s': 30,           # Tiempo máximo para que el sistema acepte la impresión
+    'dias_fallidos': 7,        # Días que se conservan los trabajos fallidos antes de purgarlos
+    'poll_ms': 200,            # Cada cuánto revisa la interfaz el avance de la cola
+    # 'pdf': reportlab + cola del sistema; 'escpos': bytes ESC/POS directo a la impresora
+    'modo': 'pdf'
+}
+
+# Impresión directa ESC/POS (escpos.py), para PRINT_CONFIG['modo'] = 'escpos'
+ESCPOS_CONFIG = {
+    # Destino: archivo de dispositivo ('/dev/usb/lp0'), impresora de red
+    # ('tcp://192.168.1.50:9100') o un archivo normal para pruebas
+    'destino': '/dev/usb/lp0',
+    'columnas': 32,                # Caracteres por renglón (58 mm, fuente A)
+    'ancho_puntos': 384,           # Ancho imprimible en puntos (58 mm a 203 dpi)
+    'logo_ancho_puntos': 200,      # Ancho del logo impreso (≈ 25 mm)
+    'code_page': 2,                # ESC t n: 2 = PC850 (acentos y ñ)
+    'encoding': 'cp850',
+    'cache_dir': 'images/escpos'   # Logo ya convertido a comando raster (se puede borrar)
+}
+
+# Perfiles de rendimiento de SQLite (se aplican al abrir la conexión)
+# - durable: WAL + synchronous FULL, cada commit llega al disco
+# - fast: WAL + synchronous NORMAL, más caché y mmap; ante un apagón
+#   pueden perderse las últimas transacciones, nunca se corrompe la base
+DB_PROFILES = {
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -8000,        # Negativo = KiB (≈ 8 MB)
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000        # ms de espera si la base está bloqueada
+    },
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -32000,       # ≈ 32 MB
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000
+    }
+}
+
+# Configuración de base de datos
+DB_CONFIG = {
+    'profile': 'durable'  # Perfil de DB_PROFILES usado por defecto
+}
+
+# Configuración de miniaturas de productos
+THUMBNAIL_CONFIG = {
+    'cache_dir': 'images/thumbs',  # Miniaturas generadas (se pueden borrar)
+    'size': (110, 110),            # Tamaño en la galería del punto de venta
+    'max_memoria': 300             # Máximo de imágenes cargadas en memoria
+}
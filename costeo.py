@@ -0,0 +1,166 @@
+"""
+Costeo de productos a partir del grafo de recetas de Mitsy's POS
+"""
+from typing import Dict, Iterable, List, Set, Tuple
+
+class CicloRecetaError(ValueError):
+    """Una subreceta terminaría usándose a sí misma"""
+
+
+class GrafoRecetas:
+    def __init__(self, costos_base: Dict[int, float],
+                 recetas: Iterable[Tuple[int, int]],
+                 subrecetas: Iterable[Tuple[int, int, float]] = (),
+                 inactivos: Iterable[int] = ()):
+        """
+        Grafo en memoria de qué lleva cada producto y cada ingrediente preparado
+        - costos_base: id_ingrediente -> costo_unitario guardado (centavos por unidad)
+        - recetas: (id_producto, id_ingrediente); solo para saber qué productos
+          afecta cada ingrediente, su costo se calcula con Database.SQL_COSTO_RECETA
+        - subrecetas: (id_preparado, id_ingrediente, cantidad_requerida); el
+          preparado es un ingrediente cuyo costo por unidad sale de sus componentes
+        - inactivos: ingredientes dados de baja; siguen en el grafo (para saber a
+          quién afectaban) pero ya no suman al costo de quien los usa
+        
+        Se arma una vez desde la base de datos; el costo de cada nodo se calcula
+        una sola vez (memorizado) hasta que cambia algún costo base.
+        """
+        self.costos_base = dict(costos_base)
+        self.inactivos = set(inactivos)
+        self.productos: Dict[int, Set[int]] = {}
+        self.preparados: Dict[int, List[Tuple[int, float]]] = {}
+        
+        # Índices inversos: ingrediente -> productos / preparados que lo usan
+        self.usado_en_productos: Dict[int, Set[int]] = {}
+        self.usado_en_preparados: Dict[int, Set[int]] = {}
+        
+        for id_producto, id_ingrediente in recetas:
+            self.productos.setdefault(id_producto, set()).add(id_ingrediente)
+            self.usado_en_productos.setdefault(id_ingrediente, set()).add(id_producto)
+        
+        for id_preparado, id_ingrediente, cantidad in subrecetas:
+            self.preparados.setdefault(id_preparado, []).append((id_ingrediente, cantidad))
+            self.usado_en_preparados.setdefault(id_ingrediente, set()).add(id_preparado)
+        
+        self._costos: Dict[int, float] = {}
+        self.verificar_ciclos()
+    
+    def verificar_ciclos(self):
+        """Lanza CicloRecetaError si algún preparado se usa a sí mismo (directa o indirectamente)"""
+        terminados = set()
+        
+        for inicio in self.preparados:
+            if inicio in terminados:
+                continue
+            
+            # Recorrido en profundidad sin recursión; camino = nodos en visita
+            camino = [inicio]
+            en_camino = {inicio}
+            pendientes = [iter(self.preparados[inicio])]
+            
+            while pendientes:
+                siguiente = next(pendientes[-1], None)
+                if siguiente is None:
+                    nodo = camino.pop()
+                    en_camino.discard(nodo)
+                    terminados.add(nodo)
+                    pendientes.pop()
+                    continue
+                
+                hijo = siguiente[0]
+                if hijo in en_camino:
+                    ciclo = camino[camino.index(hijo):] + [hijo]
+                    raise CicloRecetaError(
+                        "Las subrecetas forman un ciclo: " + " -> ".join(map(str, ciclo)))
+                if hijo in terminados or hijo not in self.preparados:
+                    continue
+                
+                camino.append(hijo)
+                en_camino.add(hijo)
+                pendientes.append(iter(self.preparados[hijo]))
+    
+    def crearia_ciclo(self, id_preparado: int, id_ingrediente: int) -> bool:
+        """Indica si agregar id_ingrediente a la subreceta de id_preparado formaría un ciclo"""
+        if id_preparado == id_ingrediente:
+            return True
+        return id_preparado in self.componentes(id_ingrediente)
+    
+    def componentes(self, id_ingrediente: int) -> Set[int]:
+        """Todos los ingredientes que lleva un preparado, a cualquier profundidad"""
+        encontrados = set()
+        pendientes = [id_ingrediente]
+        while pendientes:
+            for hijo, _ in self.preparados.get(pendientes.pop(), ()):
+                if hijo not in encontrados:
+                    encontrados.add(hijo)
+                    pendientes.append(hijo)
+        return encontrados
+    
+    def dependientes(self, ids_ingredientes: Iterable[int]) -> Tuple[Set[int], Set[int]]:
+        """
+        Preparados y productos cuyo costo depende de alguno de los ingredientes
+        (siguiendo los índices inversos a través de los preparados, e incluyendo a
+        los propios ingredientes que sean preparados)
+        Retorna (preparados, productos)
+        """
+        pendientes = list(ids_ingredientes)
+        visitados = set(pendientes)
+        # Un preparado que cambió (por ejemplo su subreceta) también se recalcula
+        preparados = {id_ingrediente for id_ingrediente in visitados
+                      if id_ingrediente in self.preparados}
+        
+        while pendientes:
+            for id_preparado in self.usado_en_preparados.get(pendientes.pop(), ()):
+                if id_preparado not in visitados:
+                    visitados.add(id_preparado)
+                    preparados.add(id_preparado)
+                    pendientes.append(id_preparado)
+        
+        productos = set()
+        for id_ingrediente in visitados:
+            productos |= self.usado_en_productos.get(id_ingrediente, set())
+        
+        return preparados, productos
+    
+    def actualizar_costo_base(self, id_ingrediente: int, costo_unitario: float):
+        """Cambia el costo guardado de un ingrediente y descarta los costos memorizados"""
+        self.costos_base[id_ingrediente] = costo_unitario
+        self._costos.clear()
+    
+    def costo_ingrediente(self, id_ingrediente: int) -> float:
+        """Costo por unidad en centavos (sin redondear); el de un preparado sale de su subreceta"""
+        costo = self._costos.get(id_ingrediente)
+        if costo is not None:
+            return costo
+        
+        componentes = self.preparados.get(id_ingrediente)
+        if componentes:
+            costo = sum(cantidad * self._costo_componente(hijo) for hijo, cantidad in componentes)
+        else:
+            costo = self.costos_base.get(id_ingrediente) or 0
+        
+        self._costos[id_ingrediente] = costo
+        return costo
+    
+    def _costo_componente(self, id_ingrediente: int) -> float:
+        """Lo que aporta un ingrediente a quien lo usa (nada si está dado de baja)"""
+        if id_ingrediente in self.inactivos:
+            return 0
+        return self.costo_ingrediente(id_ingrediente)
+    
+    def recalcular(self, ids_ingredientes: Iterable[int] = None
+                   ) -> Tuple[Dict[int, float], List[int]]:
+        """
+        Costos nuevos de los preparados que dependen de ids_ingredientes (o de todos
+        si es None) y productos cuyo costo hay que volver a calcular
+        Retorna ({id_preparado: costo_unitario}, [id_producto]); los preparados
+        dados de baja conservan su último costo
+        """
+        if ids_ingredientes is None:
+            preparados, productos = set(self.preparados), set(self.productos)
+        else:
+            preparados, productos = self.dependientes(ids_ingredientes)
+        
+        return ({id_preparado: self.costo_ingrediente(id_preparado)
+                 for id_preparado in sorted(preparados - self.inactivos)},
+                sorted(productos))
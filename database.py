@@ -2,34 +2,127 @@
 Gestor de base de datos SQLite para Mitsy's POS
 """
 import sqlite3
-from datetime import datetime
+import re
+import json
+from datetime import datetime, date, timedelta
 from typing import Optional, List, Dict, Any
 import os
-from utils import get_current_datetime
+import threading
+from config import DB_PROFILES, DB_CONFIG, UNIDADES_MEDIDA
+from utils import get_current_datetime, format_datetime, format_iso_datetime, iso_day_range, normalize_text, to_cents
+from costeo import GrafoRecetas, CicloRecetaError
 
 class Database:
-    def __init__(self, db_path: str = "data/mitsys.db"):
+    # Columnas con importes de dinero, guardados en centavos enteros (ver _migracion_centavos)
+    COLUMNAS_DINERO = {
+        'productos': ('precio_unitario', 'costo', 'ganancia'),
+        'tickets': ('propina', 'subtotal'),
+        'venta_lineas': ('precio_unitario', 'total'),
+        'cortes': ('dinero_en_caja', 'corte_final', 'corte_esperado', 'retiros',
+                   'diferencia', 'ganancias'),
+        'dinero_caja': ('denominacion', 'total'),
+        'ventas_pendientes': ('total',),
+    }
+    
+    def __init__(self, db_path: str = "data/mitsys.db", profile: str = None):
         """Inicializa la conexión a la base de datos"""
         # Crear carpeta data si no existe
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
         self.db_path = db_path
+        self._config_cache = None  # Caché de la tabla configuracion (clave -> valor)
+        self._catalogo = None  # Caché de productos (id -> producto), ver get_catalogo
+        self.catalogo_version = 0
+        self._grafo_recetas = None  # Grafo de recetas para el costeo, ver get_grafo_recetas
+        self._lectores = threading.local()  # Conexiones de lectura por hilo, ver reader()
+        self.profile = profile or DB_CONFIG['profile']
+        if self.profile not in DB_PROFILES:
+            raise ValueError(f"Perfil de base de datos desconocido: {self.profile}")
         self.conn = None
         self.cursor = None
         self.connect()
         self.create_tables()
+        self.migrate_schema()
         self.init_config()
     
     def _get_current_datetime(self):
         """Obtiene la fecha y hora actual en formato del sistema"""
         return datetime.now().strftime('%d/%m/%Y %H:%M:%S')    
     
+    def _get_current_timestamps(self):
+        """Obtiene la fecha actual en formato del sistema y en formato ISO ordenable"""
+        ahora = datetime.now()
+        return format_datetime(ahora), format_iso_datetime(ahora)
+    
     def connect(self):
         """Establece conexión con la base de datos"""
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
+        self.conn = self._open_connection()
         self.cursor = self.conn.cursor()
     
+    def _open_connection(self) -> sqlite3.Connection:
+        """Abre una conexión nueva aplicando el perfil de rendimiento configurado"""
+        ajustes = DB_PROFILES[self.profile]
+        
+        conn = sqlite3.connect(self.db_path, timeout=ajustes['busy_timeout'] / 1000)
+        conn.row_factory = sqlite3.Row
+        
+        # normalizar(texto): minúsculas y sin acentos, igual que utils.normalize_text
+        conn.create_function('normalizar', 1, normalize_text, deterministic=True)
+        
+        conn.execute(f"PRAGMA journal_mode = {ajustes['journal_mode']}").fetchall()
+        conn.execute(f"PRAGMA synchronous = {ajustes['synchronous']}")
+        conn.execute(f"PRAGMA cache_size = {int(ajustes['cache_size'])}")
+        conn.execute(f"PRAGMA mmap_size = {int(ajustes['mmap_size'])}").fetchall()
+        conn.execute(f"PRAGMA temp_store = {ajustes['temp_store']}")
+        conn.execute(f"PRAGMA busy_timeout = {int(ajustes['busy_timeout'])}").fetchall()
+        
+        return conn
+    
+    def reader(self) -> 'Database':
+        """
+        Instancia para consultas de lectura desde el hilo actual.
+        En el hilo principal devuelve esta misma instancia; en otros hilos
+        (búsquedas en segundo plano) usa una conexión propia de ese hilo,
+        ya que una conexión de sqlite3 no se puede compartir entre hilos.
+        """
+        if threading.current_thread() is threading.main_thread():
+            return self
+        
+        lector = getattr(self._lectores, 'db', None)
+        if lector is None:
+            lector = Database.__new__(Database)
+            lector.db_path = self.db_path
+            lector.profile = self.profile
+            lector._lectores = self._lectores
+            lector.connect()
+            self._lectores.db = lector
+        
+        # Las cachés del lector no reciben invalidaciones: se descartan en cada uso
+        lector._config_cache = None
+        lector._catalogo = None
+        lector._grafo_recetas = None
+        lector.catalogo_version = self.catalogo_version
+        return lector
+    
+    def get_db_status(self) -> Dict[str, Any]:
+        """Devuelve los ajustes de SQLite realmente en efecto en la conexión"""
+        synchronous = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}
+        temp_store = {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'}
+        
+        def pragma(nombre):
+            return self.conn.execute(f'PRAGMA {nombre}').fetchone()[0]
+        
+        return {
+            'profile': self.profile,
+            'journal_mode': pragma('journal_mode').upper(),
+            'synchronous': synchronous.get(pragma('synchronous'), pragma('synchronous')),
+            'cache_size': pragma('cache_size'),
+            'mmap_size': pragma('mmap_size'),
+            'temp_store': temp_store.get(pragma('temp_store'), pragma('temp_store')),
+            'busy_timeout': pragma('busy_timeout'),
+            'sqlite_version': sqlite3.sqlite_version
+        }
+    
     def close(self):
         """Cierra la conexión"""
         if self.conn:
@@ -48,25 +141,26 @@ class Database:
             )
         ''')
         
-        # Tabla de Productos (ID manual)
+        # Tabla de Productos (ID manual; importes en centavos)
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS productos (
                 id INTEGER PRIMARY KEY,
                 nombre TEXT NOT NULL,
-                precio_unitario REAL NOT NULL,
-                costo REAL NOT NULL,
-                ganancia REAL,
+                precio_unitario INTEGER NOT NULL,
+                costo INTEGER NOT NULL,
+                ganancia INTEGER,
                 unidad_medida TEXT DEFAULT 'Pza',
                 stock_estimado REAL DEFAULT 0,
                 stock_minimo REAL DEFAULT 0,
                 gestion_stock INTEGER DEFAULT 0,
                 imagen TEXT,
                 activo INTEGER DEFAULT 1,
-                fecha_creacion TEXT
+                fecha_creacion TEXT,
+                nombre_normalizado TEXT
             )
         ''')
         
-        # Tabla de Ingredientes (ID manual)
+        # Tabla de Ingredientes (ID manual; costo_unitario en centavos por unidad)
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS ingredientes (
                 id INTEGER PRIMARY KEY,
@@ -76,7 +170,8 @@ class Database:
                 cantidad_stock REAL DEFAULT 0,
                 gestion_stock INTEGER DEFAULT 0,
                 activo INTEGER DEFAULT 1,
-                fecha_creacion TEXT
+                fecha_creacion TEXT,
+                nombre_normalizado TEXT
             )
         ''')
         
@@ -93,7 +188,8 @@ class Database:
             )
         ''')
         
-        # Tabla de Ventas
+        # Tabla de Ventas (formato original, una fila por producto vendido).
+        # La migración 3 la convierte en tickets + venta_lineas y deja 'ventas' como vista.
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS ventas (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -107,27 +203,29 @@ class Database:
                 metodo_pago TEXT DEFAULT 'Efectivo',
                 mesa TEXT,
                 propina REAL DEFAULT 0,
+                fecha_iso TEXT,
                 FOREIGN KEY (id_producto) REFERENCES productos(id)
             )
         ''')
         
-        # Tabla de Cortes
+        # Tabla de Cortes (importes en centavos)
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS cortes (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 numero_corte INTEGER NOT NULL,
                 fecha TEXT NOT NULL,
-                dinero_en_caja REAL NOT NULL,
-                corte_final REAL NOT NULL,
-                corte_esperado REAL NOT NULL,
-                retiros REAL DEFAULT 0,
-                diferencia REAL NOT NULL,
+                dinero_en_caja INTEGER NOT NULL,
+                corte_final INTEGER NOT NULL,
+                corte_esperado INTEGER NOT NULL,
+                retiros INTEGER DEFAULT 0,
+                diferencia INTEGER NOT NULL,
                 estado TEXT,
-                ganancias REAL NOT NULL
+                ganancias INTEGER NOT NULL,
+                fecha_iso TEXT
             )
         ''')
         
-        # Tabla de Dinero en Caja
+        # Tabla de Dinero en Caja (denominación y total en centavos)
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS dinero_caja (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -135,7 +233,7 @@ class Database:
                 tipo TEXT NOT NULL,
                 denominacion INTEGER NOT NULL,
                 cantidad INTEGER NOT NULL,
-                total REAL NOT NULL,
+                total INTEGER NOT NULL,
                 tipo_registro TEXT DEFAULT 'apertura'
             )
         ''')
@@ -146,13 +244,820 @@ class Database:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 mesa TEXT NOT NULL,
                 productos TEXT,
-                total REAL DEFAULT 0,
+                total INTEGER DEFAULT 0,
                 fecha_creacion TEXT
             )
         ''')
         
         self.conn.commit()
     
+    # ==================== MIGRACIONES ====================
+    
+    def migrate_schema(self):
+        """
+        Aplica las migraciones pendientes de la base de datos.
+        La versión del esquema se guarda en PRAGMA user_version.
+        """
+        migraciones = [
+            self._migracion_fechas_iso,
+            self._migracion_nombres_normalizados,
+            self._migracion_tickets,
+            self._migracion_centavos,
+            self._migracion_costo_venta,
+            self._migracion_costo_receta,
+            self._migracion_resumenes,
+            self._migracion_movimientos_inventario,
+            self._migracion_indices_recetas,
+            self._migracion_subrecetas,
+            self._migracion_conversiones_unidad,
+            self._migracion_trabajos_impresion,
+        ]
+        
+        version = self.cursor.execute('PRAGMA user_version').fetchone()[0]
+        
+        for numero, migracion in enumerate(migraciones, start=1):
+            if numero <= version:
+                continue
+            try:
+                migracion()
+                self.cursor.execute(f'PRAGMA user_version = {numero}')
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+    
+    def _column_exists(self, tabla: str, columna: str) -> bool:
+        """Verifica si una columna existe en una tabla"""
+        columnas = self.cursor.execute(f'PRAGMA table_info({tabla})').fetchall()
+        return any(col['name'] == columna for col in columnas)
+    
+    def _migracion_fechas_iso(self):
+        """
+        Migración 1: columna fecha_iso (yyyy-mm-dd hh:mm:ss) en ventas y cortes.
+        'fecha' se conserva para mostrar; 'fecha_iso' se usa para filtrar y ordenar.
+        """
+        for tabla in ('ventas', 'cortes'):
+            if not self._column_exists(tabla, 'fecha_iso'):
+                self.cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN fecha_iso TEXT')
+            
+            # dd/mm/yyyy[ hh:mm:ss] -> yyyy-mm-dd[ hh:mm:ss]
+            self.cursor.execute(f'''
+                UPDATE {tabla}
+                SET fecha_iso = SUBSTR(fecha, 7, 4) || '-' || SUBSTR(fecha, 4, 2) || '-' ||
+                                SUBSTR(fecha, 1, 2) || SUBSTR(fecha, 11)
+                WHERE fecha_iso IS NULL AND fecha LIKE '__/__/____%'
+            ''')
+        
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_ventas_fecha_iso ON ventas(fecha_iso)')
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_ventas_fecha_iso_metodo
+            ON ventas(fecha_iso, metodo_pago)
+        ''')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_ventas_numero ON ventas(numero_venta)')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_cortes_fecha_iso ON cortes(fecha_iso)')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_cortes_numero ON cortes(numero_corte)')
+    
+    def _migracion_nombres_normalizados(self):
+        """
+        Migración 2: columna nombre_normalizado (minúsculas, sin acentos) en productos
+        e ingredientes para buscar directamente en SQL
+        """
+        for tabla in ('productos', 'ingredientes'):
+            if not self._column_exists(tabla, 'nombre_normalizado'):
+                self.cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN nombre_normalizado TEXT')
+            
+            self.cursor.execute(f'UPDATE {tabla} SET nombre_normalizado = normalizar(nombre)')
+            self.cursor.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_{tabla}_nombre_normalizado
+                ON {tabla}(nombre_normalizado)
+            ''')
+    
+    def _migracion_tickets(self):
+        """
+        Migración 3: separa 'ventas' en encabezado (tickets) y líneas (venta_lineas).
+        Número, fecha, método de pago, mesa y propina se guardan una sola vez por ticket
+        y el subtotal se mantiene con triggers. 'ventas' queda como vista con las mismas
+        columnas para que las pantallas existentes sigan funcionando.
+        """
+        tipo = self.cursor.execute(
+            "SELECT type FROM sqlite_master WHERE name = 'ventas'").fetchone()
+        if tipo and tipo['type'] == 'view':
+            return
+        
+        # DROP TABLE y CREATE VIEW deben ir en la misma transacción que la copia
+        if not self.conn.in_transaction:
+            self.cursor.execute('BEGIN')
+        
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tickets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                numero_venta INTEGER NOT NULL,
+                fecha TEXT NOT NULL,
+                fecha_iso TEXT,
+                metodo_pago TEXT DEFAULT 'Efectivo',
+                mesa TEXT,
+                propina REAL DEFAULT 0,
+                subtotal REAL NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS venta_lineas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_ticket INTEGER NOT NULL,
+                producto TEXT NOT NULL,
+                id_producto INTEGER,
+                cantidad REAL NOT NULL,
+                precio_unitario REAL NOT NULL,
+                total REAL NOT NULL,
+                FOREIGN KEY (id_ticket) REFERENCES tickets(id) ON DELETE CASCADE,
+                FOREIGN KEY (id_producto) REFERENCES productos(id)
+            )
+        ''')
+        
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_fecha_iso ON tickets(fecha_iso)')
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_tickets_fecha_iso_metodo
+            ON tickets(fecha_iso, metodo_pago)
+        ''')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_numero ON tickets(numero_venta)')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_venta_lineas_ticket ON venta_lineas(id_ticket)')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_venta_lineas_producto ON venta_lineas(id_producto)')
+        
+        # Un ticket por cada número de venta. Una misma venta puede tener líneas con
+        # fecha distinta (se guardaban al agregar cada producto), así que el encabezado
+        # y la propina (copiada en cada línea) se toman una vez, de la primera línea
+        self.cursor.execute('''
+            INSERT INTO tickets (numero_venta, fecha, fecha_iso, metodo_pago, mesa, propina, subtotal)
+            SELECT p.numero_venta, p.fecha, p.fecha_iso, p.metodo_pago, p.mesa,
+                   COALESCE(p.propina, 0), g.subtotal
+            FROM (SELECT MIN(id) AS primera, SUM(total) AS subtotal
+                  FROM ventas GROUP BY numero_venta) g
+            JOIN ventas p ON p.id = g.primera
+            ORDER BY g.primera
+        ''')
+        
+        # Las líneas conservan el id original de la venta
+        self.cursor.execute('''
+            INSERT INTO venta_lineas (id, id_ticket, producto, id_producto, cantidad,
+                                      precio_unitario, total)
+            SELECT v.id, t.id, v.producto, v.id_producto, v.cantidad, v.precio_unitario, v.total
+            FROM ventas v
+            JOIN tickets t ON t.numero_venta = v.numero_venta
+            ORDER BY v.id
+        ''')
+        
+        ventas = self.cursor.execute(
+            'SELECT COUNT(DISTINCT numero_venta) FROM ventas').fetchone()[0]
+        tickets = self.cursor.execute('SELECT COUNT(*) FROM tickets').fetchone()[0]
+        lineas = self.cursor.execute('SELECT COUNT(*) FROM venta_lineas').fetchone()[0]
+        originales = self.cursor.execute('SELECT COUNT(*) FROM ventas').fetchone()[0]
+        if ventas != tickets or lineas != originales:
+            raise sqlite3.IntegrityError(
+                f"Migración de tickets incompleta: {ventas} ventas -> {tickets} tickets, "
+                f"{originales} líneas -> {lineas}")
+        
+        self.cursor.execute('DROP TABLE ventas')
+        
+        self._crear_triggers_venta_lineas()
+        self._crear_vista_ventas()
+    
+    def _crear_triggers_venta_lineas(self):
+        """Mantiene tickets.subtotal al día; los tickets que se quedan sin líneas se eliminan"""
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_venta_lineas_insert
+            AFTER INSERT ON venta_lineas
+            BEGIN
+                UPDATE tickets SET subtotal = subtotal + NEW.total WHERE id = NEW.id_ticket;
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_venta_lineas_update
+            AFTER UPDATE OF total, id_ticket ON venta_lineas
+            BEGIN
+                UPDATE tickets SET subtotal = subtotal - OLD.total WHERE id = OLD.id_ticket;
+                UPDATE tickets SET subtotal = subtotal + NEW.total WHERE id = NEW.id_ticket;
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_venta_lineas_delete
+            AFTER DELETE ON venta_lineas
+            BEGIN
+                UPDATE tickets SET subtotal = subtotal - OLD.total WHERE id = OLD.id_ticket;
+                DELETE FROM tickets
+                WHERE id = OLD.id_ticket
+                  AND NOT EXISTS (SELECT 1 FROM venta_lineas WHERE id_ticket = OLD.id_ticket);
+            END
+        ''')
+    
+    def _crear_vista_ventas(self):
+        """
+        Vista de compatibilidad 'ventas': una fila por línea, como la tabla original.
+        La propina solo aparece en la primera línea para que SUM(propina) sea correcto.
+        Los costos registrados al vender se agregan cuando ya existen (migraciones 5 y 6).
+        """
+        costos = ''.join(f', l.{columna}' for columna in ('costo_unitario', 'costo_receta')
+                         if self._column_exists('venta_lineas', columna))
+        
+        self.cursor.execute(f'''
+            CREATE VIEW IF NOT EXISTS ventas AS
+            SELECT l.id, t.numero_venta, t.fecha, l.producto, l.id_producto, l.cantidad,
+                   l.precio_unitario, l.total, t.metodo_pago, t.mesa,
+                   CASE WHEN l.id = (SELECT MIN(id) FROM venta_lineas WHERE id_ticket = t.id)
+                        THEN t.propina ELSE 0 END AS propina,
+                   t.fecha_iso, l.id_ticket{costos}
+            FROM venta_lineas l
+            JOIN tickets t ON t.id = l.id_ticket
+        ''')
+        
+        self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_ventas_insert
+            INSTEAD OF INSERT ON ventas
+            BEGIN
+                INSERT INTO tickets (numero_venta, fecha, fecha_iso, metodo_pago, mesa, propina)
+                SELECT NEW.numero_venta, NEW.fecha, NEW.fecha_iso,
+                       COALESCE(NEW.metodo_pago, 'Efectivo'), NEW.mesa, COALESCE(NEW.propina, 0)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM tickets WHERE numero_venta = NEW.numero_venta
+                );
+                INSERT INTO venta_lineas (id, id_ticket, producto, id_producto, cantidad,
+                                          precio_unitario, total, costo_unitario, costo_receta)
+                VALUES (NEW.id,
+                        (SELECT id FROM tickets
+                         WHERE numero_venta = NEW.numero_venta
+                         ORDER BY id DESC LIMIT 1),
+                        NEW.producto, NEW.id_producto, NEW.cantidad, NEW.precio_unitario, NEW.total,
+                        {self._sql_costos_linea('NEW.id_producto')});
+            END
+        ''')
+        # Los datos del encabezado se cambian para todo el ticket
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_ventas_update
+            INSTEAD OF UPDATE ON ventas
+            BEGIN
+                UPDATE venta_lineas
+                SET producto = NEW.producto, id_producto = NEW.id_producto,
+                    cantidad = NEW.cantidad, precio_unitario = NEW.precio_unitario,
+                    total = NEW.total
+                WHERE id = OLD.id;
+                UPDATE tickets
+                SET numero_venta = NEW.numero_venta, fecha = NEW.fecha, fecha_iso = NEW.fecha_iso,
+                    metodo_pago = NEW.metodo_pago, mesa = NEW.mesa,
+                    propina = CASE WHEN NEW.propina IS OLD.propina THEN propina ELSE NEW.propina END
+                WHERE id = OLD.id_ticket;
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_ventas_delete
+            INSTEAD OF DELETE ON ventas
+            BEGIN
+                DELETE FROM venta_lineas WHERE id = OLD.id;
+            END
+        ''')
+    
+    def _migracion_centavos(self):
+        """
+        Migración 4: el dinero se guarda en centavos enteros (ver COLUMNAS_DINERO), así
+        las sumas son exactas y no hace falta tolerancia al comparar importes.
+        Las tablas se reconstruyen porque SQLite no permite cambiar el tipo de una columna.
+        ingredientes.costo_unitario queda en centavos pero admite decimales: es una tarifa
+        (centavos por kilo, por pieza, ...), no un importe.
+        """
+        if not self.conn.in_transaction:
+            self.cursor.execute('BEGIN')
+        
+        # La vista y los triggers hacen referencia a tickets y venta_lineas; se recrean al final
+        self.cursor.execute('DROP VIEW IF EXISTS ventas')
+        for trigger in ('trg_venta_lineas_insert', 'trg_venta_lineas_update',
+                        'trg_venta_lineas_delete'):
+            self.cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        
+        for tabla, columnas in self.COLUMNAS_DINERO.items():
+            self._reconstruir_en_centavos(tabla, columnas)
+        
+        # Redondear precio y costo por separado puede mover la ganancia un centavo
+        self.cursor.execute('UPDATE productos SET ganancia = precio_unitario - costo')
+        
+        self.cursor.execute('UPDATE ingredientes SET costo_unitario = costo_unitario * 100')
+        
+        # Ventas pendientes: los precios también van dentro del JSON
+        pendientes = self.cursor.execute('SELECT id, productos FROM ventas_pendientes').fetchall()
+        for pendiente in pendientes:
+            productos = json.loads(pendiente['productos'] or '[]')
+            for prod in productos:
+                prod['precio'] = to_cents(prod.get('precio', 0))
+                prod['total'] = to_cents(prod.get('total', 0))
+            self.cursor.execute('UPDATE ventas_pendientes SET productos = ? WHERE id = ?',
+                              (json.dumps(productos), pendiente['id']))
+        
+        dinero_inicial = self.cursor.execute(
+            "SELECT valor FROM configuracion WHERE clave = 'dinero_inicial_dia'").fetchone()
+        if dinero_inicial and dinero_inicial['valor']:
+            self._write_config('dinero_inicial_dia', str(to_cents(dinero_inicial['valor'])))
+        
+        self._crear_triggers_venta_lineas()
+        self._crear_vista_ventas()
+    
+    def _migracion_costo_venta(self):
+        """
+        Migración 5: venta_lineas.costo_unitario guarda el costo del producto (en centavos)
+        al momento de la venta, para que las ganancias de días pasados no cambien
+        cuando se modifica una receta o un precio de ingrediente.
+        Las líneas existentes toman el costo actual, que es lo único que se conoce.
+        """
+        if not self._column_exists('venta_lineas', 'costo_unitario'):
+            self.cursor.execute(
+                'ALTER TABLE venta_lineas ADD COLUMN costo_unitario INTEGER NOT NULL DEFAULT 0')
+        
+        self.cursor.execute('''
+            UPDATE venta_lineas
+            SET costo_unitario = COALESCE(
+                (SELECT costo FROM productos WHERE productos.id = venta_lineas.id_producto), 0)
+        ''')
+        
+        # El trigger de inserción de la vista debe copiar también el costo
+        self.cursor.execute('DROP TRIGGER IF EXISTS trg_ventas_insert')
+        self._crear_vista_ventas()
+    
+    def _migracion_costo_receta(self):
+        """
+        Migración 6: venta_lineas.costo_receta guarda lo que costaban los ingredientes
+        de la receta al vender (NULL si el producto no tiene receta). La vista 'ventas'
+        expone ambos costos para calcular ganancias sin unir con productos.
+        """
+        if not self._column_exists('venta_lineas', 'costo_receta'):
+            self.cursor.execute('ALTER TABLE venta_lineas ADD COLUMN costo_receta INTEGER')
+        
+        # Como SQL_COSTO_RECETA, sin factor_almacen (llega en la migración 11)
+        self.cursor.execute('''
+            UPDATE venta_lineas
+            SET costo_receta = (
+                SELECT CAST(ROUND(SUM(r.cantidad_requerida *
+                                      CASE WHEN i.activo = 1 THEN i.costo_unitario ELSE 0 END))
+                            AS INTEGER)
+                FROM recetas r
+                JOIN ingredientes i ON i.id = r.id_ingrediente
+                WHERE r.id_producto = venta_lineas.id_producto
+            )
+        ''')
+        
+        # Al eliminar la vista se eliminan también sus triggers
+        self.cursor.execute('DROP VIEW IF EXISTS ventas')
+        self._crear_vista_ventas()
+    
+    def _migracion_resumenes(self):
+        """
+        Migración 7: resúmenes de ventas por día y producto (resumen_productos_dia) y por
+        día y método de pago (resumen_pagos_dia). Los triggers los mantienen dentro de
+        la misma transacción que la venta; reconstruir_resumenes los rehace desde cero.
+        El producto se identifica por 'clave' (ver SQL_CLAVE_RESUMEN), no por su nombre.
+        """
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS resumen_productos_dia (
+                dia TEXT NOT NULL,
+                clave TEXT NOT NULL,
+                producto TEXT NOT NULL,
+                id_producto INTEGER,
+                cantidad REAL NOT NULL DEFAULT 0,
+                num_lineas INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                costo REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (dia, clave)
+            ) WITHOUT ROWID
+        ''')
+        
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS resumen_pagos_dia (
+                dia TEXT NOT NULL,
+                metodo_pago TEXT NOT NULL,
+                num_tickets INTEGER NOT NULL DEFAULT 0,
+                subtotal INTEGER NOT NULL DEFAULT 0,
+                propinas INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dia, metodo_pago)
+            ) WITHOUT ROWID
+        ''')
+        
+        self._crear_triggers_resumenes()
+        self._llenar_resumenes()
+    
+    def _migracion_movimientos_inventario(self):
+        """
+        Migración 8: libro de movimientos de inventario (solo agregar). Cada cambio
+        de ingredientes.cantidad_stock queda registrado con su tipo: venta, compra,
+        ajuste o merma. El stock actual entra como ajuste 'Saldo inicial' para que
+        conciliar_inventario dé el mismo resultado desde el primer día.
+        """
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS movimientos_inventario (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_ingrediente INTEGER,
+                tipo TEXT NOT NULL CHECK (tipo IN ('venta', 'compra', 'ajuste', 'merma')),
+                cantidad REAL NOT NULL,
+                id_ticket INTEGER,
+                nota TEXT,
+                fecha TEXT NOT NULL,
+                fecha_iso TEXT NOT NULL
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_movimientos_inventario_ingrediente
+            ON movimientos_inventario(id_ingrediente, id)
+        ''')
+        
+        # Solo se permite cambiar id_ingrediente (cuando se cambia el ID de un ingrediente)
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_movimientos_inventario_update
+            BEFORE UPDATE OF tipo, cantidad, id_ticket, nota, fecha, fecha_iso
+            ON movimientos_inventario
+            BEGIN
+                SELECT RAISE(ABORT, 'Los movimientos de inventario no se modifican');
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_movimientos_inventario_delete
+            BEFORE DELETE ON movimientos_inventario
+            BEGIN
+                SELECT RAISE(ABORT, 'Los movimientos de inventario no se eliminan');
+            END
+        ''')
+        
+        fecha, fecha_iso = self._get_current_timestamps()
+        self.cursor.execute('''
+            INSERT INTO movimientos_inventario (id_ingrediente, tipo, cantidad, nota,
+                                                fecha, fecha_iso)
+            SELECT id, 'ajuste', cantidad_stock, 'Saldo inicial', ?, ?
+            FROM ingredientes
+            WHERE COALESCE(cantidad_stock, 0) != 0
+            ORDER BY id
+        ''', (fecha, fecha_iso))
+    
+    def _migracion_indices_recetas(self):
+        """
+        Migración 9: índices de recetas en los dos sentidos. De ingrediente a productos
+        para saber qué stocks estimados cambian cuando cambia un ingrediente, y de
+        producto a ingredientes para recalcularlos.
+        """
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_recetas_ingrediente
+            ON recetas(id_ingrediente, id_producto)
+        ''')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_recetas_producto ON recetas(id_producto)')
+    
+    def _migracion_subrecetas(self):
+        """
+        Migración 10: subrecetas de ingredientes preparados (salsas, masas...). Un
+        preparado es un ingrediente normal cuyo costo_unitario se calcula con lo que
+        llevan sus componentes por unidad, ver costeo.GrafoRecetas.
+        """
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS subrecetas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_preparado INTEGER NOT NULL,
+                id_ingrediente INTEGER NOT NULL,
+                cantidad_requerida REAL NOT NULL,
+                UNIQUE (id_preparado, id_ingrediente),
+                FOREIGN KEY (id_preparado) REFERENCES ingredientes(id) ON DELETE CASCADE,
+                FOREIGN KEY (id_ingrediente) REFERENCES ingredientes(id) ON DELETE CASCADE
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_subrecetas_ingrediente
+            ON subrecetas(id_ingrediente, id_preparado)
+        ''')
+    
+    def _migracion_conversiones_unidad(self):
+        """
+        Migración 11: tabla de factores de conversión entre unidades (g/Kg, ml/L, Pza)
+        y recetas.factor_almacen, el factor ya resuelto de la unidad de la receta a la
+        unidad de almacén de su ingrediente. Los triggers lo mantienen al día, así que
+        costos, stock estimado y descuento de inventario solo multiplican por él.
+        Solo se recalculan costo y stock estimado de los productos con alguna receta
+        en otra unidad que la de almacén (factor distinto de 1); los demás no cambian.
+        """
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversiones_unidad (
+                unidad_origen TEXT NOT NULL COLLATE NOCASE,
+                unidad_destino TEXT NOT NULL COLLATE NOCASE,
+                factor REAL NOT NULL,
+                PRIMARY KEY (unidad_origen, unidad_destino)
+            ) WITHOUT ROWID
+        ''')
+        self.cursor.executemany('''
+            INSERT OR REPLACE INTO conversiones_unidad (unidad_origen, unidad_destino, factor)
+            VALUES (?, ?, ?)
+        ''', [(origen, destino, base_origen / base_destino)
+              for origen, (magnitud_origen, base_origen) in UNIDADES_MEDIDA.items()
+              for destino, (magnitud_destino, base_destino) in UNIDADES_MEDIDA.items()
+              if magnitud_origen == magnitud_destino])
+        
+        if not self._column_exists('recetas', 'factor_almacen'):
+            self.cursor.execute('ALTER TABLE recetas ADD COLUMN factor_almacen REAL NOT NULL DEFAULT 1')
+        
+        factor = self.SQL_FACTOR_ALMACEN.format(receta='recetas')
+        self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_recetas_factor_insert
+            AFTER INSERT ON recetas
+            BEGIN
+                UPDATE recetas SET factor_almacen = ({factor}) WHERE id = NEW.id;
+            END
+        ''')
+        self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_recetas_factor_update
+            AFTER UPDATE OF unidad_porcionamiento, id_ingrediente ON recetas
+            BEGIN
+                UPDATE recetas SET factor_almacen = ({factor}) WHERE id = NEW.id;
+            END
+        ''')
+        self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_ingredientes_factor
+            AFTER UPDATE OF id, unidad_almacen ON ingredientes
+            BEGIN
+                UPDATE recetas SET factor_almacen = ({factor}) WHERE id_ingrediente = NEW.id;
+            END
+        ''')
+        
+        self.cursor.execute(f'UPDATE recetas SET factor_almacen = ({factor})')
+        
+        # Recetas que ya usaban otra unidad que la de almacén cambian de costo y de stock
+        convertidos = 'SELECT DISTINCT id_producto FROM recetas WHERE factor_almacen != 1'
+        ids_productos = [row[0] for row in self.cursor.execute(convertidos).fetchall()]
+        if not ids_productos:
+            return
+        
+        self._escribir_costos({}, ids_productos)
+        self._actualizar_stocks_estimados(convertidos)
+    
+    # Llave del producto en resumen_productos_dia: su id, o el nombre para las
+    # líneas sin id_producto (ventas manuales). El prefijo evita que un nombre
+    # como '12' se confunda con el producto 12; renombrar no cambia la llave.
+    SQL_CLAVE_RESUMEN = "COALESCE(CAST({linea}.id_producto AS TEXT), 'nombre:' || {linea}.producto)"
+    
+    def _migracion_trabajos_impresion(self):
+        """
+        Migración 12: cola de impresión de tickets (ver print_queue.py). estado es
+        pendiente (incluye reintentos), listo o fallido. fecha_iso sirve para purgar
+        los fallidos viejos; los trabajos de antes de la migración no la tienen.
+        """
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS trabajos_impresion (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                numero_venta INTEGER,
+                datos TEXT,
+                ruta_pdf TEXT,
+                imprimir INTEGER DEFAULT 0,
+                estado TEXT NOT NULL DEFAULT 'pendiente',
+                intentos INTEGER DEFAULT 0,
+                error TEXT,
+                fecha_creacion TEXT,
+                fecha_iso TEXT
+            )
+        ''')
+        if not self._column_exists('trabajos_impresion', 'fecha_iso'):
+            self.cursor.execute('ALTER TABLE trabajos_impresion ADD COLUMN fecha_iso TEXT')
+        
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_trabajos_impresion_estado
+            ON trabajos_impresion(estado)
+        ''')
+    
+    def _sql_sumar_linea(self, linea: str, signo: str) -> str:
+        """
+        Sentencias que suman (signo '+') o restan (signo '-') una línea de venta
+        al resumen de productos del día de su ticket
+        """
+        clave = self.SQL_CLAVE_RESUMEN.format(linea=linea)
+        limpiar = f'''
+            DELETE FROM resumen_productos_dia
+            WHERE dia = (SELECT SUBSTR(fecha_iso, 1, 10) FROM tickets WHERE id = {linea}.id_ticket)
+              AND clave = {clave} AND num_lineas <= 0;
+        ''' if signo == '-' else ''
+        # El nombre que se muestra es el de la última línea sumada
+        nombre = 'producto = excluded.producto,' if signo == '+' else ''
+        
+        return f'''
+            INSERT INTO resumen_productos_dia (dia, clave, producto, id_producto, cantidad,
+                                               num_lineas, total, costo)
+            SELECT SUBSTR(fecha_iso, 1, 10), {clave}, {linea}.producto, {linea}.id_producto,
+                   {signo}{linea}.cantidad, {signo}1, {signo}{linea}.total,
+                   {signo}{linea}.costo_unitario * {linea}.cantidad
+            FROM tickets
+            WHERE id = {linea}.id_ticket AND fecha_iso IS NOT NULL
+            ON CONFLICT (dia, clave) DO UPDATE SET
+                {nombre}
+                cantidad = cantidad + excluded.cantidad,
+                num_lineas = num_lineas + excluded.num_lineas,
+                total = total + excluded.total,
+                costo = costo + excluded.costo;
+            {limpiar}
+        '''
+    
+    def _sql_sumar_ticket(self, ticket: str, signo: str) -> str:
+        """Sentencias que suman o restan un ticket al resumen de pagos de su día"""
+        limpiar = f'''
+            DELETE FROM resumen_pagos_dia
+            WHERE dia = SUBSTR({ticket}.fecha_iso, 1, 10)
+              AND metodo_pago = COALESCE({ticket}.metodo_pago, 'Efectivo') AND num_tickets <= 0;
+        ''' if signo == '-' else ''
+        
+        return f'''
+            INSERT INTO resumen_pagos_dia (dia, metodo_pago, num_tickets, subtotal, propinas)
+            SELECT SUBSTR({ticket}.fecha_iso, 1, 10), COALESCE({ticket}.metodo_pago, 'Efectivo'),
+                   {signo}1, {signo}{ticket}.subtotal, {signo}COALESCE({ticket}.propina, 0)
+            WHERE {ticket}.fecha_iso IS NOT NULL
+            ON CONFLICT (dia, metodo_pago) DO UPDATE SET
+                num_tickets = num_tickets + excluded.num_tickets,
+                subtotal = subtotal + excluded.subtotal,
+                propinas = propinas + excluded.propinas;
+            {limpiar}
+        '''
+    
+    def _crear_triggers_resumenes(self):
+        """Triggers que mantienen resumen_productos_dia y resumen_pagos_dia al día"""
+        clave = self.SQL_CLAVE_RESUMEN.format(linea='venta_lineas')
+        self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_resumen_lineas_insert
+            AFTER INSERT ON venta_lineas
+            BEGIN
+                {self._sql_sumar_linea('NEW', '+')}
+            END
+        ''')
+        self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_resumen_lineas_update
+            AFTER UPDATE OF producto, id_producto, cantidad, total, costo_unitario, id_ticket
+            ON venta_lineas
+            BEGIN
+                {self._sql_sumar_linea('OLD', '-')}
+                {self._sql_sumar_linea('NEW', '+')}
+            END
+        ''')
+        # BEFORE: al borrar la última línea, trg_venta_lineas_delete elimina el ticket
+        # y ya no se podría saber de qué día era
+        self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_resumen_lineas_delete
+            BEFORE DELETE ON venta_lineas
+            BEGIN
+                {self._sql_sumar_linea('OLD', '-')}
+            END
+        ''')
+        
+        self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_resumen_tickets_insert
+            AFTER INSERT ON tickets
+            BEGIN
+                {self._sql_sumar_ticket('NEW', '+')}
+            END
+        ''')
+        self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_resumen_tickets_update
+            AFTER UPDATE OF fecha_iso, metodo_pago, subtotal, propina ON tickets
+            BEGIN
+                {self._sql_sumar_ticket('OLD', '-')}
+                {self._sql_sumar_ticket('NEW', '+')}
+            END
+        ''')
+        self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_resumen_tickets_delete
+            AFTER DELETE ON tickets
+            BEGIN
+                {self._sql_sumar_ticket('OLD', '-')}
+            END
+        ''')
+        
+        # Si cambia el día del ticket, sus líneas pasan al resumen del nuevo día
+        self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_resumen_tickets_fecha
+            AFTER UPDATE OF fecha_iso ON tickets
+            WHEN SUBSTR(OLD.fecha_iso, 1, 10) IS NOT SUBSTR(NEW.fecha_iso, 1, 10)
+            BEGIN
+                INSERT INTO resumen_productos_dia (dia, clave, producto, id_producto, cantidad,
+                                                   num_lineas, total, costo)
+                SELECT dia, {clave}, MAX(producto), id_producto, signo * SUM(cantidad),
+                       signo * COUNT(*), signo * SUM(total), signo * SUM(costo_unitario * cantidad)
+                FROM venta_lineas,
+                     (SELECT SUBSTR(OLD.fecha_iso, 1, 10) AS dia, -1 AS signo
+                      UNION ALL
+                      SELECT SUBSTR(NEW.fecha_iso, 1, 10), 1)
+                WHERE id_ticket = NEW.id AND dia IS NOT NULL
+                GROUP BY dia, {clave}
+                ON CONFLICT (dia, clave) DO UPDATE SET
+                    cantidad = cantidad + excluded.cantidad,
+                    num_lineas = num_lineas + excluded.num_lineas,
+                    total = total + excluded.total,
+                    costo = costo + excluded.costo;
+                DELETE FROM resumen_productos_dia
+                WHERE dia = SUBSTR(OLD.fecha_iso, 1, 10) AND num_lineas <= 0;
+            END
+        ''')
+    
+    def _llenar_resumenes(self):
+        """Calcula los resúmenes desde tickets y venta_lineas (no hace commit)"""
+        self.cursor.execute('DELETE FROM resumen_productos_dia')
+        self.cursor.execute('DELETE FROM resumen_pagos_dia')
+        
+        clave = self.SQL_CLAVE_RESUMEN.format(linea='l')
+        # Con MAX(l.id), SQLite toma l.producto de esa misma fila: el nombre que queda
+        # es el de la última línea del día, como en los triggers
+        self.cursor.execute(f'''
+            INSERT INTO resumen_productos_dia (dia, clave, producto, id_producto, cantidad,
+                                               num_lineas, total, costo)
+            SELECT dia, clave, producto, id_producto, cantidad, num_lineas, total, costo
+            FROM (
+                SELECT SUBSTR(t.fecha_iso, 1, 10) AS dia, {clave} AS clave, MAX(l.id),
+                       l.producto, l.id_producto, SUM(l.cantidad) AS cantidad,
+                       COUNT(*) AS num_lineas, SUM(l.total) AS total,
+                       SUM(l.costo_unitario * l.cantidad) AS costo
+                FROM venta_lineas l
+                JOIN tickets t ON t.id = l.id_ticket
+                WHERE t.fecha_iso IS NOT NULL
+                GROUP BY SUBSTR(t.fecha_iso, 1, 10), {clave}
+            )
+        ''')
+        
+        self.cursor.execute('''
+            INSERT INTO resumen_pagos_dia (dia, metodo_pago, num_tickets, subtotal, propinas)
+            SELECT SUBSTR(fecha_iso, 1, 10), COALESCE(metodo_pago, 'Efectivo'), COUNT(*),
+                   SUM(subtotal), SUM(COALESCE(propina, 0))
+            FROM tickets
+            WHERE fecha_iso IS NOT NULL
+            GROUP BY SUBSTR(fecha_iso, 1, 10), COALESCE(metodo_pago, 'Efectivo')
+        ''')
+    
+    # Factor para pasar la cantidad de una receta a la unidad de almacén de su
+    # ingrediente; 1 si son la misma unidad o no hay conversión (p. ej. Pza contra Kg)
+    SQL_FACTOR_ALMACEN = '''
+        SELECT COALESCE((
+            SELECT c.factor
+            FROM conversiones_unidad c
+            JOIN ingredientes i ON i.id = {receta}.id_ingrediente
+            WHERE c.unidad_origen = {receta}.unidad_porcionamiento
+              AND c.unidad_destino = i.unidad_almacen
+        ), 1)
+    '''
+    
+    # Costo de los ingredientes de un producto según sus recetas, en centavos. Los
+    # ingredientes dados de baja no suman (cuestan 0, como en costeo.GrafoRecetas);
+    # NULL solo si el producto no tiene receta
+    SQL_COSTO_RECETA = '''
+        SELECT CAST(ROUND(SUM(r.cantidad_requerida * r.factor_almacen *
+                              CASE WHEN i.activo = 1 THEN i.costo_unitario ELSE 0 END))
+                    AS INTEGER)
+        FROM recetas r
+        JOIN ingredientes i ON i.id = r.id_ingrediente
+        WHERE r.id_producto = {id_producto}
+    '''
+    
+    # Cuántas unidades de un producto alcanzan con el stock actual de sus ingredientes
+    SQL_STOCK_ESTIMADO = '''
+        SELECT COALESCE(CAST(MIN(i.cantidad_stock / (r.cantidad_requerida * r.factor_almacen))
+                             AS INTEGER), 0)
+        FROM recetas r
+        JOIN ingredientes i ON r.id_ingrediente = i.id
+        WHERE r.id_producto = {id_producto} AND i.activo = 1
+          AND r.cantidad_requerida > 0
+    '''
+    
+    def _sql_costos_linea(self, id_producto: str) -> str:
+        """
+        Expresiones SQL para (costo_unitario, costo_receta) de una línea nueva:
+        el costo del producto y el de su receta en este momento
+        """
+        return (f"COALESCE((SELECT costo FROM productos WHERE id = {id_producto}), 0), "
+                f"({self.SQL_COSTO_RECETA.format(id_producto=id_producto)})")
+    
+    def _reconstruir_en_centavos(self, tabla: str, columnas: tuple):
+        """
+        Reconstruye una tabla con las columnas indicadas como INTEGER y sus valores
+        convertidos de pesos a centavos. Conserva ids e índices. No hace commit.
+        """
+        ddl = self.cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone()
+        if not ddl:
+            return
+        ddl = ddl['sql']
+        
+        indices = [row['sql'] for row in self.cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (tabla,)).fetchall()]
+        
+        nueva = f'{tabla}_centavos'
+        ddl = re.sub(rf'CREATE TABLE\s+(IF NOT EXISTS\s+)?{tabla}\b', f'CREATE TABLE {nueva}', ddl, count=1)
+        for columna in columnas:
+            ddl = re.sub(rf'\b{columna}\s+REAL\b', f'{columna} INTEGER', ddl)
+        self.cursor.execute(ddl)
+        
+        todas = [col['name'] for col in self.cursor.execute(f'PRAGMA table_info({tabla})').fetchall()]
+        valores = [f'CAST(ROUND({col} * 100) AS INTEGER)' if col in columnas else col for col in todas]
+        self.cursor.execute(f'''
+            INSERT INTO {nueva} ({', '.join(todas)})
+            SELECT {', '.join(valores)} FROM {tabla}
+        ''')
+        
+        self.cursor.execute(f'DROP TABLE {tabla}')
+        self.cursor.execute(f'ALTER TABLE {nueva} RENAME TO {tabla}')
+        
+        for indice in indices:
+            self.cursor.execute(indice)
+    
     def init_config(self):
         """Inicializa configuraciones por defecto"""
         configs = [
@@ -173,19 +1078,44 @@ class Database:
     # ==================== CONFIGURACIÓN ====================
     
     def get_config(self, clave: str) -> Optional[str]:
-        """Obtiene un valor de configuración"""
-        self.cursor.execute('SELECT valor FROM configuracion WHERE clave = ?', (clave,))
-        result = self.cursor.fetchone()
-        return result['valor'] if result else None
+        """Obtiene un valor de configuración (desde la caché en memoria)"""
+        if self._config_cache is None:
+            self._load_config_cache()
+        return self._config_cache.get(clave)
     
     def set_config(self, clave: str, valor: str):
         """Establece un valor de configuración"""
+        self._write_config(clave, valor)
+        self.conn.commit()
+        self._cache_config(clave, valor)
+    
+    def invalidate_config_cache(self):
+        """
+        Descarta la caché de configuración.
+        Usar si la tabla configuracion se modificó fuera de set_config.
+        """
+        self._config_cache = None
+    
+    def _load_config_cache(self):
+        """Carga toda la tabla configuracion en memoria"""
+        self.cursor.execute('SELECT clave, valor FROM configuracion')
+        self._config_cache = {row['clave']: row['valor'] for row in self.cursor.fetchall()}
+    
+    def _cache_config(self, clave: str, valor: str):
+        """Actualiza la caché después de un commit"""
+        if self._config_cache is not None:
+            self._config_cache[clave] = valor
+    
+    def _write_config(self, clave: str, valor: str):
+        """
+        Escribe un valor de configuración sin hacer commit (uso dentro de transacciones).
+        La caché se actualiza con _cache_config una vez confirmada la transacción.
+        """
         fecha = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
         self.cursor.execute('''
             INSERT OR REPLACE INTO configuracion (clave, valor, fecha_modificacion)
             VALUES (?, ?, ?)
         ''', (clave, valor, fecha))
-        self.conn.commit()
     
     def is_gestion_stock_active(self) -> bool:
         """Verifica si la gestión de stock está activa globalmente"""
@@ -214,43 +1144,38 @@ class Database:
         self.cursor.execute(f'SELECT id FROM {table} WHERE id = ?', (id_value,))
         return self.cursor.fetchone() is not None
     
-    def reorganize_ids(self, table: str):
-        """Reorganiza los IDs de una tabla para que sean continuos"""
-        # Obtener todos los registros ordenados por ID
-        self.cursor.execute(f'SELECT * FROM {table} WHERE activo = 1 ORDER BY id')
-        registros = [dict(row) for row in self.cursor.fetchall()]
-        
-        # Eliminar todos los registros
-        self.cursor.execute(f'DELETE FROM {table}')
-        
-        # Reinsertar con IDs continuos
-        for idx, registro in enumerate(registros, start=1):
-            old_id = registro['id']
-            registro['id'] = idx
-            
-            # Construir query de inserción
-            columns = ', '.join(registro.keys())
-            placeholders = ', '.join(['?' for _ in registro])
-            values = list(registro.values())
-            
-            self.cursor.execute(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', values)
-            
-            # Actualizar referencias en otras tablas si es necesario
-            if table == 'productos':
-                self.cursor.execute('UPDATE recetas SET id_producto = ? WHERE id_producto = ?', (idx, old_id))
-                self.cursor.execute('UPDATE ventas SET id_producto = ? WHERE id_producto = ?', (idx, old_id))
-            elif table == 'ingredientes':
-                self.cursor.execute('UPDATE recetas SET id_ingrediente = ? WHERE id_ingrediente = ?', (idx, old_id))
-        
-        self.conn.commit()
-    
     # ==================== PRODUCTOS ====================
     
-    def add_producto(self, id_producto: int, nombre: str, precio: float, costo: float, 
+    def invalidate_catalogo(self):
+        """
+        Descarta la caché de productos e incrementa la versión del catálogo.
+        Debe llamarse después de cualquier escritura en la tabla productos.
+        """
+        self._catalogo = None
+        self.catalogo_version += 1
+    
+    def _get_catalogo_cache(self) -> Dict[int, Dict]:
+        """Devuelve la caché de productos, cargándola si es necesario"""
+        if self._catalogo is None:
+            self.cursor.execute('SELECT * FROM productos ORDER BY id')
+            self._catalogo = {row['id']: dict(row) for row in self.cursor.fetchall()}
+        return self._catalogo
+    
+    def get_catalogo(self, desde_version: int = None) -> tuple:
+        """
+        Obtiene el catálogo de productos activos junto con su versión.
+        Si desde_version es la versión actual devuelve (version, None):
+        el catálogo no cambió y no hace falta volver a dibujarlo.
+        """
+        if desde_version is not None and desde_version == self.catalogo_version:
+            return self.catalogo_version, None
+        return self.catalogo_version, self.get_productos()
+    
+    def add_producto(self, id_producto: int, nombre: str, precio: int, costo: int, 
                      unidad: str = 'Pza', gestion_stock: bool = False,
                      stock_estimado: float = 0, stock_minimo: float = 0,
                      imagen: str = None) -> int:
-        """Añade un nuevo producto con ID específico"""
+        """Añade un nuevo producto con ID específico (precio y costo en centavos)"""
         if self.id_exists('productos', id_producto):
             raise ValueError(f"El ID {id_producto} ya existe")
         
@@ -260,29 +1185,24 @@ class Database:
         self.cursor.execute('''
             INSERT INTO productos (id, nombre, precio_unitario, costo, ganancia, 
                                  unidad_medida, stock_estimado, stock_minimo,
-                                 gestion_stock, imagen, fecha_creacion)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                 gestion_stock, imagen, fecha_creacion, nombre_normalizado)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (id_producto, nombre, precio, costo, ganancia, unidad, stock_estimado, 
-              stock_minimo, 1 if gestion_stock else 0, imagen, fecha))
+              stock_minimo, 1 if gestion_stock else 0, imagen, fecha, normalize_text(nombre)))
         
         self.conn.commit()
+        self.invalidate_catalogo()
         return id_producto
     
     def get_productos(self, activos_only: bool = True) -> List[Dict]:
-        """Obtiene todos los productos"""
-        query = 'SELECT * FROM productos'
-        if activos_only:
-            query += ' WHERE activo = 1'
-        query += ' ORDER BY id'
-        
-        self.cursor.execute(query)
-        return [dict(row) for row in self.cursor.fetchall()]
+        """Obtiene todos los productos (desde la caché del catálogo)"""
+        return [dict(p) for p in self._get_catalogo_cache().values()
+                if p['activo'] or not activos_only]
     
     def get_producto(self, id_producto: int) -> Optional[Dict]:
-        """Obtiene un producto por ID"""
-        self.cursor.execute('SELECT * FROM productos WHERE id = ?', (id_producto,))
-        result = self.cursor.fetchone()
-        return dict(result) if result else None
+        """Obtiene un producto por ID (desde la caché del catálogo)"""
+        producto = self._get_catalogo_cache().get(id_producto)
+        return dict(producto) if producto else None
     
     def update_producto(self, old_id: int, new_id: int = None, **kwargs):
         """Actualiza un producto (permite cambiar el ID)"""
@@ -296,10 +1216,11 @@ class Database:
                               (new_id, old_id))
             
             # Actualizar referencias en ventas
-            self.cursor.execute('UPDATE ventas SET id_producto = ? WHERE id_producto = ?', 
+            self.cursor.execute('UPDATE venta_lineas SET id_producto = ? WHERE id_producto = ?', 
                               (new_id, old_id))
             
             kwargs['id'] = new_id
+            self.invalidate_grafo_recetas()
         
         # Recalcular ganancia si se actualiza precio o costo
         if 'precio_unitario' in kwargs or 'costo' in kwargs:
@@ -308,47 +1229,87 @@ class Database:
             costo = kwargs.get('costo', producto['costo'])
             kwargs['ganancia'] = precio - costo
         
+        if 'nombre' in kwargs:
+            kwargs['nombre_normalizado'] = normalize_text(kwargs['nombre'])
+        
         if kwargs:
             fields = ', '.join([f"{k} = ?" for k in kwargs.keys()])
             values = list(kwargs.values()) + [old_id]
             
             self.cursor.execute(f'UPDATE productos SET {fields} WHERE id = ?', values)
             self.conn.commit()
+            self.invalidate_catalogo()
     
     def delete_producto(self, id_producto: int):
-        """Elimina un producto y reorganiza los IDs"""
+        """
+        Da de baja un producto. El ID no se reutiliza: sus ventas, resúmenes y
+        recetas lo siguen referenciando.
+        """
         self.cursor.execute('UPDATE productos SET activo = 0 WHERE id = ?', (id_producto,))
         self.conn.commit()
-        
-        # Reorganizar IDs para que sean continuos
-        self.reorganize_ids('productos')
+        self.invalidate_catalogo()
+    
+    def _search_params(self, query: str) -> Dict[str, str]:
+        """
+        Parámetros para las búsquedas por nombre normalizado.
+        'fin' es el límite superior del rango de prefijo (usa el índice).
+        """
+        q = normalize_text(query.strip())
+        return {'q': q, 'fin': q + '\uffff', 'palabra': ' ' + q}
+    
+    @staticmethod
+    def _rango_sql(columna: str) -> str:
+        """
+        Orden de relevancia de una coincidencia:
+        0 = nombre exacto, 1 = empieza con, 2 = alguna palabra empieza con, 3 = contiene
+        """
+        return f'''CASE
+                WHEN {columna} = :q THEN 0
+                WHEN {columna} >= :q AND {columna} < :fin THEN 1
+                WHEN INSTR({columna}, :palabra) > 0 THEN 2
+                ELSE 3
+            END'''
+    
+    @staticmethod
+    def _coincidencias_sql(tabla: str) -> str:
+        """
+        ids de la tabla cuyo nombre normalizado contiene :q. Los que empiezan con :q
+        salen de un rango del índice idx_{tabla}_nombre_normalizado; el resto
+        ('contiene') recorre solo ese índice, que ya trae id y nombre, no la tabla.
+        """
+        return f'''
+            SELECT id FROM {tabla}
+            WHERE nombre_normalizado >= :q AND nombre_normalizado < :fin
+            UNION ALL
+            SELECT id FROM {tabla}
+            WHERE INSTR(nombre_normalizado, :q) > 0
+              AND NOT (nombre_normalizado >= :q AND nombre_normalizado < :fin)
+        '''
     
     def search_productos(self, query: str) -> List[Dict]:
-        """Busca productos por nombre"""
-        from utils import normalize_text
-        normalized_query = normalize_text(query)
-        
-        self.cursor.execute('SELECT * FROM productos WHERE activo = 1')
-        productos = [dict(row) for row in self.cursor.fetchall()]
-        
-        resultados = [p for p in productos 
-                     if normalized_query in normalize_text(p['nombre'])]
-        
-        return resultados
+        """Busca productos por nombre (sin importar acentos ni mayúsculas), ordenados por relevancia"""
+        params = self._search_params(query)
+        if not params['q']:
+            return self.get_productos()
+        
+        self.cursor.execute(f'''
+            SELECT *, {self._rango_sql('nombre_normalizado')} AS rango
+            FROM productos
+            WHERE activo = 1 AND id IN ({self._coincidencias_sql('productos')})
+            ORDER BY rango, nombre_normalizado, id
+        ''', params)
+        return [dict(row) for row in self.cursor.fetchall()]
     
     def get_next_producto_id(self) -> int:
         """Obtiene el siguiente ID disponible para productos"""
-        self.cursor.execute('SELECT MAX(id) as max_id FROM productos')
-        result = self.cursor.fetchone()
-        max_id = result['max_id'] if result['max_id'] else 0
-        return max_id + 1
+        return max(self._get_catalogo_cache(), default=0) + 1
     
     # ==================== INGREDIENTES ====================
     
     def add_ingrediente(self, id_ingrediente: int, nombre: str, costo_unitario: float,
                        unidad: str = 'Kg', cantidad: float = 0,
                        gestion_stock: bool = False) -> int:
-        """Añade un nuevo ingrediente con ID específico"""
+        """Añade un nuevo ingrediente con ID específico (costo_unitario en centavos por unidad)"""
         if self.id_exists('ingredientes', id_ingrediente):
             raise ValueError(f"El ID {id_ingrediente} ya existe")
         
@@ -356,12 +1317,21 @@ class Database:
         
         self.cursor.execute('''
             INSERT INTO ingredientes (id, nombre, unidad_almacen, costo_unitario,
-                                    cantidad_stock, gestion_stock, fecha_creacion)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (id_ingrediente, nombre, unidad, costo_unitario, cantidad, 
-              1 if gestion_stock else 0, fecha))
+                                    cantidad_stock, gestion_stock, fecha_creacion,
+                                    nombre_normalizado)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (id_ingrediente, nombre, unidad, costo_unitario, 0, 
+              1 if gestion_stock else 0, fecha, normalize_text(nombre)))
+        
+        # El stock inicial entra por el libro de movimientos
+        if cantidad:
+            self._registrar_movimientos(
+                "SELECT ?, 'ajuste', ?, NULL, 'Stock inicial'", [id_ingrediente, cantidad])
         
         self.conn.commit()
+        self.invalidate_grafo_recetas()
+        if cantidad:
+            self.invalidate_catalogo()  # Cambió el stock estimado
         return id_ingrediente
     
     def get_ingredientes(self, activos_only: bool = True) -> List[Dict]:
@@ -386,35 +1356,166 @@ class Database:
             if self.id_exists('ingredientes', new_id):
                 raise ValueError(f"El ID {new_id} ya existe")
             
-            # Actualizar referencias en recetas
+            # Actualizar referencias en recetas y en el libro de movimientos
             self.cursor.execute('UPDATE recetas SET id_ingrediente = ? WHERE id_ingrediente = ?', 
                               (new_id, old_id))
+            self.cursor.execute('''
+                UPDATE movimientos_inventario SET id_ingrediente = ? WHERE id_ingrediente = ?
+            ''', (new_id, old_id))
+            self.cursor.execute('UPDATE subrecetas SET id_ingrediente = ? WHERE id_ingrediente = ?',
+                              (new_id, old_id))
+            self.cursor.execute('UPDATE subrecetas SET id_preparado = ? WHERE id_preparado = ?',
+                              (new_id, old_id))
             
             kwargs['id'] = new_id
         
+        if 'nombre' in kwargs:
+            kwargs['nombre_normalizado'] = normalize_text(kwargs['nombre'])
+        
+        # Un stock escrito a mano se registra como ajuste por la diferencia
+        stock = kwargs.pop('cantidad_stock', None)
+        
         if kwargs:
             fields = ', '.join([f"{k} = ?" for k in kwargs.keys()])
             values = list(kwargs.values()) + [old_id]
             
             self.cursor.execute(f'UPDATE ingredientes SET {fields} WHERE id = ?', values)
-            self.conn.commit()
+        
+        if stock is not None:
+            self._registrar_movimientos('''
+                SELECT id, 'ajuste', ? - COALESCE(cantidad_stock, 0), NULL, 'Ajuste manual'
+                FROM ingredientes
+                WHERE id = ? AND ? != COALESCE(cantidad_stock, 0)
+            ''', [stock, kwargs.get('id', old_id), stock])
+        
+        if 'id' in kwargs or 'activo' in kwargs or 'unidad_almacen' in kwargs:
+            self.invalidate_grafo_recetas()
+        
+        # Un costo nuevo (o un alta/baja o cambio de unidad) se propaga a los preparados
+        # y productos que lo usan
+        if 'costo_unitario' in kwargs or 'activo' in kwargs or 'unidad_almacen' in kwargs:
+            id_actual = kwargs.get('id', old_id)
+            if 'costo_unitario' in kwargs and self._grafo_recetas is not None:
+                self._grafo_recetas.actualizar_costo_base(id_actual, kwargs['costo_unitario'])
+            self._recalcular_costos([id_actual])
+        
+        # Con otra unidad de almacén cambia cuánto alcanza el stock
+        if 'unidad_almacen' in kwargs:
+            self._actualizar_stocks_por_ingredientes('VALUES (?)', [kwargs.get('id', old_id)])
+        
+        self.conn.commit()
+        self.invalidate_catalogo()
     
     def delete_ingrediente(self, id_ingrediente: int):
-        """Elimina un ingrediente y reorganiza los IDs"""
+        """
+        Da de baja un ingrediente (el ID no se reutiliza; su libro de movimientos
+        y las recetas lo siguen referenciando)
+        """
         self.cursor.execute('UPDATE ingredientes SET activo = 0 WHERE id = ?', (id_ingrediente,))
-        self.conn.commit()
         
-        # Reorganizar IDs
-        self.reorganize_ids('ingredientes')
+        # Los productos que lo usan dejan de contarlo en su costo y en su stock estimado
+        self.invalidate_grafo_recetas()
+        self._recalcular_costos([id_ingrediente])
+        self.actualizar_stocks_por_ingredientes([id_ingrediente])
     
     def registrar_compra_ingrediente(self, id_ingrediente: int, cantidad: float):
         """Registra una compra de ingrediente (suma al stock)"""
-        self.cursor.execute('''
-            UPDATE ingredientes 
-            SET cantidad_stock = cantidad_stock + ?
-            WHERE id = ?
-        ''', (cantidad, id_ingrediente))
-        self.conn.commit()
+        self.registrar_movimiento_inventario(id_ingrediente, 'compra', cantidad)
+    
+    def registrar_movimiento_inventario(self, id_ingrediente: int, tipo: str,
+                                        cantidad: float, nota: str = None):
+        """
+        Registra un movimiento de inventario y lo aplica al stock
+        tipo: 'compra' (suma), 'merma' (resta) o 'ajuste' (cantidad con signo)
+        Los movimientos de tipo 'venta' los registra finalizar_venta.
+        """
+        if tipo not in ('compra', 'merma', 'ajuste'):
+            raise ValueError(f"Tipo de movimiento no válido: {tipo}")
+        
+        if tipo == 'compra':
+            cantidad = abs(cantidad)
+        elif tipo == 'merma':
+            cantidad = -abs(cantidad)
+        
+        try:
+            self._registrar_movimientos('SELECT ?, ?, ?, NULL, ?',
+                                        [id_ingrediente, tipo, cantidad, nota])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        
+        self.invalidate_catalogo()  # Cambió el stock estimado
+    
+    def get_movimientos_inventario(self, id_ingrediente: int = None,
+                                   limite: int = 200) -> List[Dict]:
+        """Últimos movimientos de inventario (de un ingrediente o de todos), del más reciente al más antiguo"""
+        filtro = 'WHERE m.id_ingrediente = ?' if id_ingrediente is not None else ''
+        params = [id_ingrediente] if id_ingrediente is not None else []
+        
+        self.cursor.execute(f'''
+            SELECT m.*, i.nombre AS ingrediente, t.numero_venta
+            FROM movimientos_inventario m
+            LEFT JOIN ingredientes i ON i.id = m.id_ingrediente
+            LEFT JOIN tickets t ON t.id = m.id_ticket
+            {filtro}
+            ORDER BY m.id DESC
+            LIMIT ?
+        ''', params + [limite])
+        return [dict(row) for row in self.cursor.fetchall()]
+    
+    def conciliar_inventario(self) -> List[Dict]:
+        """
+        Reconstruye ingredientes.cantidad_stock sumando el libro de movimientos y
+        recalcula el stock estimado de los productos.
+        Retorna los ingredientes cuyo stock no coincidía con el libro
+        (id, nombre, stock_anterior, stock_libro).
+        """
+        libro = '''
+            SELECT COALESCE(SUM(m.cantidad), 0) FROM movimientos_inventario m
+            WHERE m.id_ingrediente = ingredientes.id
+        '''
+        
+        try:
+            if not self.conn.in_transaction:
+                self.cursor.execute('BEGIN IMMEDIATE')
+            
+            self.cursor.execute(f'''
+                SELECT id, nombre, COALESCE(cantidad_stock, 0) AS stock_anterior,
+                       ({libro}) AS stock_libro
+                FROM ingredientes
+                WHERE ABS(COALESCE(cantidad_stock, 0) - ({libro})) > 1e-9
+                ORDER BY id
+            ''')
+            diferencias = [dict(row) for row in self.cursor.fetchall()]
+            
+            if diferencias:
+                self.cursor.execute(f'''
+                    UPDATE ingredientes SET cantidad_stock = ({libro})
+                    WHERE ABS(COALESCE(cantidad_stock, 0) - ({libro})) > 1e-9
+                ''')
+            self._actualizar_stocks_estimados()
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        
+        self.invalidate_catalogo()
+        return diferencias
+    
+    def search_ingredientes(self, query: str) -> List[Dict]:
+        """Busca ingredientes por nombre (sin importar acentos ni mayúsculas), ordenados por relevancia"""
+        params = self._search_params(query)
+        if not params['q']:
+            return self.get_ingredientes()
+        
+        self.cursor.execute(f'''
+            SELECT *, {self._rango_sql('nombre_normalizado')} AS rango
+            FROM ingredientes
+            WHERE activo = 1 AND id IN ({self._coincidencias_sql('ingredientes')})
+            ORDER BY rango, nombre_normalizado, id
+        ''', params)
+        return [dict(row) for row in self.cursor.fetchall()]
     
     def get_next_ingrediente_id(self) -> int:
         """Obtiene el siguiente ID disponible para ingredientes"""
@@ -438,6 +1539,7 @@ class Database:
         ''', (id_receta, id_producto, id_ingrediente, cantidad, unidad))
         
         self.conn.commit()
+        self.invalidate_grafo_recetas()
         
         # Recalcular costo del producto
         self.recalcular_costo_producto(id_producto)
@@ -467,6 +1569,26 @@ class Database:
         ''')
         return [dict(row) for row in self.cursor.fetchall()]
     
+    def search_recetas(self, query: str) -> List[Dict]:
+        """Busca recetas por nombre de producto o de ingrediente, ordenadas por relevancia"""
+        params = self._search_params(query)
+        if not params['q']:
+            return self.get_todas_recetas()
+        
+        self.cursor.execute(f'''
+            SELECT r.*, p.nombre as producto_nombre, i.nombre as ingrediente_nombre,
+                   MIN({self._rango_sql('p.nombre_normalizado')},
+                       {self._rango_sql('i.nombre_normalizado')}) AS rango
+            FROM recetas r
+            JOIN productos p ON r.id_producto = p.id
+            JOIN ingredientes i ON r.id_ingrediente = i.id
+            WHERE p.activo = 1 AND i.activo = 1
+              AND (p.id IN ({self._coincidencias_sql('productos')})
+                   OR i.id IN ({self._coincidencias_sql('ingredientes')}))
+            ORDER BY rango, r.id
+        ''', params)
+        return [dict(row) for row in self.cursor.fetchall()]
+    
     def get_receta(self, id_receta: int) -> Optional[Dict]:
         """Obtiene una receta por ID"""
         self.cursor.execute('''
@@ -492,6 +1614,7 @@ class Database:
             
             self.cursor.execute(f'UPDATE recetas SET {fields} WHERE id = ?', values)
             self.conn.commit()
+            self.invalidate_grafo_recetas()
         
         # Recalcular costo del producto
         receta = self.get_receta(new_id if new_id else old_id)
@@ -499,15 +1622,13 @@ class Database:
             self.recalcular_costo_producto(receta['id_producto'])
     
     def delete_receta(self, id_receta: int):
-        """Elimina una receta y reorganiza los IDs"""
+        """Elimina una receta (los IDs de las demás no cambian)"""
         # Obtener el producto antes de eliminar
         receta = self.get_receta(id_receta)
         
         self.cursor.execute('DELETE FROM recetas WHERE id = ?', (id_receta,))
         self.conn.commit()
-        
-        # Reorganizar IDs
-        self.reorganize_ids('recetas')
+        self.invalidate_grafo_recetas()
         
         # Recalcular costo del producto
         if receta:
@@ -522,71 +1643,186 @@ class Database:
     
     def recalcular_costo_producto(self, id_producto: int):
         """Recalcula el costo de un producto basado en sus recetas"""
-        recetas = self.get_recetas_producto(id_producto)
+        self._escribir_costos({}, [id_producto])
+        self.conn.commit()
+        self.invalidate_catalogo()
+    
+    def get_grafo_recetas(self) -> GrafoRecetas:
+        """
+        Grafo de recetas y subrecetas para el costeo (se arma una vez y se guarda
+        hasta que cambian recetas, subrecetas o ingredientes)
+        """
+        if self._grafo_recetas is None:
+            ingredientes = self.cursor.execute(
+                'SELECT id, costo_unitario, activo FROM ingredientes').fetchall()
+            recetas = self.cursor.execute('SELECT id_producto, id_ingrediente FROM recetas').fetchall()
+            subrecetas = self.cursor.execute(
+                'SELECT id_preparado, id_ingrediente, cantidad_requerida FROM subrecetas').fetchall()
+            
+            self._grafo_recetas = GrafoRecetas(
+                {row['id']: row['costo_unitario'] for row in ingredientes},
+                [tuple(row) for row in recetas],
+                [tuple(row) for row in subrecetas],
+                inactivos=[row['id'] for row in ingredientes if not row['activo']])
         
-        if not recetas:
-            return
+        return self._grafo_recetas
+    
+    def invalidate_grafo_recetas(self):
+        """Descarta el grafo de recetas; debe llamarse al cambiar recetas, subrecetas o ingredientes"""
+        self._grafo_recetas = None
+    
+    def recalcular_costos(self, ids_ingredientes: list = None) -> Dict[str, int]:
+        """
+        Recalcula en una sola transacción el costo de los preparados y productos que
+        dependen de los ingredientes indicados (o de todos si es None)
+        Retorna cuántos preparados y productos se recalcularon
+        """
+        try:
+            if not self.conn.in_transaction:
+                self.cursor.execute('BEGIN IMMEDIATE')
+            resultado = self._recalcular_costos(ids_ingredientes)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        
+        self.invalidate_catalogo()
+        return resultado
+    
+    def _recalcular_costos(self, ids_ingredientes: list = None) -> Dict[str, int]:
+        """Igual que recalcular_costos, sin hacer commit"""
+        preparados, productos = self.get_grafo_recetas().recalcular(ids_ingredientes)
+        self._escribir_costos(preparados, productos)
+        return {'preparados': len(preparados), 'productos': len(productos)}
+    
+    def _escribir_costos(self, preparados: Dict[int, float], productos: List[int]):
+        """
+        Guarda el costo_unitario de los preparados calculado con el grafo y luego
+        el costo y la ganancia de los productos con SQL_COSTO_RECETA, la misma
+        expresión que registra costo_receta al vender. Los productos sin receta
+        conservan su costo.
+        """
+        self.cursor.executemany('UPDATE ingredientes SET costo_unitario = ? WHERE id = ?',
+                                [(costo, id_preparado) for id_preparado, costo in preparados.items()])
+        
+        self.cursor.executemany(f'''
+            UPDATE productos
+            SET costo = ({self.SQL_COSTO_RECETA.format(id_producto='productos.id')})
+            WHERE id = ? AND EXISTS (SELECT 1 FROM recetas WHERE id_producto = productos.id)
+        ''', [(id_producto,) for id_producto in productos])
+        self.cursor.executemany('UPDATE productos SET ganancia = precio_unitario - costo WHERE id = ?',
+                                [(id_producto,) for id_producto in productos])
+    
+    # ==================== SUBRECETAS ====================
+    
+    def add_subreceta(self, id_preparado: int, id_ingrediente: int, cantidad: float):
+        """
+        Agrega (o reemplaza) un componente de la subreceta de un ingrediente preparado:
+        cantidad de id_ingrediente por unidad del preparado. Recalcula los costos que
+        dependen del preparado. Lanza CicloRecetaError si el preparado terminaría
+        usándose a sí mismo.
+        """
+        if self.get_grafo_recetas().crearia_ciclo(id_preparado, id_ingrediente):
+            raise CicloRecetaError("El ingrediente no puede formar parte de su propia subreceta")
         
-        costo_total = sum(r['cantidad_requerida'] * r['costo_unitario'] for r in recetas)
+        try:
+            self.cursor.execute('''
+                INSERT INTO subrecetas (id_preparado, id_ingrediente, cantidad_requerida)
+                VALUES (?, ?, ?)
+                ON CONFLICT (id_preparado, id_ingrediente)
+                DO UPDATE SET cantidad_requerida = excluded.cantidad_requerida
+            ''', (id_preparado, id_ingrediente, cantidad))
+            self.invalidate_grafo_recetas()
+            self._recalcular_costos([id_preparado])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            self.invalidate_grafo_recetas()
+            raise
         
+        self.invalidate_catalogo()
+    
+    def get_subrecetas(self, id_preparado: int) -> List[Dict]:
+        """Componentes de un ingrediente preparado"""
         self.cursor.execute('''
-            UPDATE productos 
-            SET costo = ?, ganancia = precio_unitario - ?
-            WHERE id = ?
-        ''', (costo_total, costo_total, id_producto))
+            SELECT s.*, i.nombre AS ingrediente_nombre, i.unidad_almacen, i.costo_unitario
+            FROM subrecetas s
+            JOIN ingredientes i ON i.id = s.id_ingrediente
+            WHERE s.id_preparado = ? AND i.activo = 1
+            ORDER BY s.id
+        ''', (id_preparado,))
+        return [dict(row) for row in self.cursor.fetchall()]
+    
+    def delete_subreceta(self, id_preparado: int, id_ingrediente: int):
+        """
+        Quita un componente de la subreceta de un preparado y recalcula los costos.
+        Si era el último, el preparado se queda con su último costo como costo propio.
+        """
+        try:
+            self.cursor.execute('DELETE FROM subrecetas WHERE id_preparado = ? AND id_ingrediente = ?',
+                              (id_preparado, id_ingrediente))
+            self.invalidate_grafo_recetas()
+            self._recalcular_costos([id_preparado])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            self.invalidate_grafo_recetas()
+            raise
         
-        self.conn.commit()
+        self.invalidate_catalogo()
     
     def calcular_stock_estimado(self, id_producto: int) -> float:
         """Calcula el stock estimado de un producto basado en sus ingredientes"""
-        recetas = self.get_recetas_producto(id_producto)
-        
-        if not recetas:
-            return 0
-        
-        capacidades = []
-        for receta in recetas:
-            if receta['cantidad_requerida'] > 0:
-                capacidad = receta['cantidad_stock'] / receta['cantidad_requerida']
-                capacidades.append(capacidad)
-        
-        return int(min(capacidades)) if capacidades else 0
+        self.cursor.execute(self.SQL_STOCK_ESTIMADO.format(id_producto='?'), (id_producto,))
+        return self.cursor.fetchone()[0]
     
     def actualizar_stock_estimado(self, id_producto: int):
         """Actualiza el stock estimado de un producto en la base de datos"""
-        stock = self.calcular_stock_estimado(id_producto)
-        self.cursor.execute('UPDATE productos SET stock_estimado = ? WHERE id = ?', 
-                          (stock, id_producto))
+        self.cursor.execute(f'''
+            UPDATE productos
+            SET stock_estimado = ({self.SQL_STOCK_ESTIMADO.format(id_producto='productos.id')})
+            WHERE id = ?
+        ''', (id_producto,))
         self.conn.commit()
+        self.invalidate_catalogo()
     
     def actualizar_todos_stocks_estimados(self):
         """Actualiza el stock estimado de todos los productos con gestión de stock"""
-        productos = self.cursor.execute('''
-            SELECT id FROM productos WHERE gestion_stock = 1 AND activo = 1
-        ''').fetchall()
+        self._actualizar_stocks_estimados()
+        self.conn.commit()
+        self.invalidate_catalogo()
+    
+    def actualizar_stocks_por_ingredientes(self, ids_ingredientes: list):
+        """
+        Actualiza el stock estimado solo de los productos que usan alguno de los
+        ingredientes indicados (una sentencia, un commit)
+        """
+        if not ids_ingredientes:
+            return
         
-        for producto in productos:
-            self.actualizar_stock_estimado(producto['id'])
+        marcadores = ', '.join(['(?)'] * len(ids_ingredientes))
+        self._actualizar_stocks_por_ingredientes(f'VALUES {marcadores}', list(ids_ingredientes))
+        self.conn.commit()
+        self.invalidate_catalogo()
     
     # ==================== VENTAS ====================
     
-    def descontar_inventario_por_venta(self, id_producto: int, cantidad_vendida: float):
-        """Descuenta del inventario de ingredientes según la venta de un producto"""
-        recetas = self.get_recetas_producto(id_producto)
-        
-        for receta in recetas:
-            cantidad_a_descontar = receta['cantidad_requerida'] * cantidad_vendida
-            
-            self.cursor.execute('''
-                UPDATE ingredientes
-                SET cantidad_stock = cantidad_stock - ?
-                WHERE id = ?
-            ''', (cantidad_a_descontar, receta['id_ingrediente']))
-        
-        self.conn.commit()
+    def descontar_inventario_por_venta(self, id_producto: int, cantidad_vendida: float,
+                                       id_ticket: int = None):
+        """
+        Descuenta del inventario de ingredientes según la venta de un producto
+        (mismo camino que finalizar_venta; actualiza el stock estimado de todos los
+        productos que comparten esos ingredientes)
+        """
+        try:
+            self._descontar_inventario_lineas([{'id': id_producto, 'cantidad': cantidad_vendida}],
+                                              id_ticket)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
         
-        # Actualizar stock estimado del producto
-        self.actualizar_stock_estimado(id_producto)
+        self.invalidate_catalogo()
     
     # ==================== VENTAS (continuación) ====================
     
@@ -596,51 +1832,209 @@ class Database:
         return int(ultimo) + 1 if ultimo else 1
     
     def add_venta(self, numero_venta: int, producto: str, id_producto: int,
-                  cantidad: float, precio: float, total: float,
+                  cantidad: float, precio: int, total: int,
                   metodo_pago: str = 'Efectivo', mesa: str = None, 
-                  propina: float = 0) -> int:
-        """Añade una venta"""
-        from utils import get_current_datetime  # Import aquí por si acaso
-        fecha = get_current_datetime()
+                  propina: int = 0) -> int:
+        """
+        Añade una línea de venta; si el ticket con ese número aún no existe se crea
+        (la propina solo se registra al crear el ticket)
+        """
+        fecha, fecha_iso = self._get_current_timestamps()
         
-        self.cursor.execute('''
-            INSERT INTO ventas (numero_venta, fecha, producto, id_producto, cantidad,
-                              precio_unitario, total, metodo_pago, mesa, propina)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (numero_venta, fecha, producto, id_producto, cantidad, precio, 
-              total, metodo_pago, mesa, propina))
+        self.cursor.execute('SELECT id FROM tickets WHERE numero_venta = ? ORDER BY id DESC LIMIT 1',
+                          (numero_venta,))
+        ticket = self.cursor.fetchone()
+        
+        if ticket:
+            id_ticket = ticket['id']
+        else:
+            self.cursor.execute('''
+                INSERT INTO tickets (numero_venta, fecha, fecha_iso, metodo_pago, mesa, propina)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (numero_venta, fecha, fecha_iso, metodo_pago, mesa, propina))
+            id_ticket = self.cursor.lastrowid
+        
+        self.cursor.execute(f'''
+            INSERT INTO venta_lineas (id_ticket, producto, id_producto, cantidad,
+                                      precio_unitario, total, costo_unitario, costo_receta)
+            VALUES (?, ?, ?, ?, ?, ?, {self._sql_costos_linea('?')})
+        ''', (id_ticket, producto, id_producto, cantidad, precio, total, id_producto, id_producto))
+        id_linea = self.cursor.lastrowid
         
         self.conn.commit()
         
         # Actualizar último número de venta
         self.set_config('ultimo_numero_venta', str(numero_venta))
         
-        return self.cursor.lastrowid
+        return id_linea
     
     def finalizar_venta(self, productos: list, metodo_pago: str, mesa: str = None,
-                       propina: float = 0) -> int:
+                       propina: int = 0) -> int:
         """
-        Finaliza una venta completa
-        productos = [{'id': 1, 'nombre': 'Tacos', 'cantidad': 2, 'precio': 15.00, 'total': 30.00}, ...]
+        Finaliza una venta completa en una sola transacción
+        productos = [{'id': 1, 'nombre': 'Tacos', 'cantidad': 2, 'precio': 1500, 'total': 3000}, ...]
+        (importes en centavos)
+        
+        El número de venta se asigna dentro de la transacción, se escribe un ticket
+        con sus líneas en lote y el inventario se descuenta con una sola sentencia.
+        Si algo falla no queda nada escrito.
         """
-        numero_venta = self.get_next_numero_venta()
+        gestion_stock = self.is_gestion_stock_active()
+        fecha, fecha_iso = self._get_current_timestamps()
         
-        for prod in productos:
-            self.add_venta(numero_venta, prod['nombre'], prod['id'],
-                          prod['cantidad'], prod['precio'], prod['total'],
-                          metodo_pago, mesa, propina)
+        try:
+            # Bloqueo de escritura desde el inicio para que el número de venta no se repita
+            if not self.conn.in_transaction:
+                self.cursor.execute('BEGIN IMMEDIATE')
+            
+            self.cursor.execute(
+                "SELECT valor FROM configuracion WHERE clave = 'ultimo_numero_venta'")
+            result = self.cursor.fetchone()
+            numero_venta = int(result['valor']) + 1 if result and result['valor'] else 1
+            
+            self.cursor.execute('''
+                INSERT INTO tickets (numero_venta, fecha, fecha_iso, metodo_pago, mesa, propina)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (numero_venta, fecha, fecha_iso, metodo_pago, mesa, propina))
+            id_ticket = self.cursor.lastrowid
+            
+            # Los costos se copian del producto y su receta para conservar los de este momento
+            self.cursor.executemany(f'''
+                INSERT INTO venta_lineas (id_ticket, producto, id_producto, cantidad,
+                                          precio_unitario, total, costo_unitario, costo_receta)
+                VALUES (?, ?, ?, ?, ?, ?, {self._sql_costos_linea('?')})
+            ''', [(id_ticket, prod['nombre'], prod['id'], prod['cantidad'],
+                   prod['precio'], prod['total'], prod['id'], prod['id'])
+                  for prod in productos])
             
-            # Descontar inventario si el producto gestiona stock
-            producto_db = self.get_producto(prod['id'])
-            if producto_db and producto_db['gestion_stock'] and self.is_gestion_stock_active():
-                self.descontar_inventario_por_venta(prod['id'], prod['cantidad'])
+            if gestion_stock and productos:
+                self._descontar_inventario_lineas(productos, id_ticket)
+            
+            self._write_config('ultimo_numero_venta', str(numero_venta))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        
+        self._cache_config('ultimo_numero_venta', str(numero_venta))
+        if gestion_stock and productos:
+            self.invalidate_catalogo()  # Cambió el stock estimado
         
         return numero_venta
     
+    def get_ticket(self, numero_venta: int) -> Optional[Dict]:
+        """
+        Obtiene un ticket con sus líneas (para reimprimir)
+        Retorna el mismo formato que recibe TicketGenerator.generate_ticket_pdf
+        """
+        self.cursor.execute('SELECT * FROM tickets WHERE numero_venta = ? ORDER BY id DESC LIMIT 1',
+                          (numero_venta,))
+        ticket = self.cursor.fetchone()
+        if not ticket:
+            return None
+        
+        self.cursor.execute('''
+            SELECT id_producto AS id, producto AS nombre, cantidad,
+                   precio_unitario AS precio, total
+            FROM venta_lineas
+            WHERE id_ticket = ?
+            ORDER BY id
+        ''', (ticket['id'],))
+        
+        venta = dict(ticket)
+        venta['productos'] = [dict(row) for row in self.cursor.fetchall()]
+        venta['total'] = venta['subtotal'] + (venta['propina'] or 0)
+        return venta
+    
+    def _descontar_inventario_lineas(self, productos: list, id_ticket: int = None):
+        """
+        Registra como movimientos de venta el consumo de ingredientes de todas las
+        líneas de una venta (solo productos con gestión de stock) y lo descuenta del
+        inventario. El costo no depende del número de ingredientes: una sentencia para
+        el libro, una para el stock y una para el stock estimado. No hace commit.
+        """
+        valores = ', '.join(['(?, ?)'] * len(productos))
+        params = []
+        for prod in productos:
+            params.extend([prod['id'], prod['cantidad']])
+        
+        self._registrar_movimientos(f'''
+            SELECT r.id_ingrediente, 'venta', -SUM(r.cantidad_requerida * r.factor_almacen * l.column2),
+                   ?, NULL
+            FROM (VALUES {valores}) AS l
+            JOIN productos p ON p.id = l.column1 AND p.gestion_stock = 1
+            JOIN recetas r ON r.id_producto = l.column1
+            JOIN ingredientes i ON i.id = r.id_ingrediente AND i.activo = 1
+            GROUP BY r.id_ingrediente
+            ORDER BY r.id_ingrediente
+        ''', [id_ticket] + params)
+    
+    def _registrar_movimientos(self, movimientos_sql: str, params: list) -> int:
+        """
+        Agrega al libro los movimientos que devuelve movimientos_sql (columnas
+        id_ingrediente, tipo, cantidad, id_ticket, nota), los aplica a
+        ingredientes.cantidad_stock en una sola sentencia y recalcula el stock
+        estimado de los productos afectados. Retorna cuántos movimientos se agregaron.
+        No hace commit.
+        """
+        fecha, fecha_iso = self._get_current_timestamps()
+        
+        self.cursor.execute(f'''
+            INSERT INTO movimientos_inventario (id_ingrediente, tipo, cantidad, id_ticket, nota,
+                                                fecha, fecha_iso)
+            SELECT *, ?, ? FROM ({movimientos_sql})
+        ''', [fecha, fecha_iso] + list(params))
+        
+        agregados = self.cursor.rowcount
+        if agregados <= 0:
+            return 0
+        
+        # Un INSERT ... SELECT numera sus filas en forma consecutiva
+        rango = [self.cursor.lastrowid - agregados + 1, self.cursor.lastrowid]
+        
+        self.cursor.execute('''
+            UPDATE ingredientes
+            SET cantidad_stock = COALESCE(cantidad_stock, 0) + (
+                SELECT SUM(m.cantidad) FROM movimientos_inventario m
+                WHERE m.id BETWEEN ? AND ? AND m.id_ingrediente = ingredientes.id
+            )
+            WHERE id IN (SELECT id_ingrediente FROM movimientos_inventario
+                         WHERE id BETWEEN ? AND ?)
+        ''', rango + rango)
+        
+        self._actualizar_stocks_por_ingredientes(
+            'SELECT id_ingrediente FROM movimientos_inventario WHERE id BETWEEN ? AND ?', rango)
+        
+        return agregados
+    
+    def _actualizar_stocks_por_ingredientes(self, ingredientes_sql: str, params: list):
+        """
+        Recalcula el stock estimado de los productos cuyas recetas usan alguno de los
+        ingredientes devueltos por ingredientes_sql (por el índice idx_recetas_ingrediente).
+        No hace commit.
+        """
+        self._actualizar_stocks_estimados(f'''
+            SELECT id_producto FROM recetas
+            WHERE id_ingrediente IN ({ingredientes_sql})
+        ''', params)
+    
+    def _actualizar_stocks_estimados(self, productos_sql: str = None, params: list = ()):
+        """
+        Recalcula en una sola sentencia el stock estimado de los productos activos con
+        gestión de stock: todos, o solo los que devuelve productos_sql. No hace commit.
+        """
+        filtro = f'AND id IN ({productos_sql})' if productos_sql else ''
+        
+        self.cursor.execute(f'''
+            UPDATE productos
+            SET stock_estimado = ({self.SQL_STOCK_ESTIMADO.format(id_producto='productos.id')})
+            WHERE gestion_stock = 1 AND activo = 1 {filtro}
+        ''', params)
+    
     # ==================== VENTAS PENDIENTES ====================
     
-    def save_venta_pendiente(self, mesa: str, productos: list, total: float):
-        """Guarda una venta pendiente"""
+    def save_venta_pendiente(self, mesa: str, productos: list, total: int):
+        """Guarda una venta pendiente (importes en centavos)"""
         import json
         fecha = get_current_datetime()
         productos_json = json.dumps(productos)
@@ -696,42 +2090,36 @@ class Database:
         ultimo = self.get_config('ultimo_numero_corte')
         return int(ultimo) + 1 if ultimo else 1
     
-    def add_corte(self, dinero_caja: float, corte_final: float, 
-                  retiros: float = 0) -> int:
-        """Añade un corte de caja"""
+    def get_resumen_dia(self, dia: date = None) -> Dict[str, int]:
+        """
+        Totales de un día (hoy por defecto): ingreso_total, efectivo, transferencia,
+        propinas, costo, ganancias y num_tickets, leídos de los resúmenes diarios.
+        Importes en centavos; el costo es el registrado en cada línea al vender.
+        """
+        dia = dia or datetime.now().date()
+        return self.get_resumen_periodo(dia, dia)
+    
+    def add_corte(self, dinero_caja: int, corte_final: int, 
+                  retiros: int = 0, resumen: Dict[str, int] = None) -> int:
+        """
+        Añade un corte de caja (importes en centavos)
+        resumen: resultado de get_resumen_dia si quien llama ya lo calculó
+        """
         numero_corte = self.get_next_numero_corte()
-        fecha = get_current_datetime()
+        fecha, fecha_iso = self._get_current_timestamps()
         
-        # Calcular corte esperado (dinero inicial + ventas - retiros)
-        dinero_inicial = float(self.get_config('dinero_inicial_dia') or 0)
+        # Calcular corte esperado (dinero inicial + ventas en efectivo - retiros)
+        dinero_inicial = int(self.get_config('dinero_inicial_dia') or 0)
         
-        # Sumar todas las ventas del día (solo efectivo)
-        fecha_hoy = datetime.now().strftime('%d/%m/%Y')
-        self.cursor.execute('''
-            SELECT SUM(total) as total_ventas
-            FROM ventas
-            WHERE fecha LIKE ? AND metodo_pago = 'Efectivo'
-        ''', (f'{fecha_hoy}%',))
-        
-        result = self.cursor.fetchone()
-        total_ventas = result['total_ventas'] if result['total_ventas'] else 0
-        
-        # Calcular ganancias del día
-        self.cursor.execute('''
-            SELECT SUM(v.total) - SUM(p.costo * v.cantidad) as ganancias
-            FROM ventas v
-            JOIN productos p ON v.id_producto = p.id
-            WHERE v.fecha LIKE ?
-        ''', (f'{fecha_hoy}%',))
-        
-        result = self.cursor.fetchone()
-        ganancias = result['ganancias'] if result['ganancias'] else 0
+        if resumen is None:
+            resumen = self.get_resumen_dia()
+        ganancias = resumen['ganancias']
         
-        corte_esperado = dinero_inicial + total_ventas - retiros
+        corte_esperado = dinero_inicial + resumen['efectivo'] - retiros
         diferencia = corte_final - corte_esperado
         
-        # Determinar estado
-        if abs(diferencia) < 0.01:  # Tolerancia de 1 centavo
+        # Determinar estado (importes exactos en centavos)
+        if diferencia == 0:
             estado = 'Cuadrado'
         elif diferencia > 0:
             estado = 'Sobrante'
@@ -739,10 +2127,10 @@ class Database:
             estado = 'Faltante'
         
         self.cursor.execute('''
-            INSERT INTO cortes (numero_corte, fecha, dinero_en_caja, corte_final,
+            INSERT INTO cortes (numero_corte, fecha, fecha_iso, dinero_en_caja, corte_final,
                               corte_esperado, retiros, diferencia, estado, ganancias)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (numero_corte, fecha, dinero_caja, corte_final, corte_esperado,
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (numero_corte, fecha, fecha_iso, dinero_caja, corte_final, corte_esperado,
               retiros, diferencia, estado, ganancias))
         
         self.conn.commit()
@@ -755,6 +2143,184 @@ class Database:
         
         return numero_corte
 
+    # ==================== RESÚMENES ====================
+    
+    def get_resumen_periodo(self, desde: date, hasta: date) -> Dict[str, int]:
+        """
+        Totales de ventas entre dos fechas (inclusive) desde resumen_pagos_dia y
+        resumen_productos_dia: una fila por día y método / producto en vez de cada venta
+        """
+        rango = (desde.isoformat(), hasta.isoformat())
+        
+        self.cursor.execute('''
+            SELECT COALESCE(SUM(num_tickets), 0) AS num_tickets,
+                   COALESCE(SUM(subtotal), 0) AS ingreso_total,
+                   COALESCE(SUM(CASE WHEN metodo_pago = 'Efectivo' THEN subtotal END), 0) AS efectivo,
+                   COALESCE(SUM(CASE WHEN metodo_pago = 'Transferencia' THEN subtotal END), 0)
+                       AS transferencia,
+                   COALESCE(SUM(propinas), 0) AS propinas
+            FROM resumen_pagos_dia
+            WHERE dia BETWEEN ? AND ?
+        ''', rango)
+        resumen = dict(self.cursor.fetchone())
+        
+        self.cursor.execute('''
+            SELECT COALESCE(SUM(costo), 0) AS costo
+            FROM resumen_productos_dia
+            WHERE dia BETWEEN ? AND ?
+        ''', rango)
+        resumen['costo'] = round(self.cursor.fetchone()['costo'])  # cantidad puede ser fraccionaria
+        resumen['ganancias'] = resumen['ingreso_total'] - resumen['costo']
+        return resumen
+    
+    # Criterios de get_ranking_productos
+    CRITERIOS_RANKING = ('cantidad', 'total', 'ganancia')
+    
+    def get_ranking_productos(self, desde: date = None, hasta: date = None,
+                              criterio: str = 'cantidad', ascendente: bool = False,
+                              limite: int = None) -> List[Dict]:
+        """
+        Ranking de productos por unidades ('cantidad'), ingreso ('total') o 'ganancia'
+        entre dos fechas (sin fechas, todo el historial), desde resumen_productos_dia.
+        De mayor a menor por defecto; con ascendente=True incluye los productos activos
+        que no se vendieron en el periodo.
+        Cada fila trae id_producto, producto, cantidad, num_ventas, total, costo y ganancia.
+        Se agrupa por id_producto (la clave del resumen): productos con el mismo nombre
+        no se juntan y uno renombrado no se parte; se muestra su nombre actual.
+        Las líneas sin id_producto (ventas manuales) se agrupan por nombre.
+        """
+        if criterio not in self.CRITERIOS_RANKING:
+            raise ValueError(f"Criterio de ranking inválido: {criterio}")
+        
+        filtros, params = '1=1', []
+        if desde:
+            filtros += ' AND dia >= ?'
+            params.append(desde.isoformat())
+        if hasta:
+            filtros += ' AND dia <= ?'
+            params.append(hasta.isoformat())
+        
+        sin_ventas = ''
+        if ascendente:
+            sin_ventas = '''
+                UNION ALL
+                SELECT p.id, p.nombre, 0, 0, 0, 0, 0
+                FROM productos p
+                WHERE p.activo = 1
+                  AND p.id NOT IN (SELECT id_producto FROM vendidos WHERE id_producto IS NOT NULL)
+            '''
+        
+        direccion = 'ASC' if ascendente else 'DESC'
+        limite_sql = f'LIMIT {int(limite)}' if limite else ''
+        
+        # El rango de días usa la llave primaria (dia, clave) del resumen; con MAX(dia)
+        # el nombre de respaldo es el del último día vendido
+        self.cursor.execute(f'''
+            WITH vendidos AS (
+                SELECT id_producto, producto, MAX(dia), SUM(cantidad) AS cantidad,
+                       SUM(num_lineas) AS num_ventas, SUM(total) AS total,
+                       CAST(ROUND(SUM(costo)) AS INTEGER) AS costo
+                FROM resumen_productos_dia
+                WHERE {filtros}
+                GROUP BY clave
+            )
+            SELECT v.id_producto, COALESCE(p.nombre, v.producto) AS producto, v.cantidad,
+                   v.num_ventas, v.total, v.costo, v.total - v.costo AS ganancia
+            FROM vendidos v
+            LEFT JOIN productos p ON p.id = v.id_producto
+            {sin_ventas}
+            ORDER BY {criterio} {direccion}, producto
+            {limite_sql}
+        ''', params)
+        
+        return [dict(row) for row in self.cursor.fetchall()]
+    
+    def reconstruir_resumenes(self) -> Dict[str, int]:
+        """
+        Vuelve a calcular los resúmenes diarios desde las ventas (reparación)
+        Retorna cuántas filas quedaron en cada resumen
+        """
+        try:
+            if not self.conn.in_transaction:
+                self.cursor.execute('BEGIN IMMEDIATE')
+            self._llenar_resumenes()
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        
+        return {tabla: self.cursor.execute(f'SELECT COUNT(*) FROM {tabla}').fetchone()[0]
+                for tabla in ('resumen_productos_dia', 'resumen_pagos_dia')}
+    
+    # ==================== HISTORIALES ====================
+    
+    # Columnas por las que se puede ordenar (y paginar) cada historial
+    COLUMNAS_ORDEN = {
+        'ventas': ('fecha_iso', 'numero_venta', 'producto', 'cantidad',
+                   'precio_unitario', 'total', 'metodo_pago'),
+        'cortes': ('fecha_iso', 'numero_corte', 'dinero_en_caja', 'corte_final',
+                   'corte_esperado', 'retiros', 'diferencia', 'estado', 'ganancias'),
+    }
+    
+    def get_pagina(self, tabla: str, filtros: str = '1=1', params: tuple = (),
+                   orden: str = 'fecha_iso', descendente: bool = True,
+                   despues: tuple = None, limite: int = 200) -> tuple:
+        """
+        Obtiene una página de un historial con paginación por clave (keyset).
+        En lugar de OFFSET continúa después de la última fila ya mostrada,
+        así cada página cuesta lo mismo sin importar qué tan lejos esté.
+        
+        despues: (valor de la columna de orden, id) de la última fila mostrada
+        Retorna (filas, siguiente); siguiente es None cuando ya no hay más páginas
+        """
+        if orden not in self.COLUMNAS_ORDEN.get(tabla, ()):
+            raise ValueError(f"No se puede ordenar {tabla} por {orden}")
+        
+        direccion = 'DESC' if descendente else 'ASC'
+        sql = f'SELECT * FROM {tabla} WHERE ({filtros})'
+        params = list(params)
+        
+        # El id desempata filas con el mismo valor para que ninguna se repita o se pierda.
+        # SQLite ordena NULL antes que cualquier valor (al final en DESC), pero
+        # (NULL, id) < (?, ?) no es verdadero ni falso: esas filas se tratan aparte
+        if despues is not None:
+            valor, id_fila = despues
+            if valor is None and descendente:
+                # Ya solo quedan filas con NULL
+                sql += f' AND {orden} IS NULL AND id < ?'
+                params.append(id_fila)
+            elif valor is None:
+                # Después de las filas con NULL siguen todas las demás
+                sql += f' AND (({orden} IS NULL AND id > ?) OR {orden} IS NOT NULL)'
+                params.append(id_fila)
+            elif descendente:
+                sql += f' AND (({orden}, id) < (?, ?) OR {orden} IS NULL)'
+                params.extend(despues)
+            else:
+                sql += f' AND ({orden}, id) > (?, ?)'
+                params.extend(despues)
+        
+        sql += f' ORDER BY {orden} {direccion}, id {direccion} LIMIT ?'
+        params.append(limite + 1)
+        
+        self.cursor.execute(sql, params)
+        filas = [dict(row) for row in self.cursor.fetchall()]
+        
+        siguiente = None
+        if len(filas) > limite:
+            filas = filas[:limite]
+            siguiente = (filas[-1][orden], filas[-1]['id'])
+        
+        return filas, siguiente
+    
+    def contar_filas(self, tabla: str, filtros: str = '1=1', params: tuple = ()) -> int:
+        """Cuenta las filas de un historial que cumplen los filtros"""
+        if tabla not in self.COLUMNAS_ORDEN:
+            raise ValueError(f"Tabla desconocida: {tabla}")
+        
+        self.cursor.execute(f'SELECT COUNT(*) FROM {tabla} WHERE ({filtros})', list(params))
+        return self.cursor.fetchone()[0]
+    
     # ==================== CONFIGURACIÓN DE IMPRESIÓN ====================
     
     def get_auto_print(self) -> bool:
@@ -773,5 +2339,72 @@ class Database:
     def set_last_ticket_path(self, path: str):
         """Guarda la ruta del último ticket generado"""
         self.set_config('last_ticket_path', path)
+    
+    # ==================== COLA DE IMPRESIÓN ====================
+    
+    def add_trabajo_impresion(self, datos: Optional[Dict] = None, ruta_pdf: str = None,
+                              imprimir: bool = False) -> Dict:
+        """
+        Registra un trabajo de impresión pendiente
+        datos: venta_data para generar el PDF (None si solo se reimprime ruta_pdf)
+        """
+        numero_venta = datos.get('numero_venta') if datos else None
+        datos_json = json.dumps(datos) if datos else None
+        fecha, fecha_iso = self._get_current_timestamps()
+        
+        self.cursor.execute('''
+            INSERT INTO trabajos_impresion (numero_venta, datos, ruta_pdf, imprimir,
+                                            fecha_creacion, fecha_iso)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (numero_venta, datos_json, ruta_pdf, 1 if imprimir else 0, fecha, fecha_iso))
+        id_trabajo = self.cursor.lastrowid
+        self.conn.commit()
+        
+        # Copia independiente: quien llama puede seguir modificando sus datos
+        return {'id': id_trabajo, 'numero_venta': numero_venta,
+                'datos': json.loads(datos_json) if datos_json else None,
+                'ruta_pdf': ruta_pdf, 'imprimir': imprimir, 'estado': 'pendiente',
+                'intentos': 0, 'error': None}
+    
+    def get_trabajos_impresion_pendientes(self) -> List[Dict]:
+        """Trabajos que quedaron sin terminar (por ejemplo al cerrar el programa)"""
+        self.cursor.execute('''
+            SELECT * FROM trabajos_impresion WHERE estado = 'pendiente' ORDER BY id
+        ''')
+        
+        trabajos = []
+        for row in self.cursor.fetchall():
+            trabajo = dict(row)
+            trabajo['datos'] = json.loads(trabajo['datos']) if trabajo['datos'] else None
+            trabajo['imprimir'] = bool(trabajo['imprimir'])
+            trabajos.append(trabajo)
+        return trabajos
+    
+    def update_trabajo_impresion(self, id_trabajo: int, **kwargs):
+        """Actualiza estado, intentos, ruta_pdf o error de un trabajo de impresión"""
+        campos = {k: v for k, v in kwargs.items()
+                  if k in ('estado', 'intentos', 'ruta_pdf', 'error')}
+        if not campos:
+            return
+        
+        asignaciones = ', '.join(f'{campo} = ?' for campo in campos)
+        self.cursor.execute(f'UPDATE trabajos_impresion SET {asignaciones} WHERE id = ?',
+                          (*campos.values(), id_trabajo))
+        self.conn.commit()
+    
+    def purgar_trabajos_impresion(self, dias_fallidos: int = 7) -> int:
+        """
+        Elimina los trabajos ya terminados y los fallidos con más de dias_fallidos
+        días (o sin fecha); retorna cuántos se eliminaron
+        """
+        limite = format_iso_datetime(datetime.now() - timedelta(days=dias_fallidos))
+        self.cursor.execute('''
+            DELETE FROM trabajos_impresion
+            WHERE estado = 'listo'
+               OR (estado = 'fallido' AND (fecha_iso IS NULL OR fecha_iso < ?))
+        ''', (limite,))
+        eliminados = self.cursor.rowcount
+        self.conn.commit()
+        return eliminados
 # Instancia global de la base de datos
 db = Database()
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""
+Tickets en formato ESC/POS para impresoras térmicas de Mitsy's POS
+"""
+import os
+import socket
+import hashlib
+from datetime import datetime
+from typing import Optional
+from PIL import Image
+from config import BUSINESS_INFO, ESCPOS_CONFIG, PRINT_CONFIG
+from utils import format_currency
+
+# Comandos ESC/POS
+ESC = b'\x1b'
+GS = b'\x1d'
+INICIALIZAR = ESC + b'@'
+ALINEAR_IZQUIERDA = ESC + b'a\x00'
+ALINEAR_CENTRO = ESC + b'a\x01'
+NEGRITA_SI = ESC + b'E\x01'
+NEGRITA_NO = ESC + b'E\x00'
+TAMANO_NORMAL = GS + b'!\x00'
+TAMANO_DOBLE_ALTO = GS + b'!\x01'
+CORTAR = GS + b'V\x42\x00'  # Avanza el papel y corta (corte parcial)
+
+class EscPosRenderer:
+    def __init__(self, columnas: int = None, destino: str = None, cache_dir: str = None):
+        """
+        Genera el ticket como bytes ESC/POS a partir del mismo venta_data que
+        TicketGenerator.generate_ticket_pdf, sin pasar por PDF ni por la cola del sistema.
+        El logo se convierte a blanco y negro una sola vez y se guarda como comando
+        raster (en memoria y en cache_dir).
+        """
+        self.columnas = columnas or ESCPOS_CONFIG['columnas']
+        self.destino = destino or ESCPOS_CONFIG['destino']
+        self.cache_dir = cache_dir or ESCPOS_CONFIG['cache_dir']
+        self.encoding = ESCPOS_CONFIG['encoding']
+        self._logos = {}  # clave -> comando raster
+    
+    def render(self, venta_data) -> bytes:
+        """Convierte venta_data (importes en centavos) en el ticket ESC/POS completo"""
+        partes = [INICIALIZAR, ESC + b't' + bytes([ESCPOS_CONFIG['code_page']])]
+        
+        # Encabezado
+        partes.append(ALINEAR_CENTRO)
+        logo = self._logo_raster(BUSINESS_INFO['logo_path'])
+        if logo:
+            partes.append(logo)
+        else:
+            partes += [NEGRITA_SI, TAMANO_DOBLE_ALTO, self._linea(BUSINESS_INFO['name']),
+                       TAMANO_NORMAL, NEGRITA_NO, self._linea(BUSINESS_INFO['subtitle'])]
+        
+        partes += [self._linea(BUSINESS_INFO['address']),
+                   self._linea(BUSINESS_INFO['city']),
+                   self._linea(f"Tel: {BUSINESS_INFO['phone']}"),
+                   b'\n',
+                   NEGRITA_SI, self._linea(f"Ticket #: {venta_data['numero_venta']}"), NEGRITA_NO,
+                   self._linea(f"Fecha: {venta_data['fecha']}")]
+        
+        if venta_data.get('mesa'):
+            partes.append(self._linea(venta_data['mesa']))
+        
+        # Productos
+        partes += [ALINEAR_IZQUIERDA, self._linea('=' * self.columnas),
+                   NEGRITA_SI, self._columnas('Cant. Descripción', 'Total'), NEGRITA_NO]
+        
+        for producto in venta_data['productos']:
+            descripcion = f"{int(producto['cantidad']):<5} {producto['nombre']}"
+            partes.append(self._columnas(descripcion, format_currency(producto['total'])))
+            partes.append(self._linea(f"      {format_currency(producto['precio'])} c/u"))
+        
+        partes.append(self._linea('-' * self.columnas))
+        
+        # Totales
+        if venta_data.get('propina', 0) > 0:
+            partes.append(self._columnas('Subtotal:', format_currency(venta_data['subtotal'])))
+            partes.append(self._columnas('Propina:', format_currency(venta_data['propina'])))
+        
+        partes += [NEGRITA_SI, TAMANO_DOBLE_ALTO,
+                   self._columnas('TOTAL:', format_currency(venta_data['total'])),
+                   TAMANO_NORMAL, NEGRITA_NO,
+                   self._columnas('Recibido:', format_currency(venta_data['recibido'])),
+                   self._columnas('Cambio:', format_currency(venta_data['cambio'])),
+                   ALINEAR_CENTRO,
+                   self._linea(f"Método de pago: {venta_data['metodo_pago']}"),
+                   self._linea('=' * self.columnas)]
+        
+        # Pie
+        partes += [NEGRITA_SI, self._linea('¡Gracias por su compra!'), NEGRITA_NO,
+                   self._linea('Vuelva pronto'),
+                   ESC + b'd\x04', CORTAR]
+        
+        return b''.join(partes)
+    
+    def generate_ticket_escpos(self, venta_data, filename=None) -> str:
+        """
+        Guarda el ticket ESC/POS en tickets/ (para reimprimirlo) y retorna la ruta
+        Equivalente a TicketGenerator.generate_ticket_pdf
+        """
+        if not filename:
+            os.makedirs('tickets', exist_ok=True)
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f'tickets/ticket_{venta_data["numero_venta"]}_{timestamp}.bin'
+        
+        with open(filename, 'wb') as archivo:
+            archivo.write(self.render(venta_data))
+        
+        return filename
+    
+    def print_ticket(self, filename) -> bool:
+        """Envía un ticket ESC/POS ya generado a la impresora configurada"""
+        try:
+            with open(filename, 'rb') as archivo:
+                self.enviar(archivo.read())
+            return True
+        except Exception as e:
+            print(f"Error al imprimir: {e}")
+            return False
+    
+    def enviar(self, datos: bytes, destino: str = None):
+        """
+        Escribe los bytes en el destino:
+        - 'tcp://host:puerto' impresora de red (puerto 9100 si no se indica)
+        - cualquier otra ruta se abre como archivo (dispositivo o archivo de prueba)
+        """
+        destino = destino or self.destino
+        
+        if destino.startswith('tcp://'):
+            host, _, puerto = destino[len('tcp://'):].partition(':')
+            with socket.create_connection((host, int(puerto or 9100)),
+                                          timeout=PRINT_CONFIG['timeout_s']) as conexion:
+                conexion.sendall(datos)
+        else:
+            with open(destino, 'ab') as dispositivo:
+                dispositivo.write(datos)
+    
+    def _texto(self, texto: str) -> bytes:
+        """Codifica el texto en la página de códigos de la impresora"""
+        return texto.encode(self.encoding, errors='replace')
+    
+    def _linea(self, texto: str) -> bytes:
+        """Un renglón (recortado al ancho del papel)"""
+        return self._texto(texto[:self.columnas]) + b'\n'
+    
+    def _columnas(self, izquierda: str, derecha: str) -> bytes:
+        """Renglón con texto a la izquierda y un importe alineado a la derecha"""
+        espacio = self.columnas - len(derecha) - 1
+        if len(izquierda) > espacio:
+            izquierda = izquierda[:max(espacio - 3, 0)] + '...'
+        return self._linea(f"{izquierda:<{espacio}} {derecha}")
+    
+    def _logo_raster(self, ruta: str) -> Optional[bytes]:
+        """
+        Logo como comando GS v 0 (raster de 1 bit con tramado Floyd-Steinberg)
+        Se genera una vez por versión del archivo; None si no hay logo
+        """
+        try:
+            info = os.stat(ruta)
+        except OSError:
+            return None
+        
+        ancho = ESCPOS_CONFIG['logo_ancho_puntos']
+        datos = f"{os.path.abspath(ruta)}|{info.st_mtime_ns}|{info.st_size}|{ancho}"
+        clave = hashlib.sha1(datos.encode('utf-8')).hexdigest()
+        
+        if clave in self._logos:
+            return self._logos[clave]
+        
+        destino = os.path.join(self.cache_dir, f"{clave}.bin")
+        if os.path.exists(destino):
+            with open(destino, 'rb') as archivo:
+                comando = archivo.read()
+        else:
+            comando = self._convertir_logo(ruta, ancho)
+            if comando is None:
+                return None
+            
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temporal = destino + '.tmp'
+            with open(temporal, 'wb') as archivo:
+                archivo.write(comando)
+            os.replace(temporal, destino)
+        
+        self._logos[clave] = comando
+        return comando
+    
+    def _convertir_logo(self, ruta: str, ancho: int) -> Optional[bytes]:
+        """Redimensiona, convierte a blanco y negro con tramado y arma el comando raster"""
+        ancho = min(ancho, ESCPOS_CONFIG['ancho_puntos'])
+        ancho -= ancho % 8  # Cada byte son 8 puntos horizontales
+        
+        try:
+            with Image.open(ruta) as img:
+                img = img.convert('RGBA')
+                alto = max(1, round(img.height * ancho / img.width))
+                img = img.resize((ancho, alto), Image.Resampling.LANCZOS)
+                
+                # Transparente -> blanco
+                fondo = Image.new('RGBA', img.size, (255, 255, 255, 255))
+                fondo.alpha_composite(img)
+                
+                # convert('1') aplica Floyd-Steinberg
+                bits = fondo.convert('L').convert('1')
+        except Exception:
+            return None
+        
+        # En modo '1' un bit en 1 es blanco; la impresora espera 1 = punto negro
+        datos = bytes(b ^ 0xFF for b in bits.tobytes())
+        bytes_renglon = ancho // 8
+        
+        return (GS + b'v0\x00' +
+                bytes([bytes_renglon & 0xFF, bytes_renglon >> 8, alto & 0xFF, alto >> 8]) +
+                datos + b'\n')
+
+
+# Instancia global
+escpos_renderer = EscPosRenderer()
@@ -6,8 +6,9 @@ from tkinter import ttk, messagebox
 from tkcalendar import DateEntry
 from datetime import datetime, timedelta
 from config import COLORS, FONTS
-from utils import format_currency, get_current_datetime, calculate_week_range, calculate_month_range
+from utils import format_currency, get_current_datetime, calculate_week_range, calculate_month_range, iso_day_range, to_iso_datetime, to_cents, cents_to_str
 from database import db
+from widgets import TreeviewBinder, KeysetPager
 
 class CortesWindow:
     def __init__(self, parent, on_close=None):
@@ -29,8 +30,14 @@ class CortesWindow:
         # Protocolo de cierre
         self.window.protocol("WM_DELETE_WINDOW", self.close_window)
         
+        # Filtro y orden actuales (se aplican en SQL, ver cargar_pagina)
+        self.filtro_sql = '1=1'
+        self.filtro_params = []
+        self.orden = 'fecha_iso'
+        self.descendente = True
+        
         self.setup_ui()
-        self.load_cortes()
+        self.pager.reset()
     
     def center_window(self):
         """Centra la ventana en la pantalla"""
@@ -169,16 +176,21 @@ class CortesWindow:
         self.tree = ttk.Treeview(table_frame, columns=columns, show='headings',
                                 yscrollcommand=scrollbar.set, selectmode='extended')
         
-        # Configurar columnas
-        self.tree.heading('No. Corte', text='No. Corte')
-        self.tree.heading('Fecha', text='Fecha')
-        self.tree.heading('Dinero en Caja', text='Dinero en Caja')
-        self.tree.heading('Corte Final', text='Corte Final')
-        self.tree.heading('Corte Esperado', text='Corte Esperado')
-        self.tree.heading('Retiros', text='Retiros')
-        self.tree.heading('Diferencia', text='Diferencia')
-        self.tree.heading('Estado', text='Estado')
-        self.tree.heading('Ganancias', text='Ganancias')
+        # Configurar columnas (clic en el encabezado para ordenar)
+        self.encabezados = {
+            'No. Corte': ('No. Corte', 'numero_corte'),
+            'Fecha': ('Fecha', 'fecha_iso'),
+            'Dinero en Caja': ('Dinero en Caja', 'dinero_en_caja'),
+            'Corte Final': ('Corte Final', 'corte_final'),
+            'Corte Esperado': ('Corte Esperado', 'corte_esperado'),
+            'Retiros': ('Retiros', 'retiros'),
+            'Diferencia': ('Diferencia', 'diferencia'),
+            'Estado': ('Estado', 'estado'),
+            'Ganancias': ('Ganancias', 'ganancias')
+        }
+        for col in columns:
+            self.tree.heading(col, command=lambda c=col: self.ordenar_por(c))
+        self.actualizar_encabezados()
         
         self.tree.column('No. Corte', width=100, anchor='center')
         self.tree.column('Fecha', width=180, anchor='center')
@@ -199,6 +211,12 @@ class CortesWindow:
         self.tree.tag_configure('cuadrado', background='#E8F5E9')
         self.tree.tag_configure('sobrante', background='#E3F2FD')
         self.tree.tag_configure('faltante', background='#FFEBEE')
+        self.tree_binder = TreeviewBinder(self.tree)
+        
+        # Carga por páginas al desplazarse
+        self.pager = KeysetPager(self.tree, scrollbar, self.tree_binder,
+                                 cargar=self.cargar_pagina, render=self.render_cortes,
+                                 contar=self.contar_cortes, on_total=self.update_count)
         
         # Doble clic para ver detalles
         self.tree.bind('<Double-1>', self.ver_detalles_corte)
@@ -221,20 +239,59 @@ class CortesWindow:
                           fg=COLORS['text_primary'], relief=tk.RAISED,
                           borderwidth=2, padx=20, pady=10)
             btn.pack(side=tk.LEFT, padx=5)
-    
-    def load_cortes(self, cortes=None):
-        """Carga los cortes en la tabla"""
-        # Limpiar tabla
-        for item in self.tree.get_children():
-            self.tree.delete(item)
         
-        # Obtener cortes
-        if cortes is None:
-            db.cursor.execute('SELECT * FROM cortes ORDER BY fecha DESC, numero_corte DESC')
-            cortes = [dict(row) for row in db.cursor.fetchall()]
+        # Contador de cortes
+        self.count_label = tk.Label(button_frame, text="", font=FONTS['normal'],
+                                    bg=COLORS['bg_primary'], fg=COLORS['text_primary'])
+        self.count_label.pack(side=tk.RIGHT, padx=5)
+    
+    def load_cortes(self):
+        """Recarga los cortes mostrados (después de agregar, modificar o borrar)"""
+        self.pager.refrescar()
+    
+    def cargar_pagina(self, despues, limite):
+        """Obtiene una página de cortes con el filtro y orden actuales"""
+        return db.get_pagina('cortes', self.filtro_sql, self.filtro_params,
+                             orden=self.orden, descendente=self.descendente,
+                             despues=despues, limite=limite)
+    
+    def contar_cortes(self):
+        """Total de cortes que cumplen el filtro actual"""
+        return db.contar_filas('cortes', self.filtro_sql, self.filtro_params)
+    
+    def update_count(self, cargados, total):
+        """Actualiza el contador de cortes"""
+        self.count_label.config(text=f"Mostrando {cargados} de {total} cortes")
+    
+    def set_filtro(self, filtro_sql='1=1', params=()):
+        """Cambia el filtro de la tabla y vuelve a la primera página"""
+        self.filtro_sql = filtro_sql
+        self.filtro_params = list(params)
+        self.pager.reset()
+    
+    def ordenar_por(self, columna):
+        """Ordena por la columna indicada; un segundo clic invierte el orden"""
+        orden = self.encabezados[columna][1]
+        if orden == self.orden:
+            self.descendente = not self.descendente
+        else:
+            self.orden = orden
+            self.descendente = orden == 'fecha_iso'
         
-        # Cargar en tabla
-        for idx, c in enumerate(cortes):
+        self.actualizar_encabezados()
+        self.pager.reset()
+    
+    def actualizar_encabezados(self):
+        """Marca en el encabezado la columna y dirección del orden"""
+        for col, (texto, orden) in self.encabezados.items():
+            if orden == self.orden:
+                texto += ' ▼' if self.descendente else ' ▲'
+            self.tree.heading(col, text=texto)
+    
+    def render_cortes(self, cortes, inicio=0):
+        """Convierte los cortes en renglones de la tabla"""
+        rows = []
+        for idx, c in enumerate(cortes, start=inicio):
             # Determinar tag por estado
             if c['estado'] == 'Cuadrado':
                 tag = 'cuadrado'
@@ -257,7 +314,9 @@ class CortesWindow:
                 format_currency(c['ganancias'])
             )
             
-            self.tree.insert('', tk.END, values=values, tags=(tag,))
+            rows.append((c['id'], values, (tag,)))
+        
+        return rows
     
     def aplicar_filtros(self):
         """Aplica los filtros de búsqueda"""
@@ -265,26 +324,16 @@ class CortesWindow:
         fecha_inicio = self.fecha_inicio.get_date()
         fecha_fin = self.fecha_fin.get_date()
         
-        # Construir query SQL
-        sql = 'SELECT * FROM cortes WHERE 1=1'
-        params = []
+        # Filtro de fechas
+        sql = 'fecha_iso BETWEEN ? AND ?'
+        params = list(iso_day_range(fecha_inicio, fecha_fin))
         
         # Filtro de búsqueda general
         if query:
             sql += ' AND (estado LIKE ? OR CAST(numero_corte AS TEXT) LIKE ?)'
             params.extend([f'%{query}%', f'%{query}%'])
         
-        # Filtro de fechas
-        sql += ' AND DATE(SUBSTR(fecha, 7, 4) || "-" || SUBSTR(fecha, 4, 2) || "-" || SUBSTR(fecha, 1, 2)) BETWEEN ? AND ?'
-        params.extend([fecha_inicio.strftime('%Y-%m-%d'), fecha_fin.strftime('%Y-%m-%d')])
-        
-        sql += ' ORDER BY fecha DESC, numero_corte DESC'
-        
-        # Ejecutar query
-        db.cursor.execute(sql, params)
-        cortes = [dict(row) for row in db.cursor.fetchall()]
-        
-        self.load_cortes(cortes)
+        self.set_filtro(sql, params)
     
     def filtro_hoy(self):
         """Filtra cortes de hoy"""
@@ -323,9 +372,7 @@ class CortesWindow:
     
     def filtro_estado(self, estado):
         """Filtra por estado del corte"""
-        db.cursor.execute('SELECT * FROM cortes WHERE estado = ? ORDER BY fecha DESC', (estado,))
-        cortes = [dict(row) for row in db.cursor.fetchall()]
-        self.load_cortes(cortes)
+        self.set_filtro('estado = ?', (estado,))
     
     def filtro_numero_corte(self):
         """Filtra por número de corte"""
@@ -336,14 +383,10 @@ class CortesWindow:
         
         try:
             num_corte = int(num_corte)
-            db.cursor.execute('SELECT * FROM cortes WHERE numero_corte = ? ORDER BY fecha DESC', 
-                            (num_corte,))
-            cortes = [dict(row) for row in db.cursor.fetchall()]
+            self.set_filtro('numero_corte = ?', (num_corte,))
             
-            if not cortes:
+            if not self.pager.total:
                 messagebox.showinfo("No encontrado", f"No se encontró el corte #{num_corte}")
-            
-            self.load_cortes(cortes)
         except ValueError:
             messagebox.showerror("Error", "El número de corte debe ser un número entero")
     
@@ -354,7 +397,7 @@ class CortesWindow:
         hoy = datetime.now().date()
         self.fecha_inicio.set_date(hoy - timedelta(days=30))
         self.fecha_fin.set_date(hoy)
-        self.load_cortes()
+        self.set_filtro()
     
     def ver_detalles_corte(self, event=None):
         """Muestra detalles completos del corte"""
@@ -372,8 +415,8 @@ class CortesWindow:
                                   "Por favor selecciona solo un corte")
             return
         
-        item = self.tree.item(selection[0])
-        corte_id = self.get_corte_id_from_values(item['values'])
+        # Cada renglón usa el id del corte como iid
+        corte_id = int(selection[0])
         
         if corte_id:
             DetallesCorteDialog(self.window, corte_id)
@@ -392,8 +435,7 @@ class CortesWindow:
                                   "Por favor selecciona solo un corte para modificar")
             return
         
-        item = self.tree.item(selection[0])
-        corte_id = self.get_corte_id_from_values(item['values'])
+        corte_id = int(selection[0])
         
         if corte_id:
             CorteDialog(self.window, corte_id=corte_id, callback=self.load_cortes)
@@ -412,10 +454,7 @@ class CortesWindow:
             return
         
         for item in selection:
-            values = self.tree.item(item)['values']
-            corte_id = self.get_corte_id_from_values(values)
-            if corte_id:
-                db.cursor.execute('DELETE FROM cortes WHERE id = ?', (corte_id,))
+            db.cursor.execute('DELETE FROM cortes WHERE id = ?', (int(item),))
         
         db.conn.commit()
         messagebox.showinfo("Éxito", "Corte(s) eliminado(s) correctamente")
@@ -425,20 +464,6 @@ class CortesWindow:
         """Abre diálogo para agregar corte manual"""
         CorteDialog(self.window, callback=self.load_cortes)
     
-    def get_corte_id_from_values(self, values):
-        """Obtiene el ID del corte desde los valores mostrados"""
-        numero_corte = values[0]
-        fecha = values[1]
-        
-        db.cursor.execute('''
-            SELECT id FROM cortes 
-            WHERE numero_corte = ? AND fecha = ?
-            LIMIT 1
-        ''', (numero_corte, fecha))
-        
-        result = db.cursor.fetchone()
-        return result['id'] if result else None
-    
     def close_window(self):
         """Cierra la ventana y vuelve al menú"""
         self.window.destroy()
@@ -693,9 +718,9 @@ class CorteDialog:
     def calcular_diferencia(self, *args):
         """Calcula la diferencia y estado automáticamente"""
         try:
-            dinero_caja = float(self.dinero_caja_var.get())
-            corte_final = float(self.corte_final_var.get())
-            retiros = float(self.retiros_var.get())
+            dinero_caja = to_cents(self.dinero_caja_var.get())
+            corte_final = to_cents(self.corte_final_var.get())
+            retiros = to_cents(self.retiros_var.get())
             
             # Calcular corte esperado (esto es simplificado, en realidad 
             # debería calcularse basado en ventas del día)
@@ -714,7 +739,7 @@ class CorteDialog:
             self.diferencia_var.set(format_currency(abs(diferencia)))
             
             # Determinar estado y color
-            if abs(diferencia) < 0.01:  # Tolerancia de 1 centavo
+            if diferencia == 0:
                 estado = 'Cuadrado'
                 color = COLORS['accent']
             elif diferencia > 0:
@@ -745,10 +770,10 @@ class CorteDialog:
         
         self.num_corte_var.set(str(corte['numero_corte']))
         self.fecha_var.set(corte['fecha'])
-        self.dinero_caja_var.set(str(corte['dinero_en_caja']))
-        self.corte_final_var.set(str(corte['corte_final']))
-        self.retiros_var.set(str(corte['retiros']))
-        self.ganancias_var.set(str(corte['ganancias']))
+        self.dinero_caja_var.set(cents_to_str(corte['dinero_en_caja']))
+        self.corte_final_var.set(cents_to_str(corte['corte_final']))
+        self.retiros_var.set(cents_to_str(corte['retiros']))
+        self.ganancias_var.set(cents_to_str(corte['ganancias']))
         
         # Los campos calculados se actualizarán automáticamente
         self.calcular_diferencia()
@@ -758,10 +783,10 @@ class CorteDialog:
         # Validaciones
         try:
             numero_corte = int(self.num_corte_var.get())
-            dinero_caja = float(self.dinero_caja_var.get())
-            corte_final = float(self.corte_final_var.get())
-            retiros = float(self.retiros_var.get())
-            ganancias = float(self.ganancias_var.get())
+            dinero_caja = to_cents(self.dinero_caja_var.get())
+            corte_final = to_cents(self.corte_final_var.get())
+            retiros = to_cents(self.retiros_var.get())
+            ganancias = to_cents(self.ganancias_var.get())
         except ValueError:
             messagebox.showerror("Error", "Valores numéricos inválidos")
             return
@@ -771,11 +796,16 @@ class CorteDialog:
             messagebox.showerror("Error", "La fecha es obligatoria")
             return
         
+        fecha_iso = to_iso_datetime(fecha)
+        if not fecha_iso:
+            messagebox.showerror("Error", "La fecha debe tener el formato dd/mm/aaaa hh:mm:ss")
+            return
+        
         # Calcular valores
         corte_esperado = dinero_caja - retiros
         diferencia = corte_final - corte_esperado
         
-        if abs(diferencia) < 0.01:
+        if diferencia == 0:
             estado = 'Cuadrado'
         elif diferencia > 0:
             estado = 'Sobrante'
@@ -787,20 +817,20 @@ class CorteDialog:
                 # Actualizar corte existente
                 db.cursor.execute('''
                     UPDATE cortes 
-                    SET numero_corte = ?, fecha = ?, dinero_en_caja = ?,
+                    SET numero_corte = ?, fecha = ?, fecha_iso = ?, dinero_en_caja = ?,
                         corte_final = ?, corte_esperado = ?, retiros = ?,
                         diferencia = ?, estado = ?, ganancias = ?
                     WHERE id = ?
-                ''', (numero_corte, fecha, dinero_caja, corte_final, corte_esperado,
+                ''', (numero_corte, fecha, fecha_iso, dinero_caja, corte_final, corte_esperado,
                       retiros, diferencia, estado, ganancias, self.corte_id))
             else:
                 # Crear nuevo corte
                 db.cursor.execute('''
-                    INSERT INTO cortes (numero_corte, fecha, dinero_en_caja,
+                    INSERT INTO cortes (numero_corte, fecha, fecha_iso, dinero_en_caja,
                                       corte_final, corte_esperado, retiros,
                                       diferencia, estado, ganancias)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (numero_corte, fecha, dinero_caja, corte_final, corte_esperado,
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (numero_corte, fecha, fecha_iso, dinero_caja, corte_final, corte_esperado,
                       retiros, diferencia, estado, ganancias))
                 
                 # Actualizar último número de corte si es mayor
@@ -6,8 +6,9 @@ from tkinter import ttk, messagebox
 from tkcalendar import DateEntry
 from datetime import datetime, timedelta
 from config import COLORS, FONTS
-from utils import format_currency, get_current_datetime, calculate_week_range, calculate_month_range
+from utils import format_currency, get_current_datetime, calculate_week_range, calculate_month_range, iso_day_range
 from database import db
+from widgets import TreeviewBinder, KeysetPager
 
 class HistorialVentasWindow:
     def __init__(self, parent, on_close=None):
@@ -29,11 +30,14 @@ class HistorialVentasWindow:
         # Protocolo de cierre
         self.window.protocol("WM_DELETE_WINDOW", self.close_window)
         
-        # Variables de filtro
-        self.current_filters = {}
+        # Filtro y orden actuales (se aplican en SQL, ver cargar_pagina)
+        self.filtro_sql = '1=1'
+        self.filtro_params = []
+        self.orden = 'fecha_iso'
+        self.descendente = True
         
         self.setup_ui()
-        self.load_ventas()
+        self.pager.reset()
     
     def center_window(self):
         """Centra la ventana en la pantalla"""
@@ -128,6 +132,11 @@ class HistorialVentasWindow:
                  font=FONTS['normal'], bg=COLORS['accent'], fg='white',
                  relief=tk.RAISED, borderwidth=2, padx=10, pady=3).pack(side=tk.LEFT, padx=5)
         
+        # Totales del periodo (desde los resúmenes diarios)
+        self.resumen_label = tk.Label(quick_filters_frame, text="", font=FONTS['normal'],
+                                      bg=COLORS['bg_primary'], fg=COLORS['text_primary'])
+        self.resumen_label.pack(side=tk.RIGHT, padx=5)
+        
         # Frame de filtros adicionales
         extra_filters_frame = tk.Frame(main_frame, bg=COLORS['bg_primary'])
         extra_filters_frame.pack(fill=tk.X, pady=(0, 10))
@@ -177,14 +186,19 @@ class HistorialVentasWindow:
         self.tree = ttk.Treeview(table_frame, columns=columns, show='headings',
                                 yscrollcommand=scrollbar.set, selectmode='extended')
         
-        # Configurar columnas
-        self.tree.heading('No. Venta', text='No. Venta')
-        self.tree.heading('Fecha', text='Fecha')
-        self.tree.heading('Producto', text='Producto')
-        self.tree.heading('Cantidad', text='Cantidad')
-        self.tree.heading('Costo', text='Precio Unitario')
-        self.tree.heading('Total', text='Total')
-        self.tree.heading('Método', text='Método')
+        # Configurar columnas (clic en el encabezado para ordenar)
+        self.encabezados = {
+            'No. Venta': ('No. Venta', 'numero_venta'),
+            'Fecha': ('Fecha', 'fecha_iso'),
+            'Producto': ('Producto', 'producto'),
+            'Cantidad': ('Cantidad', 'cantidad'),
+            'Costo': ('Precio Unitario', 'precio_unitario'),
+            'Total': ('Total', 'total'),
+            'Método': ('Método', 'metodo_pago')
+        }
+        for col in columns:
+            self.tree.heading(col, command=lambda c=col: self.ordenar_por(c))
+        self.actualizar_encabezados()
         
         self.tree.column('No. Venta', width=100, anchor='center')
         self.tree.column('Fecha', width=180, anchor='center')
@@ -202,6 +216,12 @@ class HistorialVentasWindow:
         self.tree.tag_configure('oddrow', background=COLORS['table_row_odd'])
         self.tree.tag_configure('efectivo', background='#E8F5E9')
         self.tree.tag_configure('transferencia', background='#E3F2FD')
+        self.tree_binder = TreeviewBinder(self.tree)
+        
+        # Carga por páginas al desplazarse
+        self.pager = KeysetPager(self.tree, scrollbar, self.tree_binder,
+                                 cargar=self.cargar_pagina, render=self.render_ventas,
+                                 contar=self.contar_ventas, on_total=self.update_count)
         
         # Frame de botones
         button_frame = tk.Frame(main_frame, bg=COLORS['bg_primary'])
@@ -220,20 +240,59 @@ class HistorialVentasWindow:
                           fg=COLORS['text_primary'], relief=tk.RAISED,
                           borderwidth=2, padx=20, pady=10)
             btn.pack(side=tk.LEFT, padx=5)
-    
-    def load_ventas(self, ventas=None):
-        """Carga las ventas en la tabla"""
-        # Limpiar tabla
-        for item in self.tree.get_children():
-            self.tree.delete(item)
         
-        # Obtener ventas
-        if ventas is None:
-            db.cursor.execute('SELECT * FROM ventas ORDER BY fecha DESC, numero_venta DESC')
-            ventas = [dict(row) for row in db.cursor.fetchall()]
-        
-        # Cargar en tabla
-        for idx, v in enumerate(ventas):
+        # Contador de ventas
+        self.count_label = tk.Label(button_frame, text="", font=FONTS['normal'],
+                                    bg=COLORS['bg_primary'], fg=COLORS['text_primary'])
+        self.count_label.pack(side=tk.RIGHT, padx=5)
+    
+    def load_ventas(self):
+        """Recarga las ventas mostradas (después de agregar, modificar o borrar)"""
+        self.pager.refrescar()
+    
+    def cargar_pagina(self, despues, limite):
+        """Obtiene una página de ventas con el filtro y orden actuales"""
+        return db.get_pagina('ventas', self.filtro_sql, self.filtro_params,
+                             orden=self.orden, descendente=self.descendente,
+                             despues=despues, limite=limite)
+    
+    def contar_ventas(self):
+        """Total de ventas que cumplen el filtro actual"""
+        return db.contar_filas('ventas', self.filtro_sql, self.filtro_params)
+    
+    def update_count(self, cargadas, total):
+        """Actualiza el contador de ventas"""
+        self.count_label.config(text=f"Mostrando {cargadas} de {total} ventas")
+    
+    def set_filtro(self, filtro_sql='1=1', params=()):
+        """Cambia el filtro de la tabla y vuelve a la primera página"""
+        self.filtro_sql = filtro_sql
+        self.filtro_params = list(params)
+        self.pager.reset()
+    
+    def ordenar_por(self, columna):
+        """Ordena por la columna indicada; un segundo clic invierte el orden"""
+        orden = self.encabezados[columna][1]
+        if orden == self.orden:
+            self.descendente = not self.descendente
+        else:
+            self.orden = orden
+            self.descendente = orden == 'fecha_iso'
+        
+        self.actualizar_encabezados()
+        self.pager.reset()
+    
+    def actualizar_encabezados(self):
+        """Marca en el encabezado la columna y dirección del orden"""
+        for col, (texto, orden) in self.encabezados.items():
+            if orden == self.orden:
+                texto += ' ▼' if self.descendente else ' ▲'
+            self.tree.heading(col, text=texto)
+    
+    def render_ventas(self, ventas, inicio=0):
+        """Convierte las ventas en renglones de la tabla"""
+        rows = []
+        for idx, v in enumerate(ventas, start=inicio):
             # Determinar tag por método de pago
             if v['metodo_pago'] == 'Efectivo':
                 tag = 'efectivo'
@@ -252,7 +311,9 @@ class HistorialVentasWindow:
                 v['metodo_pago']
             )
             
-            self.tree.insert('', tk.END, values=values, tags=(tag,))
+            rows.append((v['id'], values, (tag,)))
+        
+        return rows
     
     def aplicar_filtros(self):
         """Aplica los filtros de búsqueda"""
@@ -260,30 +321,26 @@ class HistorialVentasWindow:
         fecha_inicio = self.fecha_inicio.get_date()
         fecha_fin = self.fecha_fin.get_date()
         
-        # Construir query SQL
-        sql = 'SELECT * FROM ventas WHERE 1=1'
-        params = []
+        # Filtro de fechas
+        sql = 'fecha_iso BETWEEN ? AND ?'
+        params = list(iso_day_range(fecha_inicio, fecha_fin))
         
         # Filtro de búsqueda general
         if query:
-            from utils import normalize_text
             sql += ' AND (LOWER(producto) LIKE ? OR CAST(numero_venta AS TEXT) LIKE ?)'
             params.extend([f'%{query.lower()}%', f'%{query}%'])
         
-        # Filtro de fechas
-        fecha_inicio_str = fecha_inicio.strftime('%d/%m/%Y')
-        fecha_fin_str = fecha_fin.strftime('%d/%m/%Y')
-        
-        sql += ' AND DATE(SUBSTR(fecha, 7, 4) || "-" || SUBSTR(fecha, 4, 2) || "-" || SUBSTR(fecha, 1, 2)) BETWEEN ? AND ?'
-        params.extend([fecha_inicio.strftime('%Y-%m-%d'), fecha_fin.strftime('%Y-%m-%d')])
-        
-        sql += ' ORDER BY fecha DESC, numero_venta DESC'
-        
-        # Ejecutar query
-        db.cursor.execute(sql, params)
-        ventas = [dict(row) for row in db.cursor.fetchall()]
-        
-        self.load_ventas(ventas)
+        self.set_filtro(sql, params)
+        self.mostrar_resumen_periodo(fecha_inicio, fecha_fin)
+    
+    def mostrar_resumen_periodo(self, desde, hasta):
+        """Muestra los totales del periodo sin recorrer las ventas una por una"""
+        resumen = db.get_resumen_periodo(desde, hasta)
+        self.resumen_label.config(
+            text=f"Periodo: {format_currency(resumen['ingreso_total'])} "
+                 f"(Efectivo {format_currency(resumen['efectivo'])}, "
+                 f"Transferencia {format_currency(resumen['transferencia'])}) | "
+                 f"Ganancias: {format_currency(resumen['ganancias'])}")
     
     def filtro_hoy(self):
         """Filtra ventas de hoy"""
@@ -322,55 +379,34 @@ class HistorialVentasWindow:
     
     def filtro_metodo_pago(self, metodo):
         """Filtra por método de pago"""
-        db.cursor.execute('SELECT * FROM ventas WHERE metodo_pago = ? ORDER BY fecha DESC', (metodo,))
-        ventas = [dict(row) for row in db.cursor.fetchall()]
-        self.load_ventas(ventas)
+        self.set_filtro('metodo_pago = ?', (metodo,))
     
     def filtro_mas_vendido(self):
-        """Muestra el producto más vendido"""
-        db.cursor.execute('''
-            SELECT producto, SUM(cantidad) as total_cantidad, COUNT(*) as num_ventas
-            FROM ventas
-            GROUP BY producto
-            ORDER BY total_cantidad DESC
-            LIMIT 1
-        ''')
-        
-        result = db.cursor.fetchone()
-        if result:
-            producto_mas_vendido = result['producto']
-            db.cursor.execute('SELECT * FROM ventas WHERE producto = ? ORDER BY fecha DESC', 
-                            (producto_mas_vendido,))
-            ventas = [dict(row) for row in db.cursor.fetchall()]
-            self.load_ventas(ventas)
-            
-            messagebox.showinfo("Producto Más Vendido", 
-                              f"Producto: {producto_mas_vendido}\n"
-                              f"Cantidad total vendida: {result['total_cantidad']:.1f}\n"
-                              f"Número de ventas: {result['num_ventas']}")
+        """Muestra el ranking de productos más vendidos del periodo"""
+        RankingDialog(self.window, self.fecha_inicio.get_date(), self.fecha_fin.get_date(),
+                      ascendente=False, on_select=self.filtro_producto)
     
     def filtro_menos_vendido(self):
-        """Muestra el producto menos vendido"""
-        db.cursor.execute('''
-            SELECT producto, SUM(cantidad) as total_cantidad, COUNT(*) as num_ventas
-            FROM ventas
-            GROUP BY producto
-            ORDER BY total_cantidad ASC
-            LIMIT 1
-        ''')
-        
-        result = db.cursor.fetchone()
-        if result:
-            producto_menos_vendido = result['producto']
-            db.cursor.execute('SELECT * FROM ventas WHERE producto = ? ORDER BY fecha DESC', 
-                            (producto_menos_vendido,))
-            ventas = [dict(row) for row in db.cursor.fetchall()]
-            self.load_ventas(ventas)
-            
-            messagebox.showinfo("Producto Menos Vendido", 
-                              f"Producto: {producto_menos_vendido}\n"
-                              f"Cantidad total vendida: {result['total_cantidad']:.1f}\n"
-                              f"Número de ventas: {result['num_ventas']}")
+        """Muestra el ranking de productos menos vendidos del periodo"""
+        RankingDialog(self.window, self.fecha_inicio.get_date(), self.fecha_fin.get_date(),
+                      ascendente=True, on_select=self.filtro_producto)
+    
+    def filtro_producto(self, id_producto, producto):
+        """
+        Filtra las ventas de un producto en el periodo seleccionado
+        (por ID; por nombre si es una venta manual sin producto)
+        """
+        sql = 'fecha_iso BETWEEN ? AND ?'
+        params = list(iso_day_range(self.fecha_inicio.get_date(), self.fecha_fin.get_date()))
+        
+        if id_producto is not None:
+            sql += ' AND id_producto = ?'
+            params.append(id_producto)
+        else:
+            sql += ' AND id_producto IS NULL AND producto = ?'
+            params.append(producto)
+        
+        self.set_filtro(sql, params)
     
     def filtro_numero_venta(self):
         """Filtra por número de venta"""
@@ -381,14 +417,10 @@ class HistorialVentasWindow:
         
         try:
             num_venta = int(num_venta)
-            db.cursor.execute('SELECT * FROM ventas WHERE numero_venta = ? ORDER BY fecha DESC', 
-                            (num_venta,))
-            ventas = [dict(row) for row in db.cursor.fetchall()]
+            self.set_filtro('numero_venta = ?', (num_venta,))
             
-            if not ventas:
+            if not self.pager.total:
                 messagebox.showinfo("No encontrado", f"No se encontró la venta #{num_venta}")
-            
-            self.load_ventas(ventas)
         except ValueError:
             messagebox.showerror("Error", "El número de venta debe ser un número entero")
     
@@ -399,7 +431,8 @@ class HistorialVentasWindow:
         hoy = datetime.now().date()
         self.fecha_inicio.set_date(hoy - timedelta(days=30))
         self.fecha_fin.set_date(hoy)
-        self.load_ventas()
+        self.set_filtro()
+        self.resumen_label.config(text="")
     
     def modificar_venta(self):
         """Abre diálogo para modificar venta"""
@@ -415,8 +448,8 @@ class HistorialVentasWindow:
                                   "Por favor selecciona solo una venta para modificar")
             return
         
-        item = self.tree.item(selection[0])
-        venta_id = self.get_venta_id_from_values(item['values'])
+        # Cada renglón usa el id de la venta como iid
+        venta_id = int(selection[0])
         
         if venta_id:
             VentaDialog(self.window, venta_id=venta_id, callback=self.load_ventas)
@@ -436,10 +469,7 @@ class HistorialVentasWindow:
             return
         
         for item in selection:
-            values = self.tree.item(item)['values']
-            venta_id = self.get_venta_id_from_values(values)
-            if venta_id:
-                db.cursor.execute('DELETE FROM ventas WHERE id = ?', (venta_id,))
+            db.cursor.execute('DELETE FROM ventas WHERE id = ?', (int(item),))
         
         db.conn.commit()
         messagebox.showinfo("Éxito", "Venta(s) eliminada(s) correctamente")
@@ -449,21 +479,6 @@ class HistorialVentasWindow:
         """Abre diálogo para agregar venta manual"""
         VentaDialog(self.window, callback=self.load_ventas)
     
-    def get_venta_id_from_values(self, values):
-        """Obtiene el ID de la venta desde los valores mostrados"""
-        numero_venta = values[0]
-        fecha = values[1]
-        producto = values[2]
-        
-        db.cursor.execute('''
-            SELECT id FROM ventas 
-            WHERE numero_venta = ? AND fecha = ? AND producto = ?
-            LIMIT 1
-        ''', (numero_venta, fecha, producto))
-        
-        result = db.cursor.fetchone()
-        return result['id'] if result else None
-    
     def close_window(self):
         """Cierra la ventana y vuelve al menú"""
         self.window.destroy()
@@ -471,6 +486,164 @@ class HistorialVentasWindow:
             self.on_close_callback()
 
 
+class RankingDialog:
+    # Texto del selector -> criterio de db.get_ranking_productos
+    CRITERIOS = {
+        'Unidades': 'cantidad',
+        'Ingresos': 'total',
+        'Ganancia': 'ganancia',
+    }
+    
+    def __init__(self, parent, desde, hasta, ascendente=False, on_select=None):
+        self.desde = desde
+        self.hasta = hasta
+        self.ascendente = ascendente
+        self.on_select = on_select
+        self.ranking = []
+        
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("Menos Vendidos" if ascendente else "Más Vendidos")
+        self.dialog.geometry("750x550")
+        self.dialog.configure(bg=COLORS['bg_primary'])
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+        
+        # Forzar al frente
+        self.dialog.lift()
+        self.dialog.attributes('-topmost', True)
+        self.dialog.after(100, lambda: self.dialog.attributes('-topmost', False))
+        
+        # Centrar ventana
+        self.center_dialog()
+        
+        self.setup_ui()
+        self.load_ranking()
+    
+    def center_dialog(self):
+        """Centra el diálogo en la pantalla"""
+        self.dialog.update_idletasks()
+        width = 750
+        height = 550
+        x = (self.dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.dialog.winfo_screenheight() // 2) - (height // 2)
+        self.dialog.geometry(f"{width}x{height}+{x}+{y}")
+    
+    def setup_ui(self):
+        """Configura la interfaz del diálogo"""
+        main_frame = tk.Frame(self.dialog, bg=COLORS['bg_primary'])
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        
+        # Título con el periodo
+        titulo = "Menos Vendidos" if self.ascendente else "Más Vendidos"
+        tk.Label(main_frame, text=titulo, font=FONTS['title'],
+                bg=COLORS['bg_primary'], fg=COLORS['text_primary']).pack()
+        tk.Label(main_frame,
+                text=f"Del {self.desde.strftime('%d/%m/%Y')} al {self.hasta.strftime('%d/%m/%Y')}",
+                font=FONTS['normal'], bg=COLORS['bg_primary'],
+                fg=COLORS['text_primary']).pack(pady=(0, 15))
+        
+        # Criterio y cantidad de productos
+        options_frame = tk.Frame(main_frame, bg=COLORS['bg_primary'])
+        options_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        tk.Label(options_frame, text="Ordenar por:", font=FONTS['normal'],
+                bg=COLORS['bg_primary']).pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.criterio_var = tk.StringVar(value='Unidades')
+        criterio_combo = ttk.Combobox(options_frame, textvariable=self.criterio_var,
+                                      values=list(self.CRITERIOS), state='readonly', width=12)
+        criterio_combo.pack(side=tk.LEFT, padx=(0, 20))
+        criterio_combo.bind('<<ComboboxSelected>>', lambda e: self.load_ranking())
+        
+        tk.Label(options_frame, text="Mostrar:", font=FONTS['normal'],
+                bg=COLORS['bg_primary']).pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.limite_var = tk.StringVar(value='10')
+        limite_spin = tk.Spinbox(options_frame, from_=1, to=100, width=5,
+                                 textvariable=self.limite_var, font=FONTS['normal'],
+                                 command=self.load_ranking)
+        limite_spin.pack(side=tk.LEFT)
+        limite_spin.bind('<Return>', lambda e: self.load_ranking())
+        
+        # Tabla del ranking
+        table_frame = tk.Frame(main_frame, bg=COLORS['bg_primary'])
+        table_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
+        
+        scrollbar = ttk.Scrollbar(table_frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        columns = ('Pos', 'Producto', 'Unidades', 'Ventas', 'Ingresos', 'Ganancia')
+        self.tree = ttk.Treeview(table_frame, columns=columns, show='headings',
+                                yscrollcommand=scrollbar.set, selectmode='browse')
+        
+        for col in columns:
+            self.tree.heading(col, text=col)
+        
+        self.tree.column('Pos', width=50, anchor='center')
+        self.tree.column('Producto', width=220)
+        self.tree.column('Unidades', width=90, anchor='center')
+        self.tree.column('Ventas', width=70, anchor='center')
+        self.tree.column('Ingresos', width=110, anchor='e')
+        self.tree.column('Ganancia', width=110, anchor='e')
+        
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.tree.yview)
+        
+        self.tree.tag_configure('evenrow', background=COLORS['table_row_even'])
+        self.tree.tag_configure('oddrow', background=COLORS['table_row_odd'])
+        self.tree.bind('<Double-1>', lambda e: self.ver_ventas())
+        self.tree_binder = TreeviewBinder(self.tree)
+        
+        # Botones
+        button_frame = tk.Frame(main_frame, bg=COLORS['bg_primary'])
+        button_frame.pack(fill=tk.X)
+        
+        tk.Button(button_frame, text="Cerrar", command=self.dialog.destroy,
+                 font=FONTS['button'], bg=COLORS['button_bg'],
+                 relief=tk.RAISED, borderwidth=2, padx=20, pady=10).pack(side=tk.LEFT, padx=5)
+        
+        if self.on_select:
+            tk.Button(button_frame, text="Ver Ventas del Producto", command=self.ver_ventas,
+                     font=FONTS['button'], bg=COLORS['accent'], fg='white',
+                     relief=tk.RAISED, borderwidth=2, padx=20, pady=10).pack(side=tk.RIGHT, padx=5)
+    
+    def load_ranking(self):
+        """Consulta el ranking con el criterio y la cantidad seleccionados"""
+        try:
+            limite = max(1, int(self.limite_var.get()))
+        except ValueError:
+            limite = 10
+        
+        self.ranking = db.get_ranking_productos(self.desde, self.hasta,
+                                                criterio=self.CRITERIOS[self.criterio_var.get()],
+                                                ascendente=self.ascendente, limite=limite)
+        
+        rows = []
+        for idx, r in enumerate(self.ranking):
+            tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
+            values = (
+                idx + 1,
+                r['producto'],
+                f"{r['cantidad']:.1f}",
+                r['num_ventas'],
+                format_currency(r['total']),
+                format_currency(r['ganancia'])
+            )
+            rows.append((idx, values, (tag,)))
+        
+        self.tree_binder.set_rows(rows)
+    
+    def ver_ventas(self):
+        """Filtra el historial con las ventas del producto seleccionado"""
+        selection = self.tree.selection()
+        if not selection or not self.on_select:
+            return
+        
+        producto = self.ranking[int(selection[0])]
+        self.dialog.destroy()
+        self.on_select(producto['id_producto'], producto['producto'])
+
+
 class VentaDialog:
     def __init__(self, parent, venta_id=None, callback=None):
         self.venta_id = venta_id
@@ -3,9 +3,10 @@ Módulo de gestión de materia prima (ingredientes)
 """
 import tkinter as tk
 from tkinter import ttk, messagebox
-from config import COLORS, FONTS
-from utils import format_currency, validate_float
+from config import COLORS, FONTS, UNIDADES_MEDIDA
+from utils import format_currency, validate_float, to_cents, cents_to_str
 from database import db
+from widgets import SearchController, TreeviewBinder
 
 class IngredientesWindow:
     def __init__(self, parent, on_close=None):
@@ -58,6 +59,8 @@ class IngredientesWindow:
                 bg=COLORS['bg_primary']).pack(side=tk.LEFT, padx=(0, 10))
         
         self.search_var = tk.StringVar()
+        self.search_controller = SearchController(self.window, self.buscar_ingredientes,
+                                                  self.show_search_results)
         self.search_var.trace('w', lambda *args: self.search_ingredientes())
         search_entry = tk.Entry(search_frame, textvariable=self.search_var,
                                font=FONTS['normal'], width=40)
@@ -102,6 +105,7 @@ class IngredientesWindow:
         # Colores alternados
         self.tree.tag_configure('evenrow', background=COLORS['table_row_even'])
         self.tree.tag_configure('oddrow', background=COLORS['table_row_odd'])
+        self.tree_binder = TreeviewBinder(self.tree)
         
         # Frame de botones (SIN Importar/Exportar Excel)
         button_frame = tk.Frame(main_frame, bg=COLORS['bg_primary'])
@@ -124,10 +128,11 @@ class IngredientesWindow:
     
     def load_ingredientes(self):
         """Carga los ingredientes en la tabla"""
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        ingredientes = db.get_ingredientes()
+        self.show_ingredientes(db.get_ingredientes())
+    
+    def show_ingredientes(self, ingredientes):
+        """Muestra los ingredientes en la tabla (solo actualiza las filas que cambiaron)"""
+        rows = []
         
         for idx, ing in enumerate(ingredientes):
             tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
@@ -141,41 +146,32 @@ class IngredientesWindow:
                 'Sí' if ing['gestion_stock'] else 'No'
             )
             
-            self.tree.insert('', tk.END, values=values, tags=(tag,))
+            rows.append((ing['id'], values, (tag,)))
+        
+        self.tree_binder.set_rows(rows)
     
     def search_ingredientes(self):
-        """Busca ingredientes según el texto ingresado"""
-        from utils import normalize_text
-        query = normalize_text(self.search_var.get())
-        
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        if not query:
+        """Programa la búsqueda según el texto ingresado (sin bloquear la interfaz)"""
+        self.search_controller.schedule(self.search_var.get())
+    
+    def buscar_ingredientes(self, query):
+        """Consulta de búsqueda (se ejecuta en el hilo de búsqueda)"""
+        if not query.strip():
+            return None
+        return db.reader().search_ingredientes(query)
+    
+    def show_search_results(self, query, filtered):
+        """Muestra el resultado de la búsqueda más reciente"""
+        if filtered is None:
             self.load_ingredientes()
             return
         
-        ingredientes = db.get_ingredientes()
-        filtered = [ing for ing in ingredientes 
-                   if query in normalize_text(ing['nombre'])]
-        
-        for idx, ing in enumerate(filtered):
-            tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
-            
-            values = (
-                ing['id'],
-                ing['nombre'],
-                ing['unidad_almacen'],
-                format_currency(ing['costo_unitario']),
-                f"{ing['cantidad_stock']:.2f}",
-                'Sí' if ing['gestion_stock'] else 'No'
-            )
-            
-            self.tree.insert('', tk.END, values=values, tags=(tag,))
+        self.show_ingredientes(filtered)
     
     def clear_filter(self):
         """Limpia los filtros de búsqueda"""
         self.search_var.set("")
+        self.search_controller.cancel()
         self.load_ingredientes()
     
     def add_ingrediente_dialog(self):
@@ -196,8 +192,7 @@ class IngredientesWindow:
                                   "Por favor selecciona solo un ingrediente para modificar")
             return
         
-        item = self.tree.item(selection[0])
-        ingrediente_id = item['values'][0]
+        ingrediente_id = int(selection[0])
         
         IngredienteDialog(self.window, ingrediente_id=ingrediente_id,
                          callback=self.load_ingredientes)
@@ -216,7 +211,7 @@ class IngredientesWindow:
             return
         
         for item in selection:
-            ingrediente_id = self.tree.item(item)['values'][0]
+            ingrediente_id = int(item)
             db.delete_ingrediente(ingrediente_id)
         
         messagebox.showinfo("Éxito", "Ingrediente(s) eliminado(s) correctamente")
@@ -237,7 +232,7 @@ class IngredientesWindow:
             return
         
         item = self.tree.item(selection[0])
-        ingrediente_id = item['values'][0]
+        ingrediente_id = int(selection[0])
         ingrediente_nombre = item['values'][1]
         
         RegistrarCompraDialog(self.window, ingrediente_id, ingrediente_nombre,
@@ -254,6 +249,7 @@ class IngredienteDialog:
     def __init__(self, parent, ingrediente_id=None, callback=None):
         self.ingrediente_id = ingrediente_id
         self.callback = callback
+        self.costo_original = None
         
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("Añadir Ingrediente" if not ingrediente_id else "Modificar Ingrediente")
@@ -323,7 +319,7 @@ class IngredienteDialog:
         unidad_frame.pack(anchor='w', pady=(0, 10))
         
         self.unidad_var = tk.StringVar(value='Kg')
-        for unidad in ['Pza', 'Kg', 'L']:
+        for unidad in UNIDADES_MEDIDA:
             tk.Radiobutton(unidad_frame, text=unidad, variable=self.unidad_var,
                           value=unidad, font=FONTS['normal'],
                           bg=COLORS['bg_primary']).pack(side=tk.LEFT, padx=10)
@@ -374,7 +370,10 @@ class IngredienteDialog:
         
         self.id_var.set(str(ingrediente['id']))
         self.nombre_var.set(ingrediente['nombre'])
-        self.costo_var.set(str(ingrediente['costo_unitario']))
+        # El costo puede tener fracciones de centavo (p. ej. preparados); el campo lo
+        # muestra redondeado y solo se guarda si el usuario lo cambia
+        self.costo_original = cents_to_str(ingrediente['costo_unitario'])
+        self.costo_var.set(self.costo_original)
         self.unidad_var.set(ingrediente['unidad_almacen'])
         self.stock_var.set(str(ingrediente['cantidad_stock']))
         self.gestion_var.set(bool(ingrediente['gestion_stock']))
@@ -397,7 +396,7 @@ class IngredienteDialog:
             return
         
         try:
-            costo = float(self.costo_var.get())
+            costo = to_cents(self.costo_var.get())
             stock = float(self.stock_var.get())
         except ValueError:
             messagebox.showerror("Error", "Costo y stock deben ser números válidos")
@@ -406,15 +405,16 @@ class IngredienteDialog:
         try:
             if self.ingrediente_id:
                 # Actualizar ingrediente
+                cambios = {}
+                if self.costo_var.get().strip() != self.costo_original:
+                    cambios['costo_unitario'] = costo
+                
                 db.update_ingrediente(self.ingrediente_id, new_id,
                                     nombre=nombre,
-                                    costo_unitario=costo,
                                     unidad_almacen=self.unidad_var.get(),
                                     cantidad_stock=stock,
-                                    gestion_stock=1 if self.gestion_var.get() else 0)
-                
-                # Actualizar stocks estimados de productos que usan este ingrediente
-                db.actualizar_todos_stocks_estimados()
+                                    gestion_stock=1 if self.gestion_var.get() else 0,
+                                    **cambios)
             else:
                 # Verificar si el ID ya existe
                 if db.id_exists('ingredientes', new_id):
@@ -514,9 +514,6 @@ class RegistrarCompraDialog:
             
             db.registrar_compra_ingrediente(self.ingrediente_id, cantidad)
             
-            # Actualizar stocks estimados de productos que usan este ingrediente
-            db.actualizar_todos_stocks_estimados()
-            
             messagebox.showinfo("Éxito", f"Se registró la compra de {cantidad} unidades")
             
             if self.callback:
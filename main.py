@@ -5,6 +5,8 @@ import tkinter as tk
 from tkinter import messagebox
 from config import COLORS, FONTS, WINDOW_CONFIG, DENOMINACIONES
 from database import db
+from thumbnails import thumbnail_cache
+from print_queue import print_queue
 from utils import get_current_date
 
 class MitsysPOS:
@@ -20,6 +22,9 @@ class MitsysPOS:
         # Centrar ventana principal
         self.center_window(self.root, 600, 700)
         
+        # Cola de impresión (retoma los tickets que quedaron pendientes)
+        print_queue.iniciar(self.root)
+        
         # Mostrar splash screen
         self.show_splash()
     
@@ -59,6 +64,12 @@ class MitsysPOS:
         tk.Label(frame, text="By Sebas and Paola", font=('Segoe UI', 16),
                 bg=COLORS['bg_primary'], fg=COLORS['text_secondary']).pack()
         
+        # Eliminar miniaturas de imágenes que ya no usa ningún producto
+        try:
+            thumbnail_cache.purgar_huerfanos(p['imagen'] for p in db.get_productos(activos_only=False))
+        except Exception:
+            pass
+        
         # Programar cierre del splash
         self.splash.after(WINDOW_CONFIG['splash_duration'], self.close_splash)
     
@@ -194,6 +205,7 @@ class MitsysPOS:
     def salir(self):
         """Cierra el programa"""
         if messagebox.askyesno("Salir", "¿Estás seguro de que deseas salir del sistema?"):
+            print_queue.detener()
             self.root.quit()
             self.root.destroy()
     
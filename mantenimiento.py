@@ -0,0 +1,53 @@
+"""
+Tareas de mantenimiento de la base de datos de Mitsy's POS
+
+Uso:
+    python mantenimiento.py resumenes    Reconstruye los resúmenes diarios de ventas
+    python mantenimiento.py inventario   Reconstruye el stock de ingredientes desde sus movimientos
+    python mantenimiento.py costos       Recalcula el costo de preparados y productos desde sus recetas
+"""
+import argparse
+from database import db
+
+
+def reconstruir_resumenes(args):
+    """Vuelve a calcular los resúmenes diarios desde las ventas"""
+    filas = db.reconstruir_resumenes()
+    for tabla, cantidad in filas.items():
+        print(f"✓ {tabla}: {cantidad} filas")
+
+
+def conciliar_inventario(args):
+    """Vuelve a calcular el stock de ingredientes desde el libro de movimientos"""
+    diferencias = db.conciliar_inventario()
+    for ing in diferencias:
+        print(f"✓ {ing['id']} {ing['nombre']}: {ing['stock_anterior']:g} -> {ing['stock_libro']:g}")
+    print(f"✓ {len(diferencias)} ingredientes corregidos")
+
+
+def recalcular_costos(args):
+    """Vuelve a calcular los costos de todos los preparados y productos con receta"""
+    resultado = db.recalcular_costos()
+    print(f"✓ {resultado['preparados']} preparados, {resultado['productos']} productos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantenimiento de la base de datos de Mitsy's POS")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    
+    comandos.add_parser('resumenes', help='Reconstruye los resúmenes diarios de ventas'
+                        ).set_defaults(funcion=reconstruir_resumenes)
+    comandos.add_parser('inventario', help='Reconstruye el stock de ingredientes desde sus movimientos'
+                        ).set_defaults(funcion=conciliar_inventario)
+    comandos.add_parser('costos', help='Recalcula el costo de preparados y productos desde sus recetas'
+                        ).set_defaults(funcion=recalcular_costos)
+    
+    args = parser.parse_args()
+    try:
+        args.funcion(args)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Cola de impresión de tickets en segundo plano para Mitsy's POS
+"""
+import os
+import time
+import heapq
+import queue
+import threading
+import tkinter as tk
+from typing import Callable, Dict, List, Optional
+from config import PRINT_CONFIG
+from database import db
+from tickets import ticket_generator
+
+class PrintQueue:
+    def __init__(self, generator=None, max_intentos: int = None,
+                 reintento_base_s: float = None, reintento_max_s: float = None,
+                 poll_ms: int = None):
+        """
+        Genera e imprime los tickets en un hilo de trabajo para que una impresora
+        lenta o apagada no congele el cobro.
+        - Cada trabajo se guarda en la tabla trabajos_impresion antes de procesarse;
+          los que quedan pendientes al cerrar el programa se retoman en iniciar()
+        - Los errores se reintentan con espera creciente (reintento_base_s, el doble
+          en cada intento, hasta reintento_max_s); después de max_intentos el trabajo
+          queda como 'fallido'
+        - El hilo no toca la base de datos: reporta el avance por una cola que el
+          hilo de Tk revisa con after(), y ahí se guarda el estado y se avisa a los
+          observadores
+        """
+        self.generator = generator or ticket_generator
+        self.max_intentos = max_intentos or PRINT_CONFIG['max_intentos']
+        self.reintento_base_s = reintento_base_s or PRINT_CONFIG['reintento_base_s']
+        self.reintento_max_s = reintento_max_s or PRINT_CONFIG['reintento_max_s']
+        self.poll_ms = poll_ms or PRINT_CONFIG['poll_ms']
+        
+        self.widget = None
+        self._poll_id = None
+        self._en_curso = 0
+        self._observadores = []
+        self._solicitudes = queue.Queue()
+        self._resultados = queue.Queue()
+        self._hilo = None
+    
+    def iniciar(self, widget):
+        """
+        Arranca el hilo de trabajo y retoma los trabajos pendientes
+        widget: widget Tk (normalmente la ventana raíz) usado para programar after()
+        """
+        self.widget = widget
+        
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._trabajar, daemon=True)
+            self._hilo.start()
+        
+        db.purgar_trabajos_impresion(PRINT_CONFIG['dias_fallidos'])
+        for trabajo in db.get_trabajos_impresion_pendientes():
+            self._enviar(trabajo)
+    
+    def detener(self):
+        """Detiene el hilo de trabajo; lo pendiente se retoma la próxima vez"""
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except tk.TclError:
+                pass
+            self._poll_id = None
+        if self._hilo is not None:
+            self._solicitudes.put(None)
+            self._hilo = None
+    
+    def encolar_ticket(self, venta_data: Dict, imprimir: bool = False) -> int:
+        """
+        Genera el PDF del ticket y, si imprimir es True, lo manda a la impresora
+        Retorna el id del trabajo
+        """
+        trabajo = db.add_trabajo_impresion(datos=venta_data, imprimir=imprimir)
+        self._enviar(trabajo)
+        return trabajo['id']
+    
+    def encolar_impresion(self, ruta_pdf: str) -> int:
+        """Manda a imprimir un PDF ya generado; retorna el id del trabajo"""
+        trabajo = db.add_trabajo_impresion(ruta_pdf=ruta_pdf, imprimir=True)
+        self._enviar(trabajo)
+        return trabajo['id']
+    
+    def agregar_observador(self, callback: Callable[[Dict], None]):
+        """callback(trabajo) se llama en el hilo de Tk cada vez que un trabajo cambia de estado"""
+        self._observadores.append(callback)
+    
+    def quitar_observador(self, callback: Callable[[Dict], None]):
+        """Deja de avisar a un observador"""
+        if callback in self._observadores:
+            self._observadores.remove(callback)
+    
+    @property
+    def pendientes(self) -> int:
+        """Trabajos enviados al hilo que aún no terminan"""
+        return self._en_curso
+    
+    def _enviar(self, trabajo: Dict):
+        """Envía un trabajo al hilo y programa la revisión de resultados"""
+        self._en_curso += 1
+        self._solicitudes.put(dict(trabajo))
+        self._programar_poll()
+    
+    def _programar_poll(self):
+        """Programa la revisión de resultados en el hilo de Tk"""
+        if self._poll_id is None and self.widget is not None:
+            try:
+                self._poll_id = self.widget.after(self.poll_ms, self.procesar_resultados)
+            except tk.TclError:
+                self._poll_id = None
+    
+    def _espera_reintento(self, intentos: int) -> float:
+        """Segundos de espera antes del siguiente intento"""
+        return min(self.reintento_base_s * 2 ** (intentos - 1), self.reintento_max_s)
+    
+    def _trabajar(self):
+        """Hilo de trabajo: procesa cada trabajo cuando le toca (nuevo o reintento)"""
+        programados = []  # heap de (momento, id, trabajo)
+        
+        while True:
+            espera = None
+            if programados:
+                espera = max(0, programados[0][0] - time.monotonic())
+            
+            try:
+                trabajo = self._solicitudes.get(timeout=espera)
+                if trabajo is None:
+                    return
+                heapq.heappush(programados, (time.monotonic(), trabajo['id'], trabajo))
+                continue
+            except queue.Empty:
+                pass
+            
+            _, _, trabajo = heapq.heappop(programados)
+            espera = self._procesar(trabajo)
+            if espera is not None:
+                heapq.heappush(programados, (time.monotonic() + espera, trabajo['id'], trabajo))
+    
+    def _procesar(self, trabajo: Dict) -> Optional[float]:
+        """
+        Un intento de generar e imprimir el ticket
+        Retorna los segundos para reintentar, o None si el trabajo terminó
+        """
+        try:
+            ruta = trabajo['ruta_pdf']
+            if not ruta or not os.path.exists(ruta):
+                if not trabajo['datos']:
+                    # Reimpresión de un archivo que ya no existe: no tiene caso reintentar
+                    self._reportar(trabajo, 'fallido', error=f"No existe el archivo {ruta}")
+                    return None
+                
+                ruta = self.generator.generate_ticket(trabajo['datos'])
+                trabajo['ruta_pdf'] = ruta
+                self._reportar(trabajo, 'pendiente', generado=True)
+            
+            if trabajo['imprimir'] and not self.generator.print_ticket(ruta):
+                raise RuntimeError("La impresora no aceptó el ticket")
+            
+            self._reportar(trabajo, 'listo')
+            return None
+        except Exception as e:
+            trabajo['intentos'] += 1
+            if trabajo['intentos'] >= self.max_intentos:
+                self._reportar(trabajo, 'fallido', error=str(e))
+                return None
+            
+            self._reportar(trabajo, 'pendiente', error=str(e))
+            return self._espera_reintento(trabajo['intentos'])
+    
+    def _reportar(self, trabajo: Dict, estado: str, error: str = None, generado: bool = False):
+        """Envía una copia del estado del trabajo al hilo de Tk"""
+        self._resultados.put(dict(trabajo, estado=estado, error=error, generado=generado))
+    
+    def procesar_resultados(self) -> List[Dict]:
+        """
+        Guarda en la base de datos el avance reportado por el hilo y avisa a los
+        observadores (hilo de Tk). Se llama sola con after() mientras haya trabajos.
+        """
+        self._poll_id = None
+        
+        procesados = []
+        while True:
+            try:
+                trabajo = self._resultados.get_nowait()
+            except queue.Empty:
+                break
+            
+            db.update_trabajo_impresion(trabajo['id'], estado=trabajo['estado'],
+                                        intentos=trabajo['intentos'],
+                                        ruta_pdf=trabajo['ruta_pdf'], error=trabajo['error'])
+            if trabajo['generado']:
+                db.set_last_ticket_path(trabajo['ruta_pdf'])
+            if trabajo['estado'] in ('listo', 'fallido'):
+                self._en_curso -= 1
+            
+            for callback in list(self._observadores):
+                callback(trabajo)
+            procesados.append(trabajo)
+        
+        if self._en_curso > 0:
+            self._programar_poll()
+        
+        return procesados
+
+
+# Instancia global
+print_queue = PrintQueue()
@@ -5,9 +5,11 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from PIL import Image, ImageTk
 import os
-from config import COLORS, FONTS
-from utils import format_currency, parse_currency, validate_float
+from config import COLORS, FONTS, UNIDADES_MEDIDA
+from utils import format_currency, parse_currency, validate_float, to_cents, cents_to_str
 from database import db
+from thumbnails import thumbnail_cache
+from widgets import SearchController, TreeviewBinder
 
 class ProductosWindow:
     def __init__(self, parent, on_close=None):
@@ -64,6 +66,8 @@ class ProductosWindow:
                 bg=COLORS['bg_primary']).pack(side=tk.LEFT, padx=(0, 10))
         
         self.search_var = tk.StringVar()
+        self.search_controller = SearchController(self.window, self.buscar_productos,
+                                                  self.show_search_results)
         self.search_var.trace('w', lambda *args: self.search_productos())
         search_entry = tk.Entry(search_frame, textvariable=self.search_var,
                                font=FONTS['normal'], width=40)
@@ -109,6 +113,7 @@ class ProductosWindow:
         # Configurar colores alternados en filas
         self.tree.tag_configure('evenrow', background=COLORS['table_row_even'])
         self.tree.tag_configure('oddrow', background=COLORS['table_row_odd'])
+        self.tree_binder = TreeviewBinder(self.tree)
         
         # Frame de botones (SIN botón "Gestión Stock")
         button_frame = tk.Frame(main_frame, bg=COLORS['bg_primary'])
@@ -130,12 +135,12 @@ class ProductosWindow:
     
     def load_productos(self):
         """Carga los productos en la tabla"""
-        # Limpiar tabla
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Cargar productos
-        productos = db.get_productos()
+        self.show_productos(db.get_productos())
+    
+    def show_productos(self, productos):
+        """Muestra los productos en la tabla (solo actualiza las filas que cambiaron)"""
+        gestion_activa = db.is_gestion_stock_active()
+        rows = []
         
         for idx, p in enumerate(productos):
             tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
@@ -147,42 +152,31 @@ class ProductosWindow:
                 format_currency(p['costo']),
                 format_currency(p['ganancia']),
                 p['unidad_medida'],
-                f"{p['stock_estimado']:.2f}" if db.is_gestion_stock_active() else "N/A",
+                f"{p['stock_estimado']:.2f}" if gestion_activa else "N/A",
                 'Sí' if p['gestion_stock'] else 'No'
             )
             
-            self.tree.insert('', tk.END, values=values, tags=(tag,))
+            rows.append((p['id'], values, (tag,)))
+        
+        self.tree_binder.set_rows(rows)
     
     def search_productos(self):
-        """Busca productos según el texto ingresado"""
-        query = self.search_var.get()
-        
-        # Limpiar tabla
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        if not query:
+        """Programa la búsqueda según el texto ingresado (sin bloquear la interfaz)"""
+        self.search_controller.schedule(self.search_var.get())
+    
+    def buscar_productos(self, query):
+        """Consulta de búsqueda (se ejecuta en el hilo de búsqueda)"""
+        if not query.strip():
+            return None
+        return db.reader().search_productos(query)
+    
+    def show_search_results(self, query, productos):
+        """Muestra el resultado de la búsqueda más reciente"""
+        if productos is None:
             self.load_productos()
             return
         
-        # Buscar productos
-        productos = db.search_productos(query)
-        
-        for idx, p in enumerate(productos):
-            tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
-            
-            values = (
-                p['id'],
-                p['nombre'],
-                format_currency(p['precio_unitario']),
-                format_currency(p['costo']),
-                format_currency(p['ganancia']),
-                p['unidad_medida'],
-                f"{p['stock_estimado']:.2f}" if db.is_gestion_stock_active() else "N/A",
-                'Sí' if p['gestion_stock'] else 'No'
-            )
-            
-            self.tree.insert('', tk.END, values=values, tags=(tag,))
+        self.show_productos(productos)
     
     def add_producto_dialog(self):
         """Abre diálogo para añadir producto"""
@@ -202,8 +196,7 @@ class ProductosWindow:
                                   "Por favor selecciona solo un producto para editar")
             return
         
-        item = self.tree.item(selection[0])
-        producto_id = item['values'][0]
+        producto_id = int(selection[0])
         
         ProductoDialog(self.window, producto_id=producto_id, 
                       callback=self.load_productos)
@@ -222,7 +215,7 @@ class ProductosWindow:
             return
         
         for item in selection:
-            producto_id = self.tree.item(item)['values'][0]
+            producto_id = int(item)
             db.delete_producto(producto_id)
         
         messagebox.showinfo("Éxito", "Producto(s) eliminado(s) correctamente")
@@ -447,8 +440,8 @@ class ProductoDialog:
         
         self.id_var.set(str(producto['id']))
         self.nombre_var.set(producto['nombre'])
-        self.precio_var.set(str(producto['precio_unitario']))
-        self.costo_var.set(str(producto['costo']))
+        self.precio_var.set(cents_to_str(producto['precio_unitario']))
+        self.costo_var.set(cents_to_str(producto['costo']))
         self.unidad_var.set(producto['unidad_medida'])
         self.gestion_var.set(bool(producto['gestion_stock']))
         self.stock_var.set(str(producto['stock_estimado']))
@@ -504,8 +497,8 @@ class ProductoDialog:
             return
         
         try:
-            precio = float(self.precio_var.get())
-            costo = float(self.costo_var.get()) if self.costo_var.get() else 0
+            precio = to_cents(self.precio_var.get())
+            costo = to_cents(self.costo_var.get()) if self.costo_var.get() else 0
             stock = float(self.stock_var.get()) if self.stock_var.get() else 0
         except ValueError:
             messagebox.showerror("Error", "Precio, costo y stock deben ser números válidos")
@@ -594,6 +587,9 @@ class ProductoDialog:
             try:
                 shutil.copy2(filename, destino)
                 self.imagen_var.set(destino)
+                
+                # Generar la miniatura para la galería del punto de venta
+                thumbnail_cache.generar(destino)
                 messagebox.showinfo("Éxito", "Imagen cargada correctamente")
             except Exception as e:
                 messagebox.showerror("Error", f"Error al copiar imagen: {str(e)}")
@@ -664,7 +660,7 @@ class IngredienteRecetaDialog:
         unidad_frame.pack(anchor='w', pady=(0, 20))
         
         self.unidad_var = tk.StringVar(value='Kg')
-        for unidad in ['Pza', 'Kg', 'L']:
+        for unidad in UNIDADES_MEDIDA:
             tk.Radiobutton(unidad_frame, text=unidad, variable=self.unidad_var,
                           value=unidad, font=FONTS['normal'],
                           bg=COLORS['bg_primary']).pack(side=tk.LEFT, padx=10)
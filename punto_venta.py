@@ -6,9 +6,11 @@ from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
 import os
 from config import COLORS, FONTS, MESAS
-from utils import format_currency, parse_currency
+from utils import format_currency, parse_currency, to_cents, multiply_cents, cents_to_str
 from database import db
-from tickets import ticket_generator
+from print_queue import print_queue
+from thumbnails import thumbnail_cache
+from widgets import VirtualGallery, SearchController, TreeviewBinder
 
 class PuntoVentaWindow:
     def __init__(self, parent, on_close=None):
@@ -31,6 +33,10 @@ class PuntoVentaWindow:
         self.window.protocol("WM_DELETE_WINDOW", self.close_window)
         
         self.setup_ui()
+        
+        # Avisos de la cola de impresión mientras la ventana esté abierta
+        print_queue.agregar_observador(self.on_print_job)
+        self.window.bind('<Destroy>', self.on_destroy, add='+')
     
     def center_window(self):
         """Centra la ventana en la pantalla"""
@@ -80,6 +86,11 @@ class PuntoVentaWindow:
                  font=FONTS['button'], bg=COLORS['accent'], fg='white',
                  relief=tk.RAISED, borderwidth=2, padx=15, pady=8).pack(side=tk.RIGHT, padx=15, pady=10)
         
+        # Estado de la cola de impresión
+        self.print_status_label = tk.Label(main_frame, text="", font=FONTS['normal'],
+                                           bg=COLORS['bg_primary'], fg=COLORS['text_primary'])
+        self.print_status_label.pack(pady=(0, 10))
+        
         # Frame para mesas (grid 3x3)
         mesas_frame = tk.Frame(main_frame, bg=COLORS['bg_primary'])
         mesas_frame.pack(expand=True)
@@ -135,7 +146,7 @@ class PuntoVentaWindow:
         db.set_auto_print(activo)
     
     def imprimir_ultimo_ticket(self):
-        """Imprime el último ticket generado"""
+        """Manda a la cola de impresión el último ticket generado"""
         last_ticket = db.get_last_ticket_path()
         
         if not last_ticket or not os.path.exists(last_ticket):
@@ -143,13 +154,35 @@ class PuntoVentaWindow:
                                   "No hay ningún ticket disponible para imprimir.")
             return
         
-        try:
-            if ticket_generator.print_ticket(last_ticket):
-                messagebox.showinfo("Éxito", "Ticket enviado a impresora")
-            else:
-                messagebox.showerror("Error", "No se pudo imprimir el ticket")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al imprimir: {str(e)}")
+        print_queue.encolar_impresion(last_ticket)
+        self.print_status_label.config(text="🖨 Ticket enviado a la cola de impresión",
+                                       fg=COLORS['text_primary'])
+    
+    def on_print_job(self, trabajo):
+        """Muestra el avance de la cola de impresión"""
+        if not self.print_status_label.winfo_exists():
+            return
+        
+        ticket = f"Ticket #{trabajo['numero_venta']}" if trabajo['numero_venta'] else "Ticket"
+        
+        if trabajo['estado'] == 'listo':
+            accion = "impreso" if trabajo['imprimir'] else "generado"
+            texto, color = f"🖨 {ticket} {accion}", COLORS['success']
+        elif trabajo['estado'] == 'fallido':
+            texto, color = f"⚠ {ticket}: no se pudo imprimir ({trabajo['error']})", COLORS['danger']
+        elif trabajo['error']:
+            texto = (f"⚠ {ticket}: reintentando "
+                     f"({trabajo['intentos']}/{print_queue.max_intentos})")
+            color = COLORS['warning']
+        else:
+            return
+        
+        self.print_status_label.config(text=texto, fg=color)
+    
+    def on_destroy(self, event):
+        """Deja de recibir avisos de la cola de impresión al cerrar la ventana"""
+        if event.widget is self.window:
+            print_queue.quitar_observador(self.on_print_job)
     
     def open_mesa(self, mesa):
         """Abre la ventana de venta para una mesa"""
@@ -263,6 +296,7 @@ class VentaMesaWindow:
         self.tree.tag_configure('evenrow', background=COLORS['table_row_even'])
         self.tree.tag_configure('oddrow', background=COLORS['table_row_odd'])
         self.tree.tag_configure('low_stock', background='#FFCCCC')
+        self.tree_binder = TreeviewBinder(self.tree)
         
         # Permitir edición al hacer doble clic
         self.tree.bind('<Double-1>', self.edit_item)
@@ -298,13 +332,27 @@ class VentaMesaWindow:
                           relief=tk.RAISED, borderwidth=2, padx=15, pady=8)
             btn.pack(side=tk.LEFT, padx=5)
     
+    @staticmethod
+    def clave_linea(prod) -> str:
+        """
+        Clave de la fila de una línea: el ID del producto (las líneas ya se juntan
+        por producto), o el nombre si es un artículo manual sin ID
+        """
+        return str(prod['id']) if prod['id'] is not None else f"nombre:{prod['nombre']}"
+    
+    def producto_de_fila(self, iid):
+        """Línea de productos_venta que se muestra en la fila iid (o None)"""
+        for prod in self.productos_venta:
+            if self.clave_linea(prod) == iid:
+                return prod
+        return None
+    
     def update_table(self):
         """Actualiza la tabla de productos"""
-        # Limpiar tabla
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Cargar productos
+        # Cargar productos; las filas van por producto (no por posición), así que
+        # editar o juntar una línea solo toca esa fila y al borrar una las demás
+        # conservan su fila (solo cambian su número y color si quedaron recorridas)
+        rows = []
         total_venta = 0
         gestion_activa = db.is_gestion_stock_active()
         
@@ -335,9 +383,11 @@ class VentaMesaWindow:
                 stock_text
             )
             
-            self.tree.insert('', tk.END, values=values, tags=(tag,))
+            rows.append((self.clave_linea(prod), values, (tag,)))
             total_venta += prod['total']
         
+        self.tree_binder.set_rows(rows)
+        
         # Actualizar total
         self.total_var.set(format_currency(total_venta))
     
@@ -359,10 +409,11 @@ class VentaMesaWindow:
         if producto_existente:
             # Sumar cantidad
             producto_existente['cantidad'] += producto_data['cantidad']
-            producto_existente['total'] = producto_existente['cantidad'] * producto_existente['precio']
+            producto_existente['total'] = multiply_cents(producto_existente['precio'],
+                                                         producto_existente['cantidad'])
         else:
             # Añadir nuevo
-            total = producto_data['cantidad'] * producto_data['precio']
+            total = multiply_cents(producto_data['precio'], producto_data['cantidad'])
             self.productos_venta.append({
                 'id': producto_data['id'],
                 'nombre': producto_data['nombre'],
@@ -391,15 +442,10 @@ class VentaMesaWindow:
         if col_index not in [2, 3]:  # Columnas Cantidad y Precio Unit.
             return
         
-        # Obtener índice del producto
-        values = self.tree.item(row_id)['values']
-        producto_idx = int(values[0]) - 1
-        
-        if producto_idx >= len(self.productos_venta):
+        producto = self.producto_de_fila(row_id)
+        if producto is None:
             return
         
-        producto = self.productos_venta[producto_idx]
-        
         # Crear diálogo de edición
         if col_index == 2:  # Cantidad
             EditarCantidadDialog(self.window, producto, self.update_table)
@@ -419,17 +465,9 @@ class VentaMesaWindow:
                                    f"¿Estás seguro de borrar {len(selection)} producto(s)?"):
             return
         
-        # Obtener índices a eliminar (de mayor a menor para no alterar índices)
-        indices = []
-        for item in selection:
-            values = self.tree.item(item)['values']
-            indices.append(int(values[0]) - 1)
-        
-        indices.sort(reverse=True)
-        
-        for idx in indices:
-            if idx < len(self.productos_venta):
-                del self.productos_venta[idx]
+        claves = set(selection)
+        self.productos_venta = [prod for prod in self.productos_venta
+                                if self.clave_linea(prod) not in claves]
         
         self.update_table()
     
@@ -508,6 +546,10 @@ class AgregarProductosWindow:
         # Centrar ventana
         self.center_dialog()
         
+        # Versión del catálogo mostrada en la galería (None = galería vacía o filtrada)
+        self.catalogo_version = None
+        self.placeholder_photo = None
+        
         self.setup_ui()
         self.load_productos()
     
@@ -533,33 +575,22 @@ class AgregarProductosWindow:
                 bg=COLORS['bg_primary']).pack(side=tk.LEFT, padx=(0, 10))
         
         self.search_var = tk.StringVar()
+        self.search_controller = SearchController(self.dialog, self.buscar_productos,
+                                                  self.show_search_results)
         self.search_var.trace('w', lambda *args: self.search_productos())
         search_entry = tk.Entry(search_frame, textvariable=self.search_var,
                                font=FONTS['normal'], width=40)
         search_entry.pack(side=tk.LEFT)
         
-        # Frame con scrollbar para la galería
-        canvas_frame = tk.Frame(main_frame, bg=COLORS['bg_primary'])
-        canvas_frame.pack(fill=tk.BOTH, expand=True)
-        
-        # Canvas y scrollbar
-        self.canvas = tk.Canvas(canvas_frame, bg=COLORS['bg_primary'], 
-                               highlightthickness=0)
-        scrollbar = tk.Scrollbar(canvas_frame, orient="vertical", 
-                                command=self.canvas.yview)
-        
-        self.scrollable_frame = tk.Frame(self.canvas, bg=COLORS['bg_primary'])
-        
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
-        
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-        
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Galería virtualizada (solo se construyen las tarjetas visibles)
+        self.gallery = VirtualGallery(main_frame,
+                                      create_card=self.create_producto_card,
+                                      fill_card=self.fill_producto_card,
+                                      load_image=self.load_producto_image,
+                                      columns=7, cell_height=260,
+                                      bg=COLORS['bg_primary'])
+        self.gallery.pack(fill=tk.BOTH, expand=True)
+        self.canvas = self.gallery.canvas
         
         # Bind scroll con mouse wheel solo a este canvas
         self.canvas.bind("<Enter>", self._bind_mousewheel)
@@ -594,30 +625,19 @@ class AgregarProductosWindow:
             pass
     
     def load_productos(self):
-        """Carga los productos en la galería"""
-        # Limpiar frame
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-        
-        productos = db.get_productos()
-        
-        # Crear grid de productos (4 columnas)
-        row = 0
-        col = 0
+        """Carga los productos en la galería (no redibuja si el catálogo no cambió)"""
+        version, productos = db.get_catalogo(self.catalogo_version)
+        if productos is None:
+            return
+        self.catalogo_version = version
         
-        for producto in productos:
-            self.create_producto_card(producto, row, col)
-            
-            col += 1
-            if col > 6:  # 7 COLUMNAS
-                col = 0
-                row += 1
+        self.gallery.set_items(productos)
     
-    def create_producto_card(self, producto, row, col):
-        """Crea una tarjeta de producto"""
-        card = tk.Frame(self.scrollable_frame, bg=COLORS['bg_secondary'],
+    def create_producto_card(self, parent):
+        """Crea una tarjeta de producto vacía (la galería la reutiliza al desplazarse)"""
+        card = tk.Frame(parent, bg=COLORS['bg_secondary'],
                        relief=tk.RAISED, borderwidth=2)
-        card.grid(row=row, column=col, padx=12, pady=12, sticky='nsew')
+        card.producto = None
         
         # Imagen
         img_frame = tk.Frame(card, bg=COLORS['bg_secondary'], 
@@ -625,53 +645,62 @@ class AgregarProductosWindow:
         img_frame.pack(pady=8)
         img_frame.pack_propagate(False)
         
-        try:
-            if producto['imagen'] and os.path.exists(producto['imagen']):
-                # Cargar imagen del producto
-                img = Image.open(producto['imagen'])
-                img = img.resize((110, 110), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-            else:
-                # Crear placeholder
-                photo = self.create_placeholder_image()
-            
-            img_label = tk.Label(img_frame, image=photo, bg=COLORS['bg_secondary'])
-            img_label.image = photo
-            img_label.pack(expand=True)
-        except:
-            photo = self.create_placeholder_image()
-            img_label = tk.Label(img_frame, image=photo, bg=COLORS['bg_secondary'])
-            img_label.image = photo
-            img_label.pack(expand=True)
+        card.img_label = tk.Label(img_frame, bg=COLORS['bg_secondary'])
+        card.img_label.pack(expand=True)
         
         # Nombre
-        nombre = producto['nombre']
-        if len(nombre) > 18:
-            nombre = nombre[:18] + "..."
-        
-        tk.Label(card, text=nombre, font=FONTS['normal'],
-                bg=COLORS['bg_secondary'], wraplength=130).pack(pady=(0, 5))
+        card.nombre_label = tk.Label(card, font=FONTS['normal'],
+                                    bg=COLORS['bg_secondary'], wraplength=130)
+        card.nombre_label.pack(pady=(0, 5))
         
         # Precio
-        tk.Label(card, text=format_currency(producto['precio_unitario']),
-                font=FONTS['normal'], bg=COLORS['bg_secondary'],
-                fg=COLORS['accent']).pack(pady=(0, 8))
+        card.precio_label = tk.Label(card, font=FONTS['normal'], bg=COLORS['bg_secondary'],
+                                    fg=COLORS['accent'])
+        card.precio_label.pack(pady=(0, 8))
         
         # Botón seleccionar
         btn = tk.Button(card, text="Seleccionar", 
-                       command=lambda p=producto: self.select_producto(p),
+                       command=lambda c=card: self.select_producto(c.producto),
                        font=FONTS['normal'], bg=COLORS['accent'], fg='white',
                        relief=tk.RAISED, borderwidth=2, cursor='hand2')
         btn.pack(pady=(0, 8), padx=8, fill=tk.X)
         
         # Hacer toda la tarjeta clickeable
-        card.bind('<Button-1>', lambda e, p=producto: self.select_producto(p))
+        card.bind('<Button-1>', lambda e, c=card: self.select_producto(c.producto))
         for child in card.winfo_children():
             if not isinstance(child, tk.Button):
-                child.bind('<Button-1>', lambda e, p=producto: self.select_producto(p))
+                child.bind('<Button-1>', lambda e, c=card: self.select_producto(c.producto))
+        card.img_label.bind('<Button-1>', lambda e, c=card: self.select_producto(c.producto))
+        
+        return card
+    
+    def fill_producto_card(self, card, producto):
+        """Muestra un producto en una tarjeta (la imagen se carga después)"""
+        card.producto = producto
+        
+        nombre = producto['nombre']
+        if len(nombre) > 18:
+            nombre = nombre[:18] + "..."
+        
+        card.nombre_label.configure(text=nombre)
+        card.precio_label.configure(text=format_currency(producto['precio_unitario']))
+        
+        placeholder = self.create_placeholder_image()
+        card.img_label.configure(image=placeholder)
+        card.img_label.image = placeholder
+    
+    def load_producto_image(self, card, producto):
+        """Carga la miniatura del producto desde la caché"""
+        photo = thumbnail_cache.get_photo(producto['imagen'])
+        if photo is not None:
+            card.img_label.configure(image=photo)
+            card.img_label.image = photo
     
     def create_placeholder_image(self):
-        """Crea una imagen placeholder"""
+        """Crea una imagen placeholder (una sola vez por ventana)"""
+        if self.placeholder_photo is not None:
+            return self.placeholder_photo
+        
         img = Image.new('RGB', (110, 110), color=COLORS['table_header'])
         
         from PIL import ImageDraw
@@ -681,33 +710,28 @@ class AgregarProductosWindow:
         draw.text((35, 45), "Sin", fill='gray')
         draw.text((25, 60), "Imagen", fill='gray')
         
-        return ImageTk.PhotoImage(img)
+        self.placeholder_photo = ImageTk.PhotoImage(img)
+        return self.placeholder_photo
     
     def search_productos(self):
-        """Busca productos según el texto ingresado"""
-        query = self.search_var.get()
-        
-        # Limpiar frame
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-        
-        if not query:
+        """Programa la búsqueda según el texto ingresado (sin bloquear la interfaz)"""
+        self.search_controller.schedule(self.search_var.get())
+    
+    def buscar_productos(self, query):
+        """Consulta de búsqueda (se ejecuta en el hilo de búsqueda)"""
+        if not query.strip():
+            return None
+        return db.reader().search_productos(query)
+    
+    def show_search_results(self, query, productos):
+        """Muestra el resultado de la búsqueda más reciente"""
+        if productos is None:
             self.load_productos()
             return
         
-        productos = db.search_productos(query)
-        
-        # Crear grid
-        row = 0
-        col = 0
-        
-        for producto in productos:
-            self.create_producto_card(producto, row, col)
-            
-            col += 1
-            if col > 3:
-                col = 0
-                row += 1
+        # La galería deja de mostrar el catálogo completo
+        self.catalogo_version = None
+        self.gallery.set_items(productos)
     
     def select_producto(self, producto):
         """Selecciona un producto y abre diálogo de cantidad"""
@@ -975,7 +999,7 @@ class EditarCantidadDialog:
                 return
             
             self.producto['cantidad'] = cantidad
-            self.producto['total'] = cantidad * self.producto['precio']
+            self.producto['total'] = multiply_cents(self.producto['precio'], cantidad)
             
             if self.callback:
                 self.callback()
@@ -1028,7 +1052,7 @@ class EditarPrecioDialog:
         tk.Label(main_frame, text="Nuevo Precio Unitario:", font=FONTS['normal'],
                 bg=COLORS['bg_primary']).pack(anchor='w', pady=5)
         
-        self.precio_var = tk.StringVar(value=str(self.producto['precio']))
+        self.precio_var = tk.StringVar(value=cents_to_str(self.producto['precio']))
         self.precio_entry = tk.Entry(main_frame, textvariable=self.precio_var, 
                                      font=FONTS['normal'])
         self.precio_entry.pack(fill=tk.X, pady=(0, 20))
@@ -1055,14 +1079,14 @@ class EditarPrecioDialog:
     def accept(self):
         """Acepta y actualiza el precio"""
         try:
-            precio = float(self.precio_var.get())
+            precio = to_cents(self.precio_var.get())
             
             if precio <= 0:
                 messagebox.showerror("Error", "El precio debe ser mayor a 0")
                 return
             
             self.producto['precio'] = precio
-            self.producto['total'] = self.producto['cantidad'] * precio
+            self.producto['total'] = multiply_cents(precio, self.producto['cantidad'])
             
             if self.callback:
                 self.callback()
@@ -1314,7 +1338,7 @@ class CobrarVentaWindow:
     def calculate_total(self):
         """Calcula el total con propina"""
         try:
-            propina = float(self.propina_var.get()) if self.propina_var.get() else 0
+            propina = to_cents(self.propina_var.get()) if self.propina_var.get() else 0
             total = self.subtotal + propina
             self.total_var.set(format_currency(total))
             self.calculate_cambio()
@@ -1324,9 +1348,9 @@ class CobrarVentaWindow:
     def calculate_cambio(self):
         """Calcula el cambio"""
         try:
-            propina = float(self.propina_var.get()) if self.propina_var.get() else 0
+            propina = to_cents(self.propina_var.get()) if self.propina_var.get() else 0
             total = self.subtotal + propina
-            recibido = float(self.recibido_var.get()) if self.recibido_var.get() else 0
+            recibido = to_cents(self.recibido_var.get()) if self.recibido_var.get() else 0
             cambio = recibido - total
             
             if cambio < 0:
@@ -1339,9 +1363,9 @@ class CobrarVentaWindow:
     def finalizar_venta(self):
         """Finaliza la venta"""
         try:
-            propina = float(self.propina_var.get()) if self.propina_var.get() else 0
+            propina = to_cents(self.propina_var.get()) if self.propina_var.get() else 0
             total = self.subtotal + propina
-            recibido = float(self.recibido_var.get()) if self.recibido_var.get() else 0
+            recibido = to_cents(self.recibido_var.get()) if self.recibido_var.get() else 0
             
             # Validar que el dinero recibido sea suficiente
             if recibido < total:
@@ -1371,19 +1395,9 @@ class CobrarVentaWindow:
                 'mesa': self.mesa
             }
             
-            try:
-                # Generar PDF
-                ticket_path = ticket_generator.generate_ticket_pdf(venta_data)
-                
-                # Guardar ruta del último ticket
-                db.set_last_ticket_path(ticket_path)
-                
-                # Imprimir automáticamente si está activado
-                if db.get_auto_print():
-                    ticket_generator.print_ticket(ticket_path)
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Error al generar ticket: {str(e)}")
+            # El PDF se genera (e imprime, si está activado) en segundo plano;
+            # la ruta del último ticket se guarda al terminar
+            print_queue.encolar_ticket(venta_data, imprimir=db.get_auto_print())
             
             # Mostrar resumen
             messagebox.showinfo("Venta Completada", 
@@ -1590,56 +1604,27 @@ class FinalizarDiaWindow:
             
             # Obtener egresos
             try:
-                egresos = float(self.egresos_var.get())
+                egresos = to_cents(self.egresos_var.get())
             except ValueError:
                 messagebox.showerror("Error", "Los egresos deben ser un número válido")
                 return
             
             # Obtener dinero inicial
-            dinero_inicial = float(db.get_config('dinero_inicial_dia') or 0)
-            
-            # Guardar corte en base de datos
-            numero_corte = db.add_corte(dinero_inicial, corte_final, egresos)
-            
-            # Obtener información del corte
-            from datetime import datetime
-            fecha_hoy = datetime.now().strftime('%d/%m/%Y')
-            
-            # Calcular INGRESO TOTAL (ventas brutas, sin descontar costos)
-            db.cursor.execute('''
-                SELECT SUM(total) as ingreso_total
-                FROM ventas
-                WHERE fecha LIKE ?
-            ''', (f'{fecha_hoy}%',))
-            
-            result = db.cursor.fetchone()
-            ingreso_total = result['ingreso_total'] if result['ingreso_total'] else 0
+            dinero_inicial = int(db.get_config('dinero_inicial_dia') or 0)
             
-            # Calcular ventas en efectivo (para corte esperado)
-            db.cursor.execute('''
-                SELECT SUM(total) as total_ventas_efectivo
-                FROM ventas
-                WHERE fecha LIKE ? AND metodo_pago = 'Efectivo'
-            ''', (f'{fecha_hoy}%',))
+            # Totales del día (ingresos, efectivo, ganancias) en una sola consulta
+            resumen = db.get_resumen_dia()
             
-            result = db.cursor.fetchone()
-            total_ventas_efectivo = result['total_ventas_efectivo'] if result['total_ventas_efectivo'] else 0
-            
-            # Calcular ganancias netas (ventas - costos)
-            db.cursor.execute('''
-                SELECT SUM(v.total) - SUM(p.costo * v.cantidad) as ganancias
-                FROM ventas v
-                JOIN productos p ON v.id_producto = p.id
-                WHERE v.fecha LIKE ?
-            ''', (f'{fecha_hoy}%',))
+            # Guardar corte en base de datos
+            numero_corte = db.add_corte(dinero_inicial, corte_final, egresos, resumen=resumen)
             
-            result = db.cursor.fetchone()
-            ganancias = result['ganancias'] if result['ganancias'] else 0
+            ingreso_total = resumen['ingreso_total']
+            ganancias = resumen['ganancias']
             
-            corte_esperado = dinero_inicial + total_ventas_efectivo - egresos
+            corte_esperado = dinero_inicial + resumen['efectivo'] - egresos
             diferencia = corte_final - corte_esperado
             
-            if abs(diferencia) < 0.01:
+            if diferencia == 0:
                 estado = '✓ Cuadrado'
             elif diferencia > 0:
                 estado = '⬆ Sobrante'
@@ -3,8 +3,9 @@ Módulo de gestión de recetas
 """
 import tkinter as tk
 from tkinter import ttk, messagebox
-from config import COLORS, FONTS
+from config import COLORS, FONTS, UNIDADES_MEDIDA
 from database import db
+from widgets import SearchController, TreeviewBinder
 
 class RecetasWindow:
     def __init__(self, parent, on_close=None):
@@ -57,6 +58,8 @@ class RecetasWindow:
                 bg=COLORS['bg_primary']).pack(side=tk.LEFT, padx=(0, 10))
         
         self.search_var = tk.StringVar()
+        self.search_controller = SearchController(self.window, self.buscar_recetas,
+                                                  self.show_search_results)
         self.search_var.trace('w', lambda *args: self.search_recetas())
         search_entry = tk.Entry(search_frame, textvariable=self.search_var,
                                font=FONTS['normal'], width=40)
@@ -103,6 +106,7 @@ class RecetasWindow:
         # Colores alternados
         self.tree.tag_configure('evenrow', background=COLORS['table_row_even'])
         self.tree.tag_configure('oddrow', background=COLORS['table_row_odd'])
+        self.tree_binder = TreeviewBinder(self.tree)
         
         # Frame de botones (SIN Importar/Exportar Excel)
         button_frame = tk.Frame(main_frame, bg=COLORS['bg_primary'])
@@ -124,10 +128,11 @@ class RecetasWindow:
     
     def load_recetas(self):
         """Carga las recetas en la tabla"""
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        recetas = db.get_todas_recetas()
+        self.show_recetas(db.get_todas_recetas())
+    
+    def show_recetas(self, recetas):
+        """Muestra las recetas en la tabla (solo actualiza las filas que cambiaron)"""
+        rows = []
         
         for idx, r in enumerate(recetas):
             tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
@@ -142,43 +147,32 @@ class RecetasWindow:
                 r['unidad_porcionamiento']
             )
             
-            self.tree.insert('', tk.END, values=values, tags=(tag,))
+            rows.append((r['id'], values, (tag,)))
+        
+        self.tree_binder.set_rows(rows)
     
     def search_recetas(self):
-        """Busca recetas según el texto ingresado"""
-        from utils import normalize_text
-        query = normalize_text(self.search_var.get())
-        
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        if not query:
+        """Programa la búsqueda según el texto ingresado (sin bloquear la interfaz)"""
+        self.search_controller.schedule(self.search_var.get())
+    
+    def buscar_recetas(self, query):
+        """Consulta de búsqueda (se ejecuta en el hilo de búsqueda)"""
+        if not query.strip():
+            return None
+        return db.reader().search_recetas(query)
+    
+    def show_search_results(self, query, filtered):
+        """Muestra el resultado de la búsqueda más reciente"""
+        if filtered is None:
             self.load_recetas()
             return
         
-        recetas = db.get_todas_recetas()
-        filtered = [r for r in recetas 
-                   if query in normalize_text(r['producto_nombre']) or
-                      query in normalize_text(r['ingrediente_nombre'])]
-        
-        for idx, r in enumerate(filtered):
-            tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
-            
-            values = (
-                r['id'],
-                r['id_producto'],
-                r['producto_nombre'],
-                r['id_ingrediente'],
-                r['ingrediente_nombre'],
-                f"{r['cantidad_requerida']:.2f}",
-                r['unidad_porcionamiento']
-            )
-            
-            self.tree.insert('', tk.END, values=values, tags=(tag,))
+        self.show_recetas(filtered)
     
     def clear_filter(self):
         """Limpia los filtros de búsqueda"""
         self.search_var.set("")
+        self.search_controller.cancel()
         self.load_recetas()
     
     def add_receta_dialog(self):
@@ -199,8 +193,7 @@ class RecetasWindow:
                                   "Por favor selecciona solo una receta para modificar")
             return
         
-        item = self.tree.item(selection[0])
-        receta_id = item['values'][0]
+        receta_id = int(selection[0])
         
         RecetaDialog(self.window, receta_id=receta_id, callback=self.load_recetas)
     
@@ -218,7 +211,7 @@ class RecetasWindow:
             return
         
         for item in selection:
-            receta_id = self.tree.item(item)['values'][0]
+            receta_id = int(item)
             db.delete_receta(receta_id)
         
         messagebox.showinfo("Éxito", "Receta(s) eliminada(s) correctamente")
@@ -327,7 +320,7 @@ class RecetaDialog:
         unidad_frame.pack(anchor='w', pady=(0, 20))
         
         self.unidad_var = tk.StringVar(value='Kg')
-        for unidad in ['Pza', 'Kg', 'L']:
+        for unidad in UNIDADES_MEDIDA:
             tk.Radiobutton(unidad_frame, text=unidad, variable=self.unidad_var,
                           value=unidad, font=FONTS['normal'],
                           bg=COLORS['bg_primary']).pack(side=tk.LEFT, padx=10)
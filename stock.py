@@ -6,6 +6,7 @@ from tkinter import ttk, messagebox
 from config import COLORS, FONTS
 from utils import format_currency
 from database import db
+from widgets import SearchController, TreeviewBinder
 
 class StockWindow:
     def __init__(self, parent, on_close=None):
@@ -78,6 +79,8 @@ class StockWindow:
                 bg=COLORS['bg_primary']).pack(side=tk.LEFT, padx=(0, 10))
         
         self.search_var = tk.StringVar()
+        self.search_controller = SearchController(self.window, self.buscar_stock,
+                                                  self.show_search_results)
         self.search_var.trace('w', lambda *args: self.search_stock())
         search_entry = tk.Entry(search_frame, textvariable=self.search_var,
                                font=FONTS['normal'], width=40)
@@ -129,6 +132,7 @@ class StockWindow:
         self.tree.tag_configure('evenrow', background=COLORS['table_row_even'])
         self.tree.tag_configure('oddrow', background=COLORS['table_row_odd'])
         self.tree.tag_configure('low_stock', background='#FFCCCC')
+        self.tree_binder = TreeviewBinder(self.tree)
         
         # Frame de botones (SIN Importar/Exportar Excel)
         button_frame = tk.Frame(main_frame, bg=COLORS['bg_primary'])
@@ -166,11 +170,12 @@ class StockWindow:
     
     def load_stock(self):
         """Carga el stock en la tabla"""
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        productos = db.get_productos()
+        self.show_stock(db.get_productos())
+    
+    def show_stock(self, productos):
+        """Muestra los productos en la tabla (solo actualiza las filas que cambiaron)"""
         gestion_activa = db.is_gestion_stock_active()
+        rows = []
         
         for idx, p in enumerate(productos):
             # Determinar el tag
@@ -191,46 +196,32 @@ class StockWindow:
                 'Sí' if p['gestion_stock'] else 'No'
             )
             
-            self.tree.insert('', tk.END, values=values, tags=(tag,))
+            rows.append((p['id'], values, (tag,)))
+        
+        self.tree_binder.set_rows(rows)
     
     def search_stock(self):
-        """Busca productos según el texto ingresado"""
-        from utils import normalize_text
-        query = normalize_text(self.search_var.get())
-        
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        if not query:
+        """Programa la búsqueda según el texto ingresado (sin bloquear la interfaz)"""
+        self.search_controller.schedule(self.search_var.get())
+    
+    def buscar_stock(self, query):
+        """Consulta de búsqueda (se ejecuta en el hilo de búsqueda)"""
+        if not query.strip():
+            return None
+        return db.reader().search_productos(query)
+    
+    def show_search_results(self, query, productos):
+        """Muestra el resultado de la búsqueda más reciente"""
+        if productos is None:
             self.load_stock()
             return
         
-        productos = db.search_productos(query)
-        gestion_activa = db.is_gestion_stock_active()
-        
-        for idx, p in enumerate(productos):
-            if gestion_activa and p['gestion_stock'] and p['stock_estimado'] < p['stock_minimo']:
-                tag = 'low_stock'
-            else:
-                tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
-            
-            values = (
-                p['id'],
-                p['nombre'],
-                format_currency(p['precio_unitario']),
-                format_currency(p['costo']),
-                format_currency(p['ganancia']),
-                p['unidad_medida'],
-                f"{p['stock_estimado']:.2f}" if gestion_activa else "N/A",
-                f"{p['stock_minimo']:.2f}",
-                'Sí' if p['gestion_stock'] else 'No'
-            )
-            
-            self.tree.insert('', tk.END, values=values, tags=(tag,))
+        self.show_stock(productos)
     
     def clear_filter(self):
         """Limpia los filtros de búsqueda"""
         self.search_var.set("")
+        self.search_controller.cancel()
         self.load_stock()
     
     def modificar_stock(self):
@@ -247,8 +238,7 @@ class StockWindow:
                                   "Por favor selecciona solo un producto para modificar")
             return
         
-        item = self.tree.item(selection[0])
-        producto_id = item['values'][0]
+        producto_id = int(selection[0])
         
         StockDialog(self.window, producto_id=producto_id, callback=self.load_stock)
     
@@ -266,7 +256,7 @@ class StockWindow:
             return
         
         for item in selection:
-            producto_id = self.tree.item(item)['values'][0]
+            producto_id = int(item)
             db.delete_producto(producto_id)
         
         messagebox.showinfo("Éxito", "Producto(s) eliminado(s) correctamente")
@@ -287,7 +277,7 @@ class StockWindow:
             return
         
         item = self.tree.item(selection[0])
-        producto_id = item['values'][0]
+        producto_id = int(selection[0])
         producto_nombre = item['values'][1]
         
         RegistrarCompraProductoDialog(self.window, producto_id, producto_nombre,
@@ -0,0 +1,24 @@
+"""
+Configuración común de las pruebas de Mitsy's POS
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database.py crea su instancia global en data/mitsys.db relativo al directorio
+# actual; las pruebas corren en una carpeta temporal para no tocar la base real
+os.chdir(tempfile.mkdtemp(prefix='mitsys-pruebas-'))
+
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Base de datos nueva y vacía, con todas las migraciones aplicadas"""
+    base = Database(str(tmp_path / 'data' / 'prueba.db'))
+    yield base
+    base.conn.close()
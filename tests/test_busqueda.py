@@ -0,0 +1,26 @@
+"""
+Pruebas de búsqueda por nombre normalizado
+"""
+
+
+def nombres(filas):
+    return [fila['nombre'] for fila in filas]
+
+
+def test_busqueda_ordena_por_relevancia(db):
+    for id_producto, nombre in enumerate(['Pasta', 'Tacos de suadero', 'Taco', 'Agua de tamarindo'], 1):
+        db.add_producto(id_producto, nombre, 1500, 0)
+    
+    # exacto, empieza con, palabra que empieza con, contiene
+    assert nombres(db.search_productos('taco')) == ['Taco', 'Tacos de suadero']
+    assert nombres(db.search_productos('TA')) == ['Taco', 'Tacos de suadero', 'Agua de tamarindo',
+                                                  'Pasta']
+
+
+def test_busqueda_sin_acentos_ni_bajas(db):
+    db.add_ingrediente(1, 'Jalapeño', 100, 'Kg')
+    db.add_ingrediente(2, 'Limón', 100, 'Kg')
+    db.delete_ingrediente(2)
+    
+    assert nombres(db.search_ingredientes('jalapeno')) == ['Jalapeño']
+    assert nombres(db.search_ingredientes('limon')) == []
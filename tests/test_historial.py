@@ -0,0 +1,36 @@
+"""
+Pruebas de la paginación por clave de los historiales
+"""
+import pytest
+
+
+def agregar_linea(db, numero_venta, fecha_iso, total=1500):
+    db.cursor.execute('''
+        INSERT INTO ventas (numero_venta, fecha, fecha_iso, producto, id_producto,
+                            cantidad, precio_unitario, total)
+        VALUES (?, '01/01/2025 12:00:00', ?, 'Taco', NULL, 1, ?, ?)
+    ''', (numero_venta, fecha_iso, total, total))
+    db.conn.commit()
+
+
+def recorrer(db, **kwargs):
+    ids, despues = [], None
+    while True:
+        filas, despues = db.get_pagina('ventas', despues=despues, limite=2, **kwargs)
+        ids.extend(fila['id'] for fila in filas)
+        if despues is None:
+            return ids
+
+
+@pytest.mark.parametrize('descendente', [True, False])
+def test_paginas_incluyen_fechas_nulas(db, descendente):
+    # Ventas antiguas cuya fecha no se pudo convertir quedan con fecha_iso NULL
+    for numero, fecha_iso in enumerate(['2025-01-03 10:00:00', None, '2025-01-01 10:00:00',
+                                        None, '2025-01-03 10:00:00', None, '2025-01-02 10:00:00'], 1):
+        agregar_linea(db, numero, fecha_iso)
+    
+    todas, _ = db.get_pagina('ventas', orden='fecha_iso', descendente=descendente, limite=100)
+    paginadas = recorrer(db, orden='fecha_iso', descendente=descendente)
+    
+    assert paginadas == [fila['id'] for fila in todas]
+    assert len(paginadas) == 7
@@ -0,0 +1,28 @@
+"""
+Pruebas de la cola de impresión guardada en la base de datos
+"""
+
+
+def estados(db):
+    return sorted(row['estado'] for row in
+                  db.cursor.execute('SELECT estado FROM trabajos_impresion').fetchall())
+
+
+def test_purgar_trabajos_impresion(db):
+    for estado in ('listo', 'fallido', 'fallido', 'pendiente'):
+        trabajo = db.add_trabajo_impresion({'numero_venta': 1})
+        db.update_trabajo_impresion(trabajo['id'], estado=estado)
+    
+    # Un fallido viejo y uno reciente
+    db.cursor.execute('''
+        UPDATE trabajos_impresion SET fecha_iso = '2000-01-01 00:00:00'
+        WHERE id = (SELECT MIN(id) FROM trabajos_impresion WHERE estado = 'fallido')
+    ''')
+    
+    assert db.purgar_trabajos_impresion(dias_fallidos=7) == 2
+    assert estados(db) == ['fallido', 'pendiente']
+    
+    # Los trabajos de antes de la migración 12 no tienen fecha_iso
+    db.cursor.execute("UPDATE trabajos_impresion SET fecha_iso = NULL WHERE estado = 'fallido'")
+    assert db.purgar_trabajos_impresion(dias_fallidos=7) == 1
+    assert estados(db) == ['pendiente']
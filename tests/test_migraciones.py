@@ -0,0 +1,116 @@
+"""
+Pruebas de migrate_schema sobre bases de datos de versiones anteriores
+"""
+import os
+import shutil
+import sqlite3
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from database import Database
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_INCLUIDA = os.path.join(RAIZ, 'data', 'mitsys.db')
+
+
+def crear_base_antigua(ruta):
+    """
+    Base en versión 0: las tablas de create_tables con importes en pesos y una
+    fila de 'ventas' por producto (la propina copiada en cada línea)
+    """
+    conn = sqlite3.connect(ruta)
+    Database.create_tables(SimpleNamespace(conn=conn, cursor=conn.cursor()))
+    
+    conn.execute('''
+        INSERT INTO productos (id, nombre, precio_unitario, costo, ganancia)
+        VALUES (1, 'Taco', 15.5, 10, 5.5)
+    ''')
+    conn.executemany('''
+        INSERT INTO ventas (numero_venta, fecha, producto, id_producto, cantidad,
+                            precio_unitario, total, metodo_pago, mesa, propina)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        # La venta 1 se guardó con dos fechas distintas (una por producto agregado)
+        (1, '01/02/2025 12:00:00', 'Taco', 1, 1, 15.5, 15.5, 'Efectivo', 'Mesa 1', 10),
+        (1, '01/02/2025 12:05:10', 'Taco', 1, 2, 15.5, 31, 'Efectivo', 'Mesa 1', 10),
+        (2, '02/02/2025 09:00:00', 'Refresco', None, 1, 25, 25, 'Transferencia', 'Barra', 0),
+    ])
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def base_migrada(tmp_path):
+    ruta = str(tmp_path / 'data' / 'antigua.db')
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    crear_base_antigua(ruta)
+    base = Database(ruta)
+    yield base
+    base.conn.close()
+
+
+def test_migracion_un_ticket_por_venta(base_migrada):
+    db = base_migrada
+    
+    tickets = db.cursor.execute('SELECT * FROM tickets ORDER BY id').fetchall()
+    assert [t['numero_venta'] for t in tickets] == [1, 2]
+    
+    venta = db.get_ticket(1)
+    assert venta['fecha'] == '01/02/2025 12:00:00'
+    assert venta['fecha_iso'] == '2025-02-01 12:00:00'
+    assert [p['total'] for p in venta['productos']] == [1550, 3100]
+    assert venta['subtotal'] == 4650
+    assert venta['propina'] == 1000  # una vez, no una por línea
+    
+    assert db.get_producto(1)['precio_unitario'] == 1550
+    assert db.cursor.execute('SELECT SUM(propina) FROM ventas').fetchone()[0] == 1000
+
+
+def test_migracion_llena_resumenes(base_migrada):
+    resumen = base_migrada.get_resumen_periodo(date(2025, 2, 1), date(2025, 2, 2))
+    
+    assert resumen['num_tickets'] == 2
+    assert resumen['ingreso_total'] == 4650 + 2500
+    assert resumen['efectivo'] == 4650
+    assert resumen['transferencia'] == 2500
+    assert resumen['propinas'] == 1000
+
+
+def test_migraciones_no_se_repiten(base_migrada):
+    version = base_migrada.cursor.execute('PRAGMA user_version').fetchone()[0]
+    base_migrada.conn.close()
+    
+    # Volver a abrir no cambia nada
+    db = Database(base_migrada.db_path)
+    assert db.cursor.execute('PRAGMA user_version').fetchone()[0] == version
+    assert db.cursor.execute('SELECT COUNT(*) FROM tickets').fetchone()[0] == 2
+    db.conn.close()
+
+
+def test_base_nueva_queda_en_la_ultima_version(db, base_migrada):
+    versiones = [base.cursor.execute('PRAGMA user_version').fetchone()[0]
+                 for base in (db, base_migrada)]
+    assert versiones[0] == versiones[1] > 0
+
+
+def test_migracion_base_incluida(tmp_path):
+    """La base de ejemplo del repositorio (versión 0): 31 ventas en 50 líneas"""
+    ruta = tmp_path / 'data' / 'mitsys.db'
+    ruta.parent.mkdir()
+    shutil.copy(BASE_INCLUIDA, ruta)
+    
+    conn = sqlite3.connect(ruta)
+    if conn.execute('PRAGMA user_version').fetchone()[0] != 0:
+        conn.close()
+        pytest.skip('data/mitsys.db ya está migrada')
+    ventas, lineas = conn.execute(
+        'SELECT COUNT(DISTINCT numero_venta), COUNT(*) FROM ventas').fetchone()
+    conn.close()
+    
+    db = Database(str(ruta))
+    assert (ventas, lineas) == (31, 50)
+    assert db.cursor.execute('SELECT COUNT(*) FROM tickets').fetchone()[0] == ventas
+    assert db.cursor.execute('SELECT COUNT(*) FROM venta_lineas').fetchone()[0] == lineas
+    db.conn.close()
@@ -0,0 +1,31 @@
+"""
+Pruebas de recetas: conversión de unidades y costeo
+"""
+
+
+def factor_receta(db, id_receta):
+    return db.get_receta(id_receta)['factor_almacen']
+
+
+def test_factor_almacen_de_gramos_a_kilos(db):
+    db.add_ingrediente(1, 'Carne', 2000, 'Kg')
+    db.add_producto(1, 'Taco', 1500, 0)
+    db.add_receta(1, 1, 1, 50, 'g')
+    
+    assert factor_receta(db, 1) == 0.001
+    assert db.get_producto(1)['costo'] == 100
+
+
+def test_cambiar_id_ingrediente_conserva_factor(db):
+    db.add_ingrediente(1, 'Carne', 2000, 'Kg')
+    db.add_producto(1, 'Taco', 1500, 0)
+    db.add_receta(1, 1, 1, 50, 'g')
+    
+    # Solo el ID, sin volver a mandar la unidad como lo hace el diálogo
+    db.update_ingrediente(1, 9)
+    
+    assert db.get_receta(1)['id_ingrediente'] == 9
+    assert factor_receta(db, 1) == 0.001
+    
+    db.recalcular_costos()
+    assert db.get_producto(1)['costo'] == 100
@@ -0,0 +1,83 @@
+"""
+Pruebas de los resúmenes diarios: lo que mantienen los triggers debe ser igual
+a lo que calcula reconstruir_resumenes desde cero
+"""
+from datetime import date
+
+
+def resumenes(db):
+    return {tabla: [tuple(row) for row in db.cursor.execute(
+                f'SELECT * FROM {tabla} ORDER BY 1, 2').fetchall()]
+            for tabla in ('resumen_productos_dia', 'resumen_pagos_dia')}
+
+
+def assert_igual_a_reconstruir(db):
+    mantenidos = resumenes(db)
+    db.reconstruir_resumenes()
+    assert resumenes(db) == mantenidos
+
+
+def agregar_linea(db, numero_venta, fecha_iso, producto, id_producto, cantidad, precio,
+                  metodo_pago='Efectivo', propina=0):
+    fecha = f'{fecha_iso[8:10]}/{fecha_iso[5:7]}/{fecha_iso[:4]}{fecha_iso[10:]}'
+    db.cursor.execute('''
+        INSERT INTO ventas (numero_venta, fecha, fecha_iso, producto, id_producto, cantidad,
+                            precio_unitario, total, metodo_pago, propina)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (numero_venta, fecha, fecha_iso, producto, id_producto, cantidad, precio,
+          cantidad * precio, metodo_pago, propina))
+    db.conn.commit()
+
+
+def test_triggers_igual_que_reconstruir(db):
+    db.add_producto(1, 'Taco', 1500, 1000)
+    db.add_producto(2, 'Taco', 1800, 1200)  # mismo nombre, otro producto
+    
+    agregar_linea(db, 1, '2025-03-01 12:00:00', 'Taco', 1, 2, 1500, propina=500)
+    agregar_linea(db, 1, '2025-03-01 12:00:00', 'Taco', 2, 1, 1800)
+    agregar_linea(db, 2, '2025-03-01 13:00:00', 'Extra', None, 1, 700, 'Transferencia')
+    agregar_linea(db, 3, '2025-03-02 09:00:00', 'Taco', 1, 3, 1500)
+    assert_igual_a_reconstruir(db)
+    
+    # Mismo nombre, productos distintos: dos filas el mismo día
+    dia = db.cursor.execute('''
+        SELECT clave, cantidad FROM resumen_productos_dia
+        WHERE dia = '2025-03-01' AND producto = 'Taco' ORDER BY clave
+    ''').fetchall()
+    assert [tuple(fila) for fila in dia] == [('1', 2), ('2', 1)]
+    
+    # Editar una línea, cambiar el método de pago y la propina
+    db.cursor.execute('UPDATE venta_lineas SET cantidad = 4, total = 6000 WHERE id = 1')
+    db.cursor.execute("UPDATE tickets SET metodo_pago = 'Transferencia', propina = 0 WHERE numero_venta = 1")
+    db.conn.commit()
+    assert_igual_a_reconstruir(db)
+    
+    # Mover un ticket a otro día
+    db.cursor.execute("UPDATE tickets SET fecha_iso = '2025-03-02 08:00:00' WHERE numero_venta = 2")
+    db.conn.commit()
+    assert_igual_a_reconstruir(db)
+    
+    # Borrar líneas: la última línea de un ticket borra también el ticket
+    db.cursor.execute('DELETE FROM ventas WHERE numero_venta = 3')
+    db.cursor.execute('DELETE FROM ventas WHERE id = 2')
+    db.conn.commit()
+    assert_igual_a_reconstruir(db)
+    
+    resumen = db.get_resumen_periodo(date(2025, 3, 1), date(2025, 3, 2))
+    assert resumen['num_tickets'] == 2
+    assert resumen['ingreso_total'] == 6000 + 700
+    assert resumen['propinas'] == 0
+
+
+def test_ranking_por_producto(db):
+    db.add_producto(1, 'Taco', 1500, 1000)
+    db.add_producto(2, 'Taco', 1800, 1200)
+    
+    agregar_linea(db, 1, '2025-03-01 12:00:00', 'Taco', 1, 2, 1500)
+    agregar_linea(db, 2, '2025-03-01 12:00:00', 'Taco', 2, 1, 1800)
+    db.update_producto(1, nombre='Taco de pastor')
+    agregar_linea(db, 3, '2025-03-02 12:00:00', 'Taco de pastor', 1, 1, 1500)
+    
+    ranking = db.get_ranking_productos(criterio='cantidad')
+    assert [(fila['id_producto'], fila['producto'], fila['cantidad']) for fila in ranking] == [
+        (1, 'Taco de pastor', 3), (2, 'Taco', 1)]
@@ -0,0 +1,41 @@
+"""
+Pruebas de las conversiones de dinero a centavos
+"""
+import pytest
+
+from utils import cents_to_str, multiply_cents, to_cents
+
+
+@pytest.mark.parametrize('monto, centavos', [
+    ('12.345', 1235),
+    ('12.344', 1234),
+    (0.1 + 0.2, 30),
+    ('0.005', 1),
+    (' 15 ', 1500),
+    (-2.5, -250),
+    (1.005, 101),  # float que en binario es 1.00499...; se toma como texto
+])
+def test_to_cents_redondeo_comercial(monto, centavos):
+    assert to_cents(monto) == centavos
+
+
+@pytest.mark.parametrize('monto', ['', 'abc', None])
+def test_to_cents_invalido(monto):
+    with pytest.raises(ValueError):
+        to_cents(monto)
+
+
+@pytest.mark.parametrize('centavos, cantidad, importe', [
+    (1999, 1.5, 2999),
+    (1500, 3, 4500),
+    (333, 0.5, 167),
+    (1, 0.5, 1),
+    (1000, 0.333, 333),
+])
+def test_multiply_cents(centavos, cantidad, importe):
+    assert multiply_cents(centavos, cantidad) == importe
+
+
+def test_cents_to_str_ida_y_vuelta():
+    for centavos in (0, 5, 99, 100, 123456, -250):
+        assert to_cents(cents_to_str(centavos)) == centavos
@@ -0,0 +1,56 @@
+"""
+Pruebas de ventas: ticket, líneas e inventario en una sola transacción
+"""
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def tienda(db):
+    """Un producto con receta y gestión de stock activa"""
+    db.toggle_gestion_stock(True)
+    db.add_ingrediente(1, 'Tortilla', 2000, 'Kg', cantidad=10, gestion_stock=True)
+    db.add_producto(1, 'Taco', 1500, 0, gestion_stock=True)
+    db.add_receta(1, 1, 1, 50, 'g')
+    return db
+
+
+def linea(cantidad, id_producto=1, nombre='Taco', precio=1500):
+    return {'id': id_producto, 'nombre': nombre, 'cantidad': cantidad, 'precio': precio,
+            'total': None if cantidad is None else precio * cantidad}
+
+
+def contar(db, tabla):
+    return db.cursor.execute(f'SELECT COUNT(*) FROM {tabla}').fetchone()[0]
+
+
+def test_finalizar_venta(tienda):
+    numero = tienda.finalizar_venta([linea(2), linea(1)], 'Efectivo', 'Mesa 1', propina=500)
+    
+    ticket = tienda.get_ticket(numero)
+    assert numero == 1
+    assert ticket['subtotal'] == 4500
+    assert ticket['total'] == 5000
+    assert [p['cantidad'] for p in ticket['productos']] == [2, 1]
+    assert tienda.get_ingrediente(1)['cantidad_stock'] == pytest.approx(10 - 3 * 0.05)
+    assert tienda.conciliar_inventario() == []
+
+
+def test_finalizar_venta_no_deja_nada_si_falla(tienda):
+    movimientos = contar(tienda, 'movimientos_inventario')
+    
+    # La segunda línea viola NOT NULL cuando la primera ya se escribió
+    with pytest.raises(sqlite3.IntegrityError):
+        tienda.finalizar_venta([linea(2), linea(None)], 'Efectivo', 'Mesa 1')
+    
+    assert not tienda.conn.in_transaction
+    assert contar(tienda, 'tickets') == 0
+    assert contar(tienda, 'venta_lineas') == 0
+    assert contar(tienda, 'resumen_productos_dia') == 0
+    assert contar(tienda, 'resumen_pagos_dia') == 0
+    assert contar(tienda, 'movimientos_inventario') == movimientos
+    assert tienda.get_ingrediente(1)['cantidad_stock'] == 10
+    
+    # El número de venta no se consumió
+    assert tienda.finalizar_venta([linea(1)], 'Efectivo', 'Mesa 1') == 1
@@ -0,0 +1,127 @@
+"""
+Caché de miniaturas de productos para Mitsy's POS
+"""
+import os
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Iterable
+from PIL import Image, ImageTk
+from config import THUMBNAIL_CONFIG
+
+class ThumbnailCache:
+    def __init__(self, cache_dir: str = None, size: tuple = None, max_memoria: int = None):
+        """
+        Caché de miniaturas en dos niveles:
+        - Disco: PNG ya redimensionado, nombrado con un hash de ruta + mtime + tamaño
+        - Memoria: LRU de PhotoImage listos para usar en Tk
+        """
+        self.cache_dir = cache_dir or THUMBNAIL_CONFIG['cache_dir']
+        self.size = tuple(size or THUMBNAIL_CONFIG['size'])
+        self.max_memoria = max_memoria or THUMBNAIL_CONFIG['max_memoria']
+        self._fotos = OrderedDict()  # clave -> PhotoImage
+    
+    def _clave(self, ruta: str) -> Optional[str]:
+        """Clave de la miniatura; cambia si la imagen original se modifica"""
+        try:
+            info = os.stat(ruta)
+        except OSError:
+            return None
+        
+        datos = f"{os.path.abspath(ruta)}|{info.st_mtime_ns}|{info.st_size}|{self.size[0]}x{self.size[1]}"
+        return hashlib.sha1(datos.encode('utf-8')).hexdigest()
+    
+    def _ruta_miniatura(self, clave: str) -> str:
+        """Ruta en disco de la miniatura"""
+        return os.path.join(self.cache_dir, f"{clave}.png")
+    
+    def generar(self, ruta: str) -> Optional[str]:
+        """
+        Genera la miniatura en disco si aún no existe
+        Retorna la ruta de la miniatura o None si la imagen no es válida
+        """
+        clave = self._clave(ruta)
+        if clave is None:
+            return None
+        
+        destino = self._ruta_miniatura(clave)
+        if os.path.exists(destino):
+            return destino
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        
+        try:
+            with Image.open(ruta) as img:
+                # En JPEG decodifica directamente a menor resolución
+                img.draft('RGB', (self.size[0] * 2, self.size[1] * 2))
+                if img.mode not in ('RGB', 'RGBA'):
+                    img = img.convert('RGBA')
+                miniatura = img.resize(self.size, Image.Resampling.LANCZOS)
+            
+            # Escribir a un temporal y renombrar para no dejar archivos a medias
+            temporal = destino + '.tmp'
+            miniatura.save(temporal, 'PNG')
+            os.replace(temporal, destino)
+        except Exception:
+            return None
+        
+        return destino
+    
+    def get_photo(self, ruta: str) -> Optional[ImageTk.PhotoImage]:
+        """
+        Obtiene la miniatura lista para Tk (requiere una ventana Tk creada)
+        Retorna None si la imagen no existe o no se puede leer
+        """
+        if not ruta:
+            return None
+        
+        clave = self._clave(ruta)
+        if clave is None:
+            return None
+        
+        if clave in self._fotos:
+            self._fotos.move_to_end(clave)
+            return self._fotos[clave]
+        
+        destino = self.generar(ruta)
+        if destino is None:
+            return None
+        
+        try:
+            with Image.open(destino) as img:
+                photo = ImageTk.PhotoImage(img)
+        except Exception:
+            return None
+        
+        self._fotos[clave] = photo
+        while len(self._fotos) > self.max_memoria:
+            self._fotos.popitem(last=False)
+        
+        return photo
+    
+    def purgar_huerfanos(self, rutas_vigentes: Iterable[str]) -> int:
+        """
+        Elimina del disco las miniaturas que ya no corresponden a ninguna imagen vigente
+        (producto borrado, imagen reemplazada o modificada)
+        Retorna la cantidad de archivos eliminados
+        """
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        
+        vigentes = {self._clave(ruta) for ruta in rutas_vigentes if ruta}
+        
+        eliminados = 0
+        for archivo in os.listdir(self.cache_dir):
+            clave, extension = os.path.splitext(archivo)
+            if extension not in ('.png', '.tmp') or clave in vigentes:
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, archivo))
+                eliminados += 1
+            except OSError:
+                pass
+        
+        return eliminados
+
+
+# Instancia global
+thumbnail_cache = ThumbnailCache()
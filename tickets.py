@@ -9,33 +9,55 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import os
 from datetime import datetime
-from config import BUSINESS_INFO, TICKET_CONFIG
+from functools import lru_cache
+from PIL import Image
+from config import BUSINESS_INFO, TICKET_CONFIG, PRINT_CONFIG
 from utils import format_currency
-from datetime import datetime
+from escpos import escpos_renderer
+
+@lru_cache(maxsize=1024)
+def ancho_texto(texto: str, fuente: str, tamano: float) -> float:
+    """Ancho de un texto en puntos (memorizado: las mismas líneas se repiten en cada ticket)"""
+    return pdfmetrics.stringWidth(texto, fuente, tamano)
+
 
 class TicketGenerator:
     def __init__(self):
         self.width = TICKET_CONFIG['width_mm'] * mm
         self.margin = 2 * mm
         self.line_height = 3 * mm
-        self.current_y = 0
+        self.margen_vertical = 5 * mm
         
+        # Bloques que no cambian entre tickets, ver _encabezado y _pie
+        self._logo = None        # (clave, ImageReader o None)
+        self._bloque_encabezado = None  # (clave, operaciones, alto)
+        self._bloque_pie = None  # (operaciones, alto)
+        
+    def generate_ticket(self, venta_data, filename=None):
+        """
+        Genera el ticket en el formato configurado en PRINT_CONFIG['modo']:
+        PDF o ESC/POS directo para impresora térmica. Retorna la ruta del archivo.
+        """
+        if PRINT_CONFIG['modo'] == 'escpos':
+            return escpos_renderer.generate_ticket_escpos(venta_data, filename)
+        return self.generate_ticket_pdf(venta_data, filename)
+    
     def generate_ticket_pdf(self, venta_data, filename=None):
         """
-        Genera un ticket en PDF
+        Genera un ticket en PDF (importes en centavos)
         
         venta_data = {
             'numero_venta': 1,
             'fecha': '02/11/2025 19:14:30',
             'productos': [
-                {'nombre': 'Tacos', 'cantidad': 2, 'precio': 15.00, 'total': 30.00},
-                {'nombre': 'Coca-Cola', 'cantidad': 1, 'precio': 30.00, 'total': 30.00}
+                {'nombre': 'Tacos', 'cantidad': 2, 'precio': 1500, 'total': 3000},
+                {'nombre': 'Coca-Cola', 'cantidad': 1, 'precio': 3000, 'total': 3000}
             ],
-            'subtotal': 60.00,
-            'propina': 5.00,
-            'total': 60.00,
-            'recibido': 100.00,
-            'cambio': 40.00,
+            'subtotal': 6000,
+            'propina': 500,
+            'total': 6500,
+            'recibido': 10000,
+            'cambio': 3500,
             'metodo_pago': 'Efectivo',
             'mesa': 'Mesa 1'
         }
@@ -47,218 +69,262 @@ class TicketGenerator:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f'tickets/ticket_{venta_data["numero_venta"]}_{timestamp}.pdf'
         
-        # Calcular altura necesaria
-        estimated_height = self._estimate_height(venta_data)
-        page_height = max(estimated_height, 100 * mm)
+        # Primero se acomoda todo el contenido; así se conoce la altura exacta del papel
+        operaciones, alto = self._layout(venta_data)
+        page_height = alto + self.margen_vertical
         
-        # Crear canvas
         c = canvas.Canvas(filename, pagesize=(self.width, page_height))
-        
-        # Iniciar desde arriba
-        self.current_y = page_height - (5 * mm)
-        
-        # Dibujar contenido
-        self._draw_header(c, venta_data)
-        self._draw_separator(c, dashed=False)
-        self._draw_products(c, venta_data)
-        self._draw_separator(c, dashed=True)
-        self._draw_totals(c, venta_data)
-        self._draw_separator(c, dashed=False)
-        self._draw_footer(c)
-        
-        # Guardar PDF
+        self._dibujar(c, operaciones, page_height)
         c.save()
         
         return filename
     
-    def _estimate_height(self, venta_data):
-        """Estima la altura necesaria para el ticket"""
-        height = 30 * mm  # Header
-        height += len(venta_data['productos']) * 6 * mm  # Productos
-        height += 30 * mm  # Totales
-        height += 55 * mm  # Footer
-        return height
+    # Operaciones de dibujo; y se mide en puntos desde el borde superior:
+    #   ('texto', y, x, fuente, tamano, texto)
+    #   ('derecha', y, x, fuente, tamano, texto)   texto alineado a la derecha de x
+    #   ('imagen', y, x, ancho, alto, imagen)      y es el borde superior de la imagen
+    #   ('linea', y, punteada)
     
-    def _draw_header(self, c, venta_data):
-        """Dibuja el encabezado del ticket"""
-        # Intentar cargar logo
-        if os.path.exists(BUSINESS_INFO['logo_path']):
-            try:
+    def _layout(self, venta_data):
+        """Operaciones de dibujo del ticket completo y la altura que ocupan"""
+        operaciones = []
+        
+        y = self._agregar_bloque(operaciones, self._encabezado(), self.margen_vertical)
+        y = self._info_ticket(operaciones, venta_data, y)
+        y = self._separador(operaciones, y, punteada=False)
+        y = self._productos(operaciones, venta_data, y)
+        y = self._separador(operaciones, y, punteada=True)
+        y = self._totales(operaciones, venta_data, y)
+        y = self._separador(operaciones, y, punteada=False)
+        y = self._agregar_bloque(operaciones, self._pie(), y)
+        
+        return operaciones, y
+    
+    def _agregar_bloque(self, operaciones, bloque, y):
+        """Copia un bloque precalculado a partir de la posición y; retorna la nueva y"""
+        ops, alto = bloque
+        operaciones.extend((op[0], op[1] + y) + op[2:] for op in ops)
+        return y + alto
+    
+    def _get_logo(self):
+        """Logo decodificado una sola vez (se vuelve a leer si el archivo cambia)"""
+        ruta = BUSINESS_INFO['logo_path']
+        try:
+            clave = os.stat(ruta).st_mtime_ns
+        except OSError:
+            clave = None
+        
+        if self._logo is None or self._logo[0] != clave:
+            imagen = None
+            if clave is not None:
+                try:
+                    # Reducido a la resolución de impresión: el PDF incrusta la imagen en
+                    # cada ticket y comprimir el original es lo más caro de generarlo
+                    lado = round(25 / 25.4 * TICKET_CONFIG['logo_dpi'])
+                    with Image.open(ruta) as img:
+                        img.load()
+                        img.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+                    imagen = ImageReader(img)
+                except Exception:
+                    imagen = None
+            self._logo = (clave, imagen)
+        
+        return self._logo[1]
+    
+    def _encabezado(self):
+        """Logo (o nombre) y datos del negocio: se calcula una vez por versión del logo"""
+        logo = self._get_logo()
+        clave = self._logo[0]
+        
+        if self._bloque_encabezado is None or self._bloque_encabezado[0] != clave:
+            ops = []
+            y = 0
+            
+            if logo is not None:
                 logo_width = 25 * mm
                 logo_height = 25 * mm
                 x_pos = (self.width - logo_width) / 2
-                
-                c.drawImage(BUSINESS_INFO['logo_path'], 
-                           x_pos, self.current_y - logo_height,
-                           width=logo_width, height=logo_height,
-                           preserveAspectRatio=True, mask='auto')
-                
-                self.current_y -= (logo_height + 2 * mm)
-            except:
-                # Si falla, mostrar texto
-                self._draw_centered_text(c, BUSINESS_INFO['name'], 12, bold=True)
-                self._draw_centered_text(c, BUSINESS_INFO['subtitle'], 9)
-        else:
-            # Sin logo, mostrar texto
-            self._draw_centered_text(c, BUSINESS_INFO['name'], 12, bold=True)
-            self._draw_centered_text(c, BUSINESS_INFO['subtitle'], 9)
-        
-        # Información del negocio
-        self._draw_centered_text(c, BUSINESS_INFO['address'], 7)
-        self._draw_centered_text(c, BUSINESS_INFO['city'], 7)
-        self._draw_centered_text(c, f"Tel: {BUSINESS_INFO['phone']}", 7)
+                ops.append(('imagen', y, x_pos, logo_width, logo_height, logo))
+                y += logo_height + 2 * mm
+            else:
+                # Sin logo, mostrar texto
+                y = self._texto_centrado(ops, BUSINESS_INFO['name'], 12, y, bold=True)
+                y = self._texto_centrado(ops, BUSINESS_INFO['subtitle'], 9, y)
+            
+            # Información del negocio
+            y = self._texto_centrado(ops, BUSINESS_INFO['address'], 7, y)
+            y = self._texto_centrado(ops, BUSINESS_INFO['city'], 7, y)
+            y = self._texto_centrado(ops, f"Tel: {BUSINESS_INFO['phone']}", 7, y)
+            
+            self._bloque_encabezado = (clave, tuple(ops), y)
         
-        self.current_y -= 2 * mm
+        return self._bloque_encabezado[1:]
+    
+    def _info_ticket(self, operaciones, venta_data, y):
+        """Número, fecha y mesa del ticket"""
+        y += 2 * mm
         
-        # Información del ticket
-        self._draw_centered_text(c, f"Ticket #: {venta_data['numero_venta']}", 9, bold=True)
-        self._draw_centered_text(c, f"Fecha: {venta_data['fecha']}", 7)
+        y = self._texto_centrado(operaciones, f"Ticket #: {venta_data['numero_venta']}", 9, y,
+                                 bold=True)
+        y = self._texto_centrado(operaciones, f"Fecha: {venta_data['fecha']}", 7, y)
         
         if venta_data.get('mesa'):
-            self._draw_centered_text(c, f"{venta_data['mesa']}", 8)
+            y = self._texto_centrado(operaciones, f"{venta_data['mesa']}", 8, y)
         
-        self.current_y -= 2 * mm
+        return y + 2 * mm
     
-    def _draw_separator(self, c, dashed=False):
-        """Dibuja una línea separadora"""
-        if dashed:
-            c.setDash(1, 2)
-        else:
-            c.setDash()
-        
-        c.line(self.margin, self.current_y, self.width - self.margin, self.current_y)
-        self.current_y -= 2 * mm
+    def _separador(self, operaciones, y, punteada=False):
+        """Línea separadora"""
+        operaciones.append(('linea', y, punteada))
+        return y + 2 * mm
     
-    def _draw_products(self, c, venta_data):
-        """Dibuja la lista de productos"""
-        self.current_y -= 1 * mm
+    def _productos(self, operaciones, venta_data, y):
+        """Lista de productos: lo único cuyo costo crece con el ticket"""
+        y += 1 * mm
+        derecha = self.width - self.margin
+        columna_nombre = self.margin + 10 * mm
         
         # Encabezado
-        c.setFont("Helvetica-Bold", 8)
-        c.drawString(self.margin, self.current_y, "Cant.")
-        c.drawString(self.margin + 10 * mm, self.current_y, "Descripción")
-        c.drawRightString(self.width - self.margin, self.current_y, "Total")
-        self.current_y -= 3 * mm
+        operaciones.append(('texto', y, self.margin, "Helvetica-Bold", 8, "Cant."))
+        operaciones.append(('texto', y, columna_nombre, "Helvetica-Bold", 8, "Descripción"))
+        operaciones.append(('derecha', y, derecha, "Helvetica-Bold", 8, "Total"))
+        y += 3 * mm
         
-        # Productos
-        c.setFont("Helvetica", 8)
         for producto in venta_data['productos']:
-            # Cantidad
-            c.drawString(self.margin, self.current_y, str(int(producto['cantidad'])))
-            
             # Nombre del producto
             nombre = producto['nombre']
             if len(nombre) > 18:
                 nombre = nombre[:18] + "..."
-            c.drawString(self.margin + 10 * mm, self.current_y, nombre)
             
-            # Total
-            c.drawRightString(self.width - self.margin, self.current_y, 
-                            format_currency(producto['total']))
-            
-            self.current_y -= 4 * mm
+            operaciones.append(('texto', y, self.margin, "Helvetica", 8,
+                                str(int(producto['cantidad']))))
+            operaciones.append(('texto', y, columna_nombre, "Helvetica", 8, nombre))
+            operaciones.append(('derecha', y, derecha, "Helvetica", 8,
+                                format_currency(producto['total'])))
+            y += 4 * mm
             
             # Precio unitario (línea adicional más pequeña)
-            c.setFont("Helvetica", 6)
-            c.drawString(self.margin + 10 * mm, self.current_y, 
-                        f"  {format_currency(producto['precio'])} c/u")
-            c.setFont("Helvetica", 8)
-            self.current_y -= 3 * mm
+            operaciones.append(('texto', y, columna_nombre, "Helvetica", 6,
+                                f"  {format_currency(producto['precio'])} c/u"))
+            y += 3 * mm
         
-        self.current_y -= 1 * mm
+        return y + 1 * mm
     
-    def _draw_totals(self, c, venta_data):
-        """Dibuja los totales"""
-        self.current_y -= 1 * mm
+    def _totales(self, operaciones, venta_data, y):
+        """Subtotal, propina, total, recibido, cambio y método de pago"""
+        y += 1 * mm
+        derecha = self.width - self.margin
         
         # Subtotal (si hay propina)
         if venta_data.get('propina', 0) > 0:
-            c.setFont("Helvetica", 9)
-            c.drawString(self.margin, self.current_y, "Subtotal:")
-            c.drawRightString(self.width - self.margin, self.current_y, 
-                            format_currency(venta_data['subtotal']))
-            self.current_y -= 4 * mm
+            operaciones.append(('texto', y, self.margin, "Helvetica", 9, "Subtotal:"))
+            operaciones.append(('derecha', y, derecha, "Helvetica", 9,
+                                format_currency(venta_data['subtotal'])))
+            y += 4 * mm
             
             # Propina
-            c.drawString(self.margin, self.current_y, "Propina:")
-            c.drawRightString(self.width - self.margin, self.current_y, 
-                            format_currency(venta_data['propina']))
-            self.current_y -= 4 * mm
+            operaciones.append(('texto', y, self.margin, "Helvetica", 9, "Propina:"))
+            operaciones.append(('derecha', y, derecha, "Helvetica", 9,
+                                format_currency(venta_data['propina'])))
+            y += 4 * mm
         
         # Total
-        c.setFont("Helvetica-Bold", 11)
-        c.drawString(self.margin, self.current_y, "TOTAL:")
-        c.drawRightString(self.width - self.margin, self.current_y, 
-                        format_currency(venta_data['total']))
-        self.current_y -= 5 * mm
+        operaciones.append(('texto', y, self.margin, "Helvetica-Bold", 11, "TOTAL:"))
+        operaciones.append(('derecha', y, derecha, "Helvetica-Bold", 11,
+                            format_currency(venta_data['total'])))
+        y += 5 * mm
         
         # Recibido
-        c.setFont("Helvetica", 9)
-        c.drawString(self.margin, self.current_y, "Recibido:")
-        c.drawRightString(self.width - self.margin, self.current_y, 
-                        format_currency(venta_data['recibido']))
-        self.current_y -= 4 * mm
+        operaciones.append(('texto', y, self.margin, "Helvetica", 9, "Recibido:"))
+        operaciones.append(('derecha', y, derecha, "Helvetica", 9,
+                            format_currency(venta_data['recibido'])))
+        y += 4 * mm
         
         # Cambio
-        c.drawString(self.margin, self.current_y, "Cambio:")
-        c.drawRightString(self.width - self.margin, self.current_y, 
-                        format_currency(venta_data['cambio']))
-        self.current_y -= 4 * mm
+        operaciones.append(('texto', y, self.margin, "Helvetica", 9, "Cambio:"))
+        operaciones.append(('derecha', y, derecha, "Helvetica", 9,
+                            format_currency(venta_data['cambio'])))
+        y += 4 * mm
         
         # Método de pago
-        c.setFont("Helvetica", 7)
-        self._draw_centered_text_at(c, f"Método de pago: {venta_data['metodo_pago']}", 
-                                    self.current_y, 7)
-        self.current_y -= 3 * mm
+        self._texto_centrado(operaciones, f"Método de pago: {venta_data['metodo_pago']}", 7, y)
+        return y + 3 * mm
     
-    def _draw_footer(self, c):
-        """Dibuja el pie del ticket"""
-        self.current_y -= 2 * mm
-        c.setFont("Helvetica-Bold", 9)
-        self._draw_centered_text_at(c, "¡Gracias por su compra!", self.current_y, 9)
-        self.current_y -= 3 * mm
+    def _pie(self):
+        """Pie del ticket (fijo, se calcula una sola vez)"""
+        if self._bloque_pie is None:
+            ops = []
+            y = 2 * mm
+            self._texto_centrado(ops, "¡Gracias por su compra!", 9, y, bold=True)
+            y += 3 * mm
+            self._texto_centrado(ops, "Vuelva pronto", 8, y)
+            self._bloque_pie = (tuple(ops), y)
         
-        c.setFont("Helvetica", 8)
-        self._draw_centered_text_at(c, "Vuelva pronto", self.current_y, 8)
+        return self._bloque_pie
     
-    def _draw_centered_text(self, c, text, size, bold=False):
-        """Dibuja texto centrado y actualiza current_y"""
+    def _texto_centrado(self, operaciones, text, size, y, bold=False):
+        """Agrega un texto centrado; retorna la y del siguiente renglón"""
         font = "Helvetica-Bold" if bold else "Helvetica"
-        c.setFont(font, size)
-        
-        text_width = c.stringWidth(text, font, size)
-        x = (self.width - text_width) / 2
-        
-        c.drawString(x, self.current_y, text)
-        self.current_y -= (size * 0.5 * mm)
+        x = (self.width - ancho_texto(text, font, size)) / 2
+        operaciones.append(('texto', y, x, font, size, text))
+        return y + size * 0.5 * mm
     
-    def _draw_centered_text_at(self, c, text, y, size, bold=False):
-        """Dibuja texto centrado en una posición Y específica"""
-        font = "Helvetica-Bold" if bold else "Helvetica"
-        c.setFont(font, size)
-        
-        text_width = c.stringWidth(text, font, size)
-        x = (self.width - text_width) / 2
+    def _dibujar(self, c, operaciones, page_height):
+        """Ejecuta las operaciones sobre el canvas"""
+        fuente_actual = None
         
-        c.drawString(x, y, text)
+        for op in operaciones:
+            tipo, y = op[0], page_height - op[1]
+            
+            if tipo == 'linea':
+                if op[2]:
+                    c.setDash(1, 2)
+                else:
+                    c.setDash()
+                c.line(self.margin, y, self.width - self.margin, y)
+                continue
+            
+            if tipo == 'imagen':
+                _, _, x, ancho, alto, imagen = op
+                c.drawImage(imagen, x, y - alto, width=ancho, height=alto,
+                           preserveAspectRatio=True, mask='auto')
+                continue
+            
+            _, _, x, fuente, tamano, texto = op
+            if fuente_actual != (fuente, tamano):
+                c.setFont(fuente, tamano)
+                fuente_actual = (fuente, tamano)
+            
+            if tipo == 'derecha':
+                c.drawRightString(x, y, texto)
+            else:
+                c.drawString(x, y, texto)
     
     def print_ticket(self, filename):
         """
         Imprime el ticket en una impresora térmica
         Usa el comando del sistema operativo por defecto
+        Retorna False si el sistema rechaza el trabajo o no responde a tiempo
+        (se llama desde el hilo de print_queue)
         """
         import platform
         import subprocess
         
+        # Tickets ESC/POS: se escriben directo a la impresora, sin la cola del sistema
+        if filename.endswith('.bin'):
+            return escpos_renderer.print_ticket(filename)
+        
         system = platform.system()
         
         try:
             if system == "Windows":
                 os.startfile(filename, "print")
             elif system == "Darwin":  # macOS
-                subprocess.run(["lpr", filename])
+                subprocess.run(["lpr", filename], check=True,
+                               timeout=PRINT_CONFIG['timeout_s'])
             else:  # Linux
-                subprocess.run(["lp", filename])
+                subprocess.run(["lp", filename], check=True,
+                               timeout=PRINT_CONFIG['timeout_s'])
             
             return True
         except Exception as e:
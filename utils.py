@@ -3,17 +3,53 @@ Funciones auxiliares y utilidades generales
 """
 import re
 from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from typing import Optional
 import unicodedata
 
-def format_currency(amount: float) -> str:
+def to_cents(amount) -> int:
     """
-    Formatea un número como moneda mexicana
-    Ejemplo: 1234.56 -> $1,234.56
+    Convierte pesos (número o texto) a centavos enteros, con redondeo comercial
+    Ejemplo: "12.345" -> 1235, 0.1 + 0.2 -> 30
+    Lanza ValueError si el valor no es un número válido
     """
-    if amount is None:
+    try:
+        valor = Decimal(str(amount).strip())
+        return int((valor * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Cantidad de dinero inválida: {amount!r}")
+
+def multiply_cents(centavos: int, cantidad) -> int:
+    """
+    Importe en centavos por una cantidad (puede ser fraccionaria), redondeado al centavo
+    Ejemplo: (1999, 1.5) -> 2999
+    """
+    importe = Decimal(int(centavos)) * Decimal(str(cantidad))
+    return int(importe.quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def cents_to_str(centavos) -> str:
+    """
+    Centavos a texto en pesos, sin símbolo (para campos de captura)
+    Ejemplo: 123456 -> 1234.56
+    """
+    if centavos is None:
+        return "0.00"
+    centavos = int(round(centavos))
+    signo = '-' if centavos < 0 else ''
+    pesos, resto = divmod(abs(centavos), 100)
+    return f"{signo}{pesos}.{resto:02d}"
+
+def format_currency(centavos) -> str:
+    """
+    Formatea centavos como moneda mexicana
+    Ejemplo: 123456 -> $1,234.56
+    """
+    if centavos is None:
         return "$0.00"
-    return f"${amount:,.2f}"
+    centavos = int(round(centavos))
+    signo = '-' if centavos < 0 else ''
+    pesos, resto = divmod(abs(centavos), 100)
+    return f"${signo}{pesos:,}.{resto:02d}"
 
 def format_number(number: float, decimals: int = 2) -> str:
     """
@@ -24,19 +60,19 @@ def format_number(number: float, decimals: int = 2) -> str:
         return "0.00"
     return f"{number:,.{decimals}f}"
 
-def parse_currency(text: str) -> float:
+def parse_currency(text: str) -> int:
     """
-    Convierte texto de moneda a float
-    Ejemplo: "$1,234.56" -> 1234.56
+    Convierte texto de moneda a centavos
+    Ejemplo: "$1,234.56" -> 123456
     """
     if not text:
-        return 0.0
+        return 0
     # Remover $, comas y espacios
     clean = re.sub(r'[$,\s]', '', text)
     try:
-        return float(clean)
+        return to_cents(clean)
     except ValueError:
-        return 0.0
+        return 0
 
 def format_datetime(dt: Optional[datetime] = None) -> str:
     """
@@ -47,6 +83,36 @@ def format_datetime(dt: Optional[datetime] = None) -> str:
         dt = datetime.now()
     return dt.strftime('%d/%m/%Y %H:%M:%S')
 
+def format_iso_datetime(dt: Optional[datetime] = None) -> str:
+    """
+    Formatea fecha y hora en formato ISO ordenable
+    Formato: yyyy-mm-dd hh:mm:ss
+    """
+    if dt is None:
+        dt = datetime.now()
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+def to_iso_datetime(date_str: str) -> Optional[str]:
+    """
+    Convierte una fecha dd/mm/yyyy [hh:mm:ss] al formato ISO ordenable
+    Ejemplo: "02/11/2025 19:14:30" -> "2025-11-02 19:14:30"
+    """
+    dt = parse_datetime(date_str.strip()) if date_str else None
+    if dt is None:
+        return None
+    return format_iso_datetime(dt)
+
+def iso_day_range(fecha_inicio, fecha_fin=None) -> tuple:
+    """
+    Rango ISO que cubre días completos (para filtros por fecha_iso)
+    Ejemplo: (date(2025, 11, 1), date(2025, 11, 2)) ->
+             ("2025-11-01 00:00:00", "2025-11-02 23:59:59")
+    """
+    if fecha_fin is None:
+        fecha_fin = fecha_inicio
+    return (fecha_inicio.strftime('%Y-%m-%d') + ' 00:00:00',
+            fecha_fin.strftime('%Y-%m-%d') + ' 23:59:59')
+
 def format_date(dt: Optional[datetime] = None) -> str:
     """
     Formatea solo la fecha
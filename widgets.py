@@ -0,0 +1,481 @@
+"""
+Widgets reutilizables para Mitsy's POS
+"""
+import tkinter as tk
+from tkinter import messagebox
+from collections import deque
+import queue
+import threading
+
+class VirtualGallery:
+    def __init__(self, parent, create_card, fill_card, load_image=None,
+                 columns: int = 7, cell_height: int = 250, min_cell_width: int = 150,
+                 padding: int = 12, overscan: int = 1, bg: str = None):
+        """
+        Galería virtualizada sobre un Canvas.
+        Solo existen tarjetas para las filas visibles (más 'overscan' filas extra);
+        al desplazarse, las tarjetas que salen de la vista se reutilizan.
+        
+        create_card(parent) -> tk.Frame   Construye una tarjeta vacía
+        fill_card(card, item)             Llena la tarjeta con los datos del item
+        load_image(card, item)            Carga la imagen (se ejecuta después del primer dibujado)
+        """
+        self.create_card = create_card
+        self.fill_card = fill_card
+        self.load_image = load_image
+        self.columns = columns
+        self.cell_height = cell_height
+        self.min_cell_width = min_cell_width
+        self.padding = padding
+        self.overscan = overscan
+        
+        self.items = []
+        self._activas = {}  # índice del item -> tarjeta
+        self._libres = []  # tarjetas ocultas listas para reutilizar
+        self._cola_imagenes = deque()
+        self._render_id = None
+        self._imagenes_id = None
+        self._cell_width = None
+        
+        self.frame = tk.Frame(parent, bg=bg)
+        self.canvas = tk.Canvas(self.frame, bg=bg, highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(self.frame, orient="vertical",
+                                      command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+        
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.canvas.bind('<Configure>', lambda e: self._update_scrollregion())
+        self.canvas.bind('<Destroy>', self._on_destroy)
+    
+    def pack(self, **kwargs):
+        """Empaqueta el contenedor de la galería"""
+        self.frame.pack(**kwargs)
+    
+    def set_items(self, items):
+        """Reemplaza los elementos mostrados y vuelve al inicio"""
+        self.items = list(items)
+        self._cola_imagenes.clear()
+        
+        for indice in list(self._activas):
+            self._liberar(indice)
+        
+        self._update_scrollregion()
+        self.canvas.yview_moveto(0)
+        self._schedule_render()
+    
+    def _update_scrollregion(self):
+        """Ajusta el área desplazable al total de filas"""
+        width = self.canvas.winfo_width()
+        filas = -(-len(self.items) // self.columns)
+        self.canvas.configure(scrollregion=(0, 0, width, filas * self.cell_height))
+        self._schedule_render()
+    
+    def _on_scroll(self, first, last):
+        """El canvas cambió de vista: actualiza la barra y redibuja"""
+        self.scrollbar.set(first, last)
+        self._schedule_render()
+    
+    def _schedule_render(self):
+        """Agrupa varios eventos de scroll/redimensión en un solo dibujado"""
+        if self._render_id is None:
+            self._render_id = self.canvas.after_idle(self._render)
+    
+    def _render(self):
+        """Asigna tarjetas a los elementos visibles"""
+        self._render_id = None
+        
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width <= 1 or not self.items:
+            return
+        
+        cell_width = max(width // self.columns, self.min_cell_width)
+        if cell_width != self._cell_width:
+            # Cambió el ancho: hay que reposicionar todas las tarjetas
+            self._cell_width = cell_width
+            for indice in list(self._activas):
+                self._liberar(indice)
+        
+        top = self.canvas.canvasy(0)
+        total_filas = -(-len(self.items) // self.columns)
+        primera_fila = max(int(top // self.cell_height) - self.overscan, 0)
+        ultima_fila = min(int((top + height) // self.cell_height) + self.overscan,
+                          total_filas - 1)
+        
+        visibles = range(primera_fila * self.columns,
+                         min((ultima_fila + 1) * self.columns, len(self.items)))
+        
+        for indice in list(self._activas):
+            if indice not in visibles:
+                self._liberar(indice)
+        
+        for indice in visibles:
+            if indice not in self._activas:
+                self._asignar(indice)
+        
+        if self._cola_imagenes and self._imagenes_id is None:
+            self._imagenes_id = self.canvas.after(1, self._procesar_imagenes)
+    
+    def _asignar(self, indice: int):
+        """Coloca una tarjeta (nueva o reciclada) en la celda del elemento"""
+        if self._libres:
+            card = self._libres.pop()
+        else:
+            card = self.create_card(self.canvas)
+            card.window_id = self.canvas.create_window(0, 0, window=card, anchor='nw')
+        
+        fila, columna = divmod(indice, self.columns)
+        self.canvas.coords(card.window_id,
+                           columna * self._cell_width + self.padding,
+                           fila * self.cell_height + self.padding)
+        self.canvas.itemconfigure(card.window_id, state='normal',
+                                  width=self._cell_width - 2 * self.padding,
+                                  height=self.cell_height - 2 * self.padding)
+        
+        card.indice = indice
+        self.fill_card(card, self.items[indice])
+        self._activas[indice] = card
+        
+        if self.load_image:
+            self._cola_imagenes.append((card, indice))
+    
+    def _liberar(self, indice: int):
+        """Oculta la tarjeta de un elemento y la deja lista para reutilizar"""
+        card = self._activas.pop(indice)
+        card.indice = None
+        self.canvas.itemconfigure(card.window_id, state='hidden')
+        self._libres.append(card)
+    
+    def _procesar_imagenes(self, por_tanda: int = 4):
+        """Carga imágenes de pocas en pocas para no bloquear la interfaz"""
+        self._imagenes_id = None
+        
+        for _ in range(por_tanda):
+            if not self._cola_imagenes:
+                break
+            card, indice = self._cola_imagenes.popleft()
+            # La tarjeta pudo reciclarse para otro elemento mientras esperaba
+            if card.indice == indice:
+                self.load_image(card, self.items[indice])
+        
+        if self._cola_imagenes:
+            self._imagenes_id = self.canvas.after(1, self._procesar_imagenes)
+    
+    def _on_destroy(self, event):
+        """Cancela los trabajos pendientes al cerrar la ventana"""
+        if event.widget is not self.canvas:
+            return
+        for after_id in (self._render_id, self._imagenes_id):
+            if after_id is not None:
+                try:
+                    self.canvas.after_cancel(after_id)
+                except tk.TclError:
+                    pass
+        self._render_id = None
+        self._imagenes_id = None
+
+
+class SearchController:
+    def __init__(self, widget, buscar, aplicar, delay_ms: int = 250, poll_ms: int = 30):
+        """
+        Búsqueda mientras se escribe, sin congelar la interfaz.
+        - Espera delay_ms sin teclear antes de buscar (debounce)
+        - La consulta se ejecuta en un hilo de trabajo propio
+        - Solo se aplica el resultado de la búsqueda más reciente
+        
+        widget                      Widget Tk usado para programar eventos (after)
+        buscar(query) -> resultado  Se ejecuta en el hilo de trabajo (usar db.reader())
+        aplicar(query, resultado)   Se ejecuta en el hilo de Tk
+        """
+        self.widget = widget
+        self.buscar = buscar
+        self.aplicar = aplicar
+        self.delay_ms = delay_ms
+        self.poll_ms = poll_ms
+        
+        self._generacion = 0
+        self._after_id = None
+        self._poll_id = None
+        self._en_curso = 0
+        self._solicitudes = queue.Queue()
+        self._resultados = queue.Queue()
+        
+        self._hilo = threading.Thread(target=self._trabajar, daemon=True)
+        self._hilo.start()
+        
+        widget.bind('<Destroy>', self._on_destroy, add='+')
+    
+    def schedule(self, query: str):
+        """Programa una búsqueda; reinicia la espera si se sigue escribiendo"""
+        self._cancelar_espera()
+        self._generacion += 1
+        generacion = self._generacion
+        self._after_id = self.widget.after(self.delay_ms,
+                                           lambda: self._enviar(generacion, query))
+    
+    def search_now(self, query: str):
+        """Busca de inmediato (por ejemplo al presionar un botón)"""
+        self._cancelar_espera()
+        self._generacion += 1
+        self._enviar(self._generacion, query)
+    
+    def cancel(self):
+        """Descarta la búsqueda pendiente y cualquier resultado en camino"""
+        self._cancelar_espera()
+        self._generacion += 1
+    
+    def _cancelar_espera(self):
+        """Cancela el temporizador de espera si existe"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+    
+    def _enviar(self, generacion: int, query: str):
+        """Envía la consulta al hilo de trabajo"""
+        self._after_id = None
+        if generacion != self._generacion:
+            return
+        
+        self._en_curso += 1
+        self._solicitudes.put((generacion, query))
+        if self._poll_id is None:
+            self._poll_id = self.widget.after(self.poll_ms, self._poll)
+    
+    def _trabajar(self):
+        """Hilo de trabajo: ejecuta solo la última consulta pendiente"""
+        while True:
+            solicitud = self._solicitudes.get()
+            
+            # Si llegaron varias mientras tanto, solo importa la última
+            omitidas = 0
+            while solicitud is not None and not self._solicitudes.empty():
+                solicitud = self._solicitudes.get_nowait()
+                omitidas += 1
+            
+            if solicitud is None:
+                return
+            
+            generacion, query = solicitud
+            if generacion != self._generacion:
+                self._resultados.put((generacion, query, None, None, omitidas + 1))
+                continue
+            
+            try:
+                resultado, error = self.buscar(query), None
+            except Exception as e:
+                resultado, error = None, e
+            
+            self._resultados.put((generacion, query, resultado, error, omitidas + 1))
+    
+    def _poll(self):
+        """Revisa en el hilo de Tk si hay resultados listos"""
+        self._poll_id = None
+        
+        ultimo = None
+        while True:
+            try:
+                item = self._resultados.get_nowait()
+            except queue.Empty:
+                break
+            self._en_curso -= item[4]
+            if item[0] == self._generacion:
+                ultimo = item
+        
+        if ultimo is not None:
+            _, query, resultado, error, _ = ultimo
+            if error is not None:
+                messagebox.showerror("Error", f"Error en la búsqueda: {str(error)}")
+            else:
+                self.aplicar(query, resultado)
+        
+        if self._en_curso > 0:
+            self._poll_id = self.widget.after(self.poll_ms, self._poll)
+    
+    def _on_destroy(self, event):
+        """Detiene el hilo de trabajo al cerrar la ventana"""
+        if event.widget is not self.widget:
+            return
+        for after_id in (self._after_id, self._poll_id):
+            if after_id is not None:
+                try:
+                    self.widget.after_cancel(after_id)
+                except tk.TclError:
+                    pass
+        self._after_id = None
+        self._poll_id = None
+        self._generacion += 1
+        self._solicitudes.put(None)
+
+
+class TreeviewBinder:
+    def __init__(self, tree):
+        """
+        Actualiza un ttk.Treeview por diferencias en lugar de borrar y reinsertar todo.
+        Cada fila se identifica por una clave (iid); solo se insertan, modifican,
+        mueven o eliminan las filas que cambiaron, así se conservan la selección
+        y la posición del scroll.
+        """
+        self.tree = tree
+        self._filas = {}  # iid -> (values, tags) mostrados
+    
+    def set_rows(self, rows):
+        """
+        Muestra exactamente las filas indicadas, en ese orden
+        rows = [(clave, values, tags), ...]
+        """
+        nuevas = [(str(clave), tuple(values), tuple(tags)) for clave, values, tags in rows]
+        claves = {clave for clave, _, _ in nuevas}
+        
+        # Eliminar las filas que ya no están (una sola llamada)
+        sobrantes = [iid for iid in self._filas if iid not in claves]
+        if sobrantes:
+            self.tree.delete(*sobrantes)
+            for iid in sobrantes:
+                del self._filas[iid]
+        
+        actuales = list(self.tree.get_children())
+        
+        for indice, (iid, values, tags) in enumerate(nuevas):
+            if iid not in self._filas:
+                self.tree.insert('', indice, iid=iid, values=values, tags=tags)
+                actuales.insert(indice, iid)
+                self._filas[iid] = (values, tags)
+                continue
+            
+            if self._filas[iid] != (values, tags):
+                self.tree.item(iid, values=values, tags=tags)
+                self._filas[iid] = (values, tags)
+            
+            if indice >= len(actuales) or actuales[indice] != iid:
+                self.tree.move(iid, '', indice)
+                actuales.remove(iid)
+                actuales.insert(indice, iid)
+    
+    def extend(self, rows):
+        """Agrega filas al final (carga por páginas); las claves repetidas se actualizan"""
+        for clave, values, tags in rows:
+            iid, values, tags = str(clave), tuple(values), tuple(tags)
+            if iid in self._filas:
+                if self._filas[iid] != (values, tags):
+                    self.tree.item(iid, values=values, tags=tags)
+                    self._filas[iid] = (values, tags)
+                continue
+            self.tree.insert('', tk.END, iid=iid, values=values, tags=tags)
+            self._filas[iid] = (values, tags)
+    
+    def clear(self):
+        """Elimina todas las filas"""
+        if self._filas:
+            self.tree.delete(*self._filas)
+        self._filas.clear()
+    
+    def __len__(self):
+        return len(self._filas)
+
+
+class KeysetPager:
+    def __init__(self, tree, scrollbar, binder, cargar, render, contar=None,
+                 on_total=None, tamano_pagina: int = 200, umbral: float = 0.1):
+        """
+        Carga un Treeview por páginas a medida que el usuario se desplaza.
+        
+        cargar(despues, limite) -> (filas, siguiente)   Ver Database.get_pagina
+        render(filas, inicio) -> [(clave, values, tags)]  Convierte filas a renglones
+        contar() -> int                                 Total de filas (para el scrollbar)
+        on_total(cargadas, total)                       Avisa cuántas filas hay cargadas
+        
+        El scrollbar se escala con el total para que su tamaño refleje todo el
+        historial y no solo las filas cargadas.
+        """
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.binder = binder
+        self.cargar = cargar
+        self.render = render
+        self.contar = contar
+        self.on_total = on_total
+        self.tamano_pagina = tamano_pagina
+        self.umbral = umbral
+        
+        self.total = 0
+        self._siguiente = None
+        self._pagina_id = None
+        
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+        self.scrollbar.configure(command=self._on_scrollbar)
+    
+    @property
+    def hay_mas(self) -> bool:
+        return self._siguiente is not None
+    
+    def reset(self):
+        """Vuelve a cargar desde la primera página (nuevo filtro u orden)"""
+        self._cancelar_pagina()
+        filas, self._siguiente = self.cargar(None, self.tamano_pagina)
+        self.total = self.contar() if self.contar else len(filas)
+        self.binder.set_rows(self.render(filas, 0))
+        self.tree.yview_moveto(0)
+        self._notificar()
+    
+    def refrescar(self):
+        """
+        Recarga las filas que ya estaban cargadas (después de modificar o borrar),
+        conservando la selección y la posición del scroll
+        """
+        self._cancelar_pagina()
+        limite = max(len(self.binder), self.tamano_pagina)
+        filas, self._siguiente = self.cargar(None, limite)
+        self.total = self.contar() if self.contar else len(filas)
+        self.binder.set_rows(self.render(filas, 0))
+        self._notificar()
+    
+    def cargar_siguiente(self):
+        """Agrega la siguiente página al final de la tabla"""
+        self._pagina_id = None
+        if self._siguiente is None:
+            return
+        
+        inicio = len(self.binder)
+        filas, self._siguiente = self.cargar(self._siguiente, self.tamano_pagina)
+        self.binder.extend(self.render(filas, inicio))
+        self.total = max(self.total, len(self.binder))
+        self._notificar()
+    
+    def _fraccion(self) -> float:
+        """Proporción del total que está cargada en la tabla"""
+        if not self._siguiente or not self.total:
+            return 1.0
+        return min(len(self.binder) / self.total, 1.0)
+    
+    def _on_tree_scroll(self, first, last):
+        fraccion = self._fraccion()
+        self.scrollbar.set(float(first) * fraccion, float(last) * fraccion)
+        
+        if self._siguiente is not None and float(last) >= 1.0 - self.umbral:
+            self._programar_pagina()
+    
+    def _on_scrollbar(self, *args):
+        if args and args[0] == 'moveto':
+            destino = float(args[1])
+            fraccion = self._fraccion()
+            # Si arrastran más allá de lo cargado se pide otra página y se queda al final
+            if destino >= fraccion and self._siguiente is not None:
+                self._programar_pagina()
+            self.tree.yview_moveto(min(destino / fraccion, 1.0))
+        else:
+            self.tree.yview(*args)
+    
+    def _programar_pagina(self):
+        if self._pagina_id is None:
+            self._pagina_id = self.tree.after_idle(self.cargar_siguiente)
+    
+    def _cancelar_pagina(self):
+        if self._pagina_id is not None:
+            self.tree.after_cancel(self._pagina_id)
+            self._pagina_id = None
+    
+    def _notificar(self):
+        if self.on_total:
+            self.on_total(len(self.binder), self.total)